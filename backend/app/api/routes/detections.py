@@ -1,13 +1,71 @@
 """Detection API endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.core.security import verify_api_key
-from app.models.detection import DetectionRequest, DetectionResponse
+import asyncio
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
+from app.config import get_settings
+from app.core.executor import run_blocking
+from app.core.rate_limit import charge_batch, get_rate_limiter
+from app.core.sse import EventStreamResponse
+from app.core.security import check_device, verify_api_key, verify_device
+from app.models.detection import (
+    DetectionListResponse, DetectionRequest, DetectionResponse, DetectionStatsResponse
+)
+from app.services.alert_config_cache import get_alert_config_cache
+from app.services.cloudinary_client import get_cloudinary_client
+from app.services.detection_history import (
+    HistoryQuery, decode_cursor, get_detection_history
+)
 from app.services.detection_service import DetectionService
+from app.services.detection_stream import StreamFullError, get_detection_broadcaster
+from app.services.device_credentials import get_device_credentials
+from app.services.image_dedup import get_image_dedup
+from app.services.image_processing import get_image_normalizer
+from app.services.rollups import RollupReadLimitError, get_detection_rollups
+from app.services.ingest_queue import QueueClosedError
+from app.services.spool import get_detection_spool
+from app.services.write_buffer import get_write_buffer
 
 
 router = APIRouter(prefix="/api", tags=["Detections"])
 
+# Largest page GET /api/detections returns
+MAX_PAGE_SIZE = 200
+
+# Longest range GET /api/detections/stats covers
+MAX_STATS_RANGE = timedelta(days=366)
+
+# Reconnection delay suggested to stream clients
+STREAM_RETRY_MS = 3000
+
+# Documents the body of POST /api/detections/upload, which the route parses
+# itself (see submit_detection_upload)
+_UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["device_id", "animal", "confidence"],
+                "properties": {
+                    "device_id": {"type": "string"},
+                    "animal": {"type": "string"},
+                    "confidence": {"type": "number"},
+                    "timestamp": {"type": "string"},
+                    "image": {"type": "string", "format": "binary"}
+                }
+            }
+        }
+    }
+}
+
 
 @router.post(
     "/detections",
@@ -15,17 +73,20 @@ router = APIRouter(prefix="/api", tags=["Detections"])
     status_code=status.HTTP_201_CREATED,
     summary="Submit Detection Event",
     description="Submit a detection event from an edge device (Raspberry Pi). "
-                "Requires valid API key authentication."
+                "Requires valid API key authentication. In fast-ack mode the "
+                "event is queued and the endpoint returns 202 immediately."
 )
 async def submit_detection(
     request: DetectionRequest,
-    api_key: str = Depends(verify_api_key)
+    response: Response,
+    device: Optional[str] = Depends(verify_device)
 ) -> DetectionResponse:
     """
     Process a detection event from an edge device.
     
     This endpoint:
-    - Authenticates the device via API key
+    - Authenticates the device via API key (a per-device key must match
+      ``device_id``)
     - Validates the detection payload
     - Checks cooldown period
     - Uploads image to Firebase Storage (if present)
@@ -35,19 +96,353 @@ async def submit_detection(
     Returns:
         DetectionResponse with processing results
     """
-    response = await DetectionService.process_detection(request)
+    check_device(device, request.device_id)
+    return await _handle_detection(request, response)
+
+
+@router.post(
+    "/detections/upload",
+    response_model=DetectionResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Submit Detection Event (multipart)",
+    description="Submit a detection event with the image as a binary "
+                "multipart/form-data part instead of base64 JSON. "
+                "Requires valid API key authentication.",
+    openapi_extra={"requestBody": _UPLOAD_REQUEST_BODY}
+)
+async def submit_detection_upload(
+    http_request: Request,
+    response: Response,
+    device: Optional[str] = Depends(verify_device)
+) -> DetectionResponse:
+    """
+    Process a detection event whose image is sent as a binary file part.
+    
+    The form is parsed here rather than through ``Form``/``File``
+    parameters, which FastAPI reads before any dependency runs: a request
+    with a missing or invalid key is rejected before its image is read.
     
-    if not response.success:
+    The image part is spooled by the multipart parser (memory up to a
+    threshold, then disk) and handed to the uploader as a file object, so
+    no base64 inflation or decoded copy is held in memory.
+    
+    Returns:
+        DetectionResponse with processing results
+    """
+    async with http_request.form() as form:
+        try:
+            request = DetectionRequest(**{
+                name: value for name, value in form.items()
+                if name in ("device_id", "animal", "confidence", "timestamp")
+            })
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        
+        check_device(device, request.device_id)
+        
+        image = form.get("image")
+        if image is not None and not isinstance(image, UploadFile):
+            raise RequestValidationError([{
+                "type": "value_error",
+                "loc": ("body", "image"),
+                "msg": "Expected a file part",
+                "input": None
+            }])
+        
+        image_file = image.file if image is not None and image.filename else None
+        
+        if image_file is not None and get_settings().fast_ack_enabled:
+            # The upload is closed when this request ends; the queued job
+            # needs its own buffer.
+            image_file = await _spool_copy(image_file)
+        
+        return await _handle_detection(request, response, image_file)
+
+
+async def _spool_copy(source: BinaryIO) -> BinaryIO:
+    """Copy an uploaded file into a spooled buffer owned by the caller."""
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=get_settings().image_spool_max_bytes
+    )
+    source.seek(0)
+    await run_blocking(shutil.copyfileobj, source, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+async def _handle_detection(
+    request: DetectionRequest,
+    response: Response,
+    image_file: Optional[BinaryIO] = None
+) -> DetectionResponse:
+    """Process (or enqueue, in fast-ack mode) a validated detection."""
+    if get_settings().fast_ack_enabled:
+        return await _accept_detection(request, response, image_file)
+    
+    result = await DetectionService.process_detection(request, image_file)
+    
+    if not result.success:
         # Still return 201 for cooldown (not a server error)
-        if "cooldown" in response.message.lower():
-            return response
+        if "cooldown" in result.message.lower():
+            return result
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=response.message
+            detail=result.message
+        )
+    
+    return result
+
+
+async def _accept_detection(
+    request: DetectionRequest,
+    response: Response,
+    image_file: Optional[BinaryIO] = None
+) -> DetectionResponse:
+    """Enqueue a detection for background processing and acknowledge it."""
+    try:
+        result = await DetectionService.accept_detection(request, image_file)
+    except asyncio.QueueFull:
+        if image_file is not None:
+            image_file.close()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Detection queue is full, retry later",
+            headers={"Retry-After": "1"}
+        )
+    except QueueClosedError:
+        if image_file is not None:
+            image_file.close()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down, retry later",
+            headers={"Retry-After": "5"}
+        )
+    
+    if result.success:
+        response.status_code = status.HTTP_202_ACCEPTED
+    elif image_file is not None:
+        image_file.close()  # Not queued (cooldown)
+    
+    return result
+
+
+@router.post(
+    "/detections/batch",
+    response_model=List[DetectionResponse],
+    status_code=status.HTTP_200_OK,
+    summary="Submit Detection Batch",
+    description="Submit detections buffered by an edge device while offline. "
+                "Returns one result per item, in request order. "
+                "Requires valid API key authentication."
+)
+async def submit_detection_batch(
+    requests: List[DetectionRequest],
+    http_request: Request,
+    device: Optional[str] = Depends(verify_device)
+) -> List[DetectionResponse]:
+    """
+    Process a batch of buffered detection events.
+    
+    Cooldown is applied per device in timestamp order, and only the most
+    recent predator event per device triggers an alert. Each detection
+    counts against the rate limits.
+    
+    Returns:
+        List of DetectionResponse, one per submitted detection
+    """
+    max_batch_size = get_settings().max_batch_size
+    
+    if len(requests) > max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {max_batch_size} detections"
+        )
+    
+    for request in requests:
+        check_device(device, request.device_id)
+    
+    charge_batch(http_request, len(requests))
+    
+    return await DetectionService.process_batch(requests)
+
+
+@router.get(
+    "/detections",
+    response_model=DetectionListResponse,
+    summary="List Detections",
+    description="Detection history, newest first, with cursor pagination. "
+                "Requires valid API key authentication; a per-device key "
+                "only lists its own device's detections."
+)
+async def list_detections(
+    device_id: Optional[str] = None,
+    animal: Optional[str] = None,
+    is_predator: Optional[bool] = None,
+    since: Optional[datetime] = Query(
+        None, description="Only detections stored at or after this time (ISO 8601)"
+    ),
+    until: Optional[datetime] = Query(
+        None, description="Only detections stored before this time (ISO 8601)"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="``next_cursor`` of the previous page"
+    ),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    device: Optional[str] = Depends(verify_device)
+) -> DetectionListResponse:
+    """
+    List stored detections, newest first.
+    
+    Recent pages are served from the in-process history cache; older pages
+    query Firestore (see ``DetectionHistory``).
+    
+    Returns:
+        DetectionListResponse with one page and the cursor of the next
+    """
+    if device is not None:
+        check_device(device, device_id or device)
+        device_id = device
+    
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    query = HistoryQuery(
+        device_id=device_id.strip() if device_id else None,
+        animal=animal.strip().lower() if animal else None,
+        is_predator=is_predator,
+        since=since,
+        until=until,
+        cursor=position,
+        limit=limit
+    )
+    
+    try:
+        return await get_detection_history().page(query)
+    except Exception as e:
+        print(f"Error listing detections: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Query error: {str(e)}"
         )
+
+
+@router.get(
+    "/detections/stats",
+    response_model=DetectionStatsResponse,
+    summary="Get Detection Counts",
+    description="Detection, predator and alert counts per device and animal "
+                "over a time range (default: the last 7 days), read from the "
+                "hourly rollups. Requires valid API key authentication; a "
+                "per-device key only sees its own device."
+)
+async def detection_stats(
+    since: Optional[datetime] = Query(
+        None, description="Start of the range, rounded down to the hour (ISO 8601)"
+    ),
+    until: Optional[datetime] = Query(None, description="End of the range (ISO 8601)"),
+    interval: Literal["hour", "day", "total"] = "day",
+    device_id: Optional[str] = None,
+    animal: Optional[str] = None,
+    device: Optional[str] = Depends(verify_device)
+) -> DetectionStatsResponse:
+    """
+    Count detections from the hourly rollups (see ``DetectionRollups``).
     
-    return response
+    Returns:
+        DetectionStatsResponse with range totals and one bucket per
+        interval, device and animal
+    """
+    if device is not None:
+        check_device(device, device_id or device)
+        device_id = device
+    
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=7)
+    
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    
+    if since >= until or until - since > MAX_STATS_RANGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range must be positive and at most {MAX_STATS_RANGE.days} days"
+        )
+    
+    try:
+        return await get_detection_rollups().summarize(
+            since,
+            until,
+            interval=interval,
+            device_id=device_id.strip() if device_id else None,
+            animal=animal.strip().lower() if animal else None
+        )
+    except RollupReadLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{e}; narrow the range or filter by device_id or animal"
+        )
+    except Exception as e:
+        print(f"Error reading detection rollups: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Query error: {str(e)}"
+        )
+
+
+@router.get(
+    "/detections/stream",
+    response_class=EventStreamResponse,
+    status_code=status.HTTP_200_OK,  # EventStreamResponse has no default for the docs
+    summary="Stream Detections",
+    description="Server-Sent Events stream of detections as they are stored "
+                "(``detection`` events) and updated by higher-confidence "
+                "repeats (``update`` events). Requires valid API key "
+                "authentication; a per-device key only streams its own device."
+)
+async def stream_detections(
+    device_id: Optional[str] = Query(None, description="Comma-separated device IDs"),
+    animal: Optional[str] = None,
+    is_predator: Optional[bool] = None,
+    device: Optional[str] = Depends(verify_device)
+) -> EventStreamResponse:
+    """
+    Stream stored detections matching the filters.
+    
+    Events come from this process only (see ``DetectionBroadcaster``). A
+    client that falls behind is disconnected; it should reconnect and
+    backfill from ``GET /api/detections``.
+    """
+    device_ids = None
+    if device_id:
+        device_ids = frozenset(d.strip() for d in device_id.split(",") if d.strip())
+    
+    if device is not None:
+        for requested in device_ids or ():
+            check_device(device, requested)
+        device_ids = frozenset([device])
+    
+    try:
+        subscription = get_detection_broadcaster().subscribe(
+            device_ids=device_ids,
+            animal=animal.strip().lower() if animal else None,
+            is_predator=is_predator
+        )
+    except StreamFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    
+    return EventStreamResponse(subscription, retry_ms=STREAM_RETRY_MS)
 
 
 @router.get(
@@ -59,8 +454,21 @@ async def detection_status(
     api_key: str = Depends(verify_api_key)
 ):
     """Get detection system operational status."""
+    spool = get_detection_spool()
+    
     return {
         "operational": True,
+        "alert_config_cache": get_alert_config_cache().stats(),
+        "device_credentials": get_device_credentials().stats(),
+        "rate_limit": get_rate_limiter().stats(),
+        "image_normalization": get_image_normalizer().stats(),
+        "image_dedup": get_image_dedup().stats(),
+        "cloudinary_uploads": get_cloudinary_client().stats(),
+        "firestore_writes": get_write_buffer().stats(),
+        "detection_history": get_detection_history().stats(),
+        "detection_rollups": get_detection_rollups().stats(),
+        "detection_stream": get_detection_broadcaster().stats(),
+        "spool_pending": await run_blocking(spool.depth) if spool else None,
         "cooldown_seconds": 30,
         "predator_animals": [
             "Bear", "Elephant", "Leopard", "Monkey", 
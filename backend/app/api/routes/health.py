@@ -1,8 +1,10 @@
 """Health check endpoints."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
 from datetime import datetime
 
+from app.services.warmup import get_warmup
+
 
 router = APIRouter(tags=["Health"])
 
@@ -22,6 +24,27 @@ async def health_check():
     }
 
 
+@router.get("/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness check, separate from the ``/health`` liveness check.
+    
+    Answers 503 until the startup warmup has finished, so a deploy or load
+    balancer check can tell when requests stop paying for connection setup.
+    
+    Returns:
+        Readiness status and the outcome of each warmup step
+    """
+    warmup = get_warmup()
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    
+    return {
+        "status": "ready" if warmup.ready else "warming_up",
+        **warmup.stats()
+    }
+
+
 @router.get("/")
 async def root():
     """Root endpoint with API information."""
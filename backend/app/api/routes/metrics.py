@@ -0,0 +1,32 @@
+"""Prometheus metrics endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.executor import run_blocking
+from app.core.metrics import QUEUE_DEPTH, render_metrics
+from app.services.ingest_queue import get_ingest_queue
+from app.services.spool import get_detection_spool
+from app.services.write_buffer import get_write_buffer
+
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Request counts, per-stage latency histograms, cooldown results, queue
+    depths and dependency errors in the Prometheus text format.
+    """
+    QUEUE_DEPTH.set(get_ingest_queue().depth, "ingest")
+    QUEUE_DEPTH.set(get_write_buffer().depth, "firestore_writes")
+    
+    spool = get_detection_spool()
+    if spool is not None:
+        QUEUE_DEPTH.set(await run_blocking(spool.depth), "spool")
+    
+    return PlainTextResponse(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
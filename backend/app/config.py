@@ -1,7 +1,8 @@
 """Application configuration using Pydantic Settings."""
 
-from functools import lru_cache
-from typing import List
+import hashlib
+from functools import cached_property, lru_cache
+from typing import Callable, Dict, FrozenSet, List
 from pydantic_settings import BaseSettings
 
 
@@ -17,13 +18,95 @@ class Settings(BaseSettings):
     cloudinary_cloud_name: str = ""
     cloudinary_api_key: str = ""
     cloudinary_api_secret: str = ""
+    cloudinary_api_url: str = "https://api.cloudinary.com"
+    cloudinary_connect_timeout: float = 5.0
+    cloudinary_read_timeout: float = 30.0
+    cloudinary_max_retries: int = 3  # Timeouts, connection errors, 429 and 5xx
+    cloudinary_retry_backoff_seconds: float = 0.5
     
     # API Security
-    api_keys: str = ""
+    api_keys: str = ""  # Shared keys, valid for any device
+    device_keys_source: str = ""  # Per-device keys: "file" or "firestore"
+    device_keys_path: str = "./device_keys.json"
+    device_keys_poll_seconds: int = 5
     
     # Detection Settings
     cooldown_seconds: int = 30
     predator_animals: str = "Bear,Elephant,Leopard,Monkey,Snake,Tiger,Wild-Boar,Porcupine"
+    cooldown_species_seconds: str = ""  # Per-species windows, e.g. "tiger:15,monkey:60"
+    cooldown_max_entries: int = 10000  # ~ devices x species seen per window
+    cooldown_backend: str = "memory"  # "memory" (single worker) or "sqlite" (shared)
+    cooldown_db_path: str = "./cooldown.db"
+    
+    # Token-bucket rate limits on POST /api/detections* (0 disables)
+    rate_limit_per_second: float = 0  # Per device (per key and address for shared keys)
+    rate_limit_burst: float = 10
+    rate_limit_global_per_second: float = 0  # Whole fleet, protects quotas
+    rate_limit_global_burst: float = 100
+    rate_limit_max_buckets: int = 10000
+    
+    # Maximum detections accepted by POST /api/detections/batch
+    max_batch_size: int = 1000
+    
+    # Alert config cache (also refreshed by a Firestore listener)
+    alert_config_ttl_seconds: int = 60
+    
+    # Fast-ack ingestion (queue detections, respond 202)
+    fast_ack_enabled: bool = False
+    ingest_queue_size: int = 100
+    ingest_workers: int = 4
+    
+    # Request body limits, enforced while the body streams in (0: unlimited)
+    max_request_bytes: int = 8 * 1024 * 1024
+    route_body_limits: str = "/api/detections/batch:33554432"  # "path:bytes" pairs
+    
+    # Images held in memory up to this size, then spooled to disk
+    image_spool_max_bytes: int = 1024 * 1024
+
+    # Durable local spool (detections survive Firestore/Cloudinary outages)
+    spool_enabled: bool = False
+    spool_path: str = "./spool.db"
+    spool_lease_seconds: int = 60  # Live pipeline's head start before a replay
+    spool_replay_interval_seconds: int = 5
+    spool_max_backoff_seconds: int = 300
+
+    # Blocking I/O thread pools
+    io_max_workers: int = 16
+    upload_max_workers: int = 4  # Also the Cloudinary connection pool size
+    cpu_max_workers: int = 2  # Process pool for image processing
+    
+    # Concurrent Firestore commits; writes arriving meanwhile are batched
+    firestore_max_commits: int = 4
+    
+    # Most recent detections served by GET /api/detections from memory
+    detection_cache_size: int = 500  # 0 disables
+    detection_cache_refresh_seconds: int = 60  # Reload (picks up other workers' writes)
+    
+    # Hourly and daily rollups (detection_rollups, detection_rollups_daily)
+    # are flushed from memory this often
+    rollup_flush_seconds: int = 10
+    stats_max_rollup_reads: int = 20000  # Per stats query; more answers 400
+    
+    # Startup warmup (see app.services.warmup)
+    warmup_enabled: bool = True  # Open Firestore/FCM/Cloudinary connections at startup
+    warmup_timeout_seconds: float = 10  # Then serve anyway; 0 serves at once
+    
+    # Live detection stream (GET /api/detections/stream)
+    stream_max_subscribers: int = 10000  # Per process; needs as many file descriptors
+    # Undelivered events before a subscriber is dropped; above max_batch_size,
+    # since a batch is published at once (events are shared, ~8 bytes each)
+    stream_queue_size: int = 4096
+    stream_heartbeat_seconds: int = 15
+    
+    # Image normalization before upload (requires Pillow)
+    image_normalize_enabled: bool = False
+    image_max_dimension: int = 1280
+    image_jpeg_quality: int = 80
+    
+    # Reuse the URL of an identical (or near-identical) earlier upload
+    image_dedup_max_entries: int = 1000  # 0 disables
+    image_dedup_perceptual: bool = False  # Also match near-identical frames (Pillow)
+    image_dedup_max_distance: int = 4  # Differing bits of 64 in the perceptual hash
     
     # Server
     host: str = "0.0.0.0"
@@ -40,6 +123,39 @@ class Settings(BaseSettings):
         """Parse predator animals from comma-separated string."""
         return [animal.strip().lower() for animal in self.predator_animals.split(",")]
     
+    # Parsed once per Settings instance (the instance is cached by
+    # get_settings), so hot paths do O(1) lookups instead of re-parsing.
+    
+    @cached_property
+    def predator_animals_set(self) -> FrozenSet[str]:
+        """Lower-cased predator animals."""
+        return frozenset(animal for animal in self.predator_animals_list if animal)
+    
+    @cached_property
+    def api_key_digests(self) -> FrozenSet[bytes]:
+        """SHA-256 digests of the configured API keys (see ``hash_api_key``)."""
+        return frozenset(hash_api_key(key) for key in self.api_keys_list)
+    
+    @cached_property
+    def cooldown_species_map(self) -> Dict[str, int]:
+        """Parse per-species cooldown windows from "animal:seconds" pairs."""
+        windows = {}
+        for pair in self.cooldown_species_seconds.split(","):
+            if ":" in pair:
+                animal, seconds = pair.split(":", 1)
+                windows[animal.strip().lower()] = int(seconds)
+        return windows
+    
+    @cached_property
+    def route_body_limit_map(self) -> Dict[str, int]:
+        """Parse per-route body limits from "path:bytes" pairs."""
+        limits = {}
+        for pair in self.route_body_limits.split(","):
+            if ":" in pair:
+                path, limit = pair.rsplit(":", 1)
+                limits[path.strip()] = int(limit)
+        return limits
+    
     @property
     def cloudinary_configured(self) -> bool:
         """Check if Cloudinary credentials are configured."""
@@ -54,7 +170,54 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
+def hash_api_key(api_key: str) -> bytes:
+    """
+    Digest an API key for lookup.
+    
+    Keys are matched by digest in a set: lookup time is independent of the
+    number of keys, and of how much of a guessed key matches a real one.
+    """
+    return hashlib.sha256(api_key.encode()).digest()
+
+
 @lru_cache()
 def get_settings() -> Settings:
     """Get cached settings instance."""
     return Settings()
+
+
+# Run by reload_settings(); see on_settings_reload
+_reload_callbacks: List[Callable[[], None]] = []
+
+
+def on_settings_reload(callback: Callable[[], None]) -> None:
+    """Register a callback (typically dropping a singleton) run on reload."""
+    _reload_callbacks.append(callback)
+
+
+def reload_settings() -> Settings:
+    """
+    Re-read settings from the environment and ``.env`` (on ``SIGHUP``).
+    
+    Takes effect for code that calls ``get_settings()`` per request (API
+    keys, predator animals, cooldown windows, body and batch size limits)
+    and for the components rebuilt on reload: the rate limiter, the image
+    normalizer and the image dedup cache (their counters and cached state
+    start over).
+    
+    Components holding connections, queued work or cooldown windows keep
+    the settings they were created with until the process restarts: the
+    cooldown backend, write-behind buffer, ingest queue (and whether
+    fast-ack is on), spool, thread and process pools, Cloudinary client,
+    history cache, rollups, live streams and Firebase.
+    
+    Raises:
+        pydantic.ValidationError: If the new settings are invalid; the
+            running settings are kept
+    """
+    Settings()  # Validate before dropping the running settings
+    get_settings.cache_clear()
+    settings = get_settings()
+    for callback in _reload_callbacks:
+        callback()
+    return settings
@@ -0,0 +1,103 @@
+"""Request body size limits, enforced while the body streams in.
+
+A declared ``Content-Length`` above the limit is rejected before anything is
+read. Chunked or under-declared bodies are counted as they arrive and cut off
+with ``413`` as soon as they cross the limit, so an oversized image payload
+is never buffered in full.
+
+The limit is ``MAX_REQUEST_BYTES``, overridden per path prefix by
+``ROUTE_BODY_LIMITS`` (the longest matching prefix wins).
+"""
+
+import json
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import get_settings
+
+
+class RequestTooLarge(HTTPException):
+    """Raised from ``receive`` when a streaming body crosses its limit."""
+    
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds {limit} bytes"
+        )
+
+
+def body_limit(path: str, default: int, routes: Dict[str, int]) -> int:
+    """Byte limit for a request path (0 means unlimited)."""
+    best: Optional[Tuple[int, int]] = None
+    for prefix, limit in routes.items():
+        if path.startswith(prefix) and (best is None or len(prefix) > best[0]):
+            best = (len(prefix), limit)
+    return best[1] if best is not None else default
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware enforcing per-route body size limits."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        settings = get_settings()
+        limit = body_limit(
+            scope["path"], settings.max_request_bytes, settings.route_body_limit_map
+        )
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+        
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await self._reject(send, limit)
+                    return
+                break
+        
+        received = 0
+        response_started = False
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLarge(limit)
+            return message
+        
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            # Read outside the routing layer (e.g. by other middleware)
+            if response_started:
+                raise
+            await self._reject(send, limit)
+    
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps({"detail": f"Request body exceeds {limit} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
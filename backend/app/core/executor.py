@@ -0,0 +1,117 @@
+"""Bounded thread pools for blocking SDK calls.
+
+The Firebase Admin and Cloudinary SDKs are synchronous. Calling them directly
+from an ``async`` handler stalls the event loop, so every remote call in the
+detection path goes through :func:`run_blocking` instead.
+
+Two pools are kept apart on purpose: image uploads are slow and bursty, and
+must not starve the short Firestore/FCM calls made by image-less requests.
+
+CPU-bound work (image decoding and re-encoding) holds the GIL, so it runs on
+a separate process pool through :func:`run_in_process`.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.config import get_settings
+
+
+T = TypeVar("T")
+
+# Pool names
+IO_POOL = "io"          # Firestore reads/writes, FCM sends
+UPLOAD_POOL = "upload"  # Cloudinary uploads
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor(pool: str = IO_POOL) -> ThreadPoolExecutor:
+    """Get (or lazily create) the bounded executor for a pool."""
+    executor = _executors.get(pool)
+    
+    if executor is None:
+        settings = get_settings()
+        max_workers = {
+            IO_POOL: settings.io_max_workers,
+            UPLOAD_POOL: settings.upload_max_workers,
+        }[pool]
+        
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"predator-{pool}"
+        )
+        _executors[pool] = executor
+    
+    return executor
+
+
+async def run_blocking(
+    func: Callable[..., T],
+    *args: Any,
+    pool: str = IO_POOL,
+    **kwargs: Any
+) -> T:
+    """
+    Run a blocking callable on a bounded thread pool.
+    
+    Args:
+        func: Synchronous callable to run
+        *args: Positional arguments for ``func``
+        pool: Name of the pool to run on (``IO_POOL`` or ``UPLOAD_POOL``)
+        **kwargs: Keyword arguments for ``func``
+        
+    Returns:
+        Whatever ``func`` returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(pool),
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get (or lazily create) the process pool for CPU-bound work."""
+    global _process_pool
+    
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=get_settings().cpu_max_workers,
+            # Forking a process that runs SDK threads can deadlock the child
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    return _process_pool
+
+
+async def run_in_process(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a CPU-bound, picklable callable on the process pool.
+    
+    Args:
+        func: Module-level function to run
+        *args: Picklable positional arguments for ``func``
+        
+    Returns:
+        Whatever ``func`` returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down all pools, optionally waiting for in-flight calls."""
+    global _process_pool
+    
+    for executor in _executors.values():
+        executor.shutdown(wait=wait)
+    _executors.clear()
+    
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=wait)
+        _process_pool = None
@@ -1,17 +1,24 @@
 """Firebase Admin SDK initialization for Firestore and FCM only.
 
 Note: Image storage is handled by Cloudinary, NOT Firebase Storage.
+
+The SDK is imported on initialization rather than with this module, so its
+import cost is paid by the startup warmup (in parallel with the other
+dependencies) instead of before the server starts.
 """
 
 import os
-from typing import Optional
-import firebase_admin
-from firebase_admin import credentials, firestore, messaging
+import threading
+from typing import TYPE_CHECKING, Optional
 from app.config import get_settings
 
+if TYPE_CHECKING:
+    import firebase_admin
+
 
-_firebase_app: Optional[firebase_admin.App] = None
+_firebase_app: Optional["firebase_admin.App"] = None
 _firestore_client = None
+_init_lock = threading.Lock()
 
 
 def initialize_firebase() -> None:
@@ -21,40 +28,50 @@ def initialize_firebase() -> None:
     if _firebase_app is not None:
         return
     
-    settings = get_settings()
-    
-    cred_path = settings.google_application_credentials
-    json_creds = settings.google_application_credentials_json
-    
-    # Priority 1: JSON from environment variable (Render)
-    if json_creds:
-        import json
-        try:
-            cred_dict = json.loads(json_creds)
-            cred = credentials.Certificate(cred_dict)
-            print("[+] Loaded Firebase credentials from environment JSON")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in google_application_credentials_json: {e}")
-            
-    # Priority 2: File path (Local Development)
-    elif os.path.exists(cred_path):
-        cred = credentials.Certificate(cred_path)
-        print(f"[+] Loaded Firebase credentials from file: {cred_path}")
+    with _init_lock:
+        # Another thread (warmup or a first request) may have finished it
+        if _firebase_app is not None:
+            return
         
-    else:
-        raise FileNotFoundError(
-            f"Firebase credentials not found. Set GOOGLE_APPLICATION_CREDENTIALS_JSON env var or place file at {cred_path}"
-        )
-    
-    # Initialize WITHOUT storage bucket (using Cloudinary instead)
-    _firebase_app = firebase_admin.initialize_app(cred)
-    
-    _firestore_client = firestore.client()
-    
-    print(f"[+] Firebase initialized for project: {settings.firebase_project_id}")
-    print("  - Firestore: Enabled")
-    print("  - FCM: Enabled")
-    print("  - Storage: Using Cloudinary instead")
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        
+        settings = get_settings()
+        
+        cred_path = settings.google_application_credentials
+        json_creds = settings.google_application_credentials_json
+        
+        # Priority 1: JSON from environment variable (Render)
+        if json_creds:
+            import json
+            try:
+                cred_dict = json.loads(json_creds)
+                cred = credentials.Certificate(cred_dict)
+                print("[+] Loaded Firebase credentials from environment JSON")
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in google_application_credentials_json: {e}")
+        
+        # Priority 2: File path (Local Development)
+        elif os.path.exists(cred_path):
+            cred = credentials.Certificate(cred_path)
+            print(f"[+] Loaded Firebase credentials from file: {cred_path}")
+        
+        else:
+            raise FileNotFoundError(
+                f"Firebase credentials not found. Set GOOGLE_APPLICATION_CREDENTIALS_JSON env var or place file at {cred_path}"
+            )
+        
+        # Initialize WITHOUT storage bucket (using Cloudinary instead)
+        app = firebase_admin.initialize_app(cred)
+        
+        # Client first: _firebase_app marks initialization as done
+        _firestore_client = firestore.client(app)
+        _firebase_app = app
+        
+        print(f"[+] Firebase initialized for project: {settings.firebase_project_id}")
+        print("  - Firestore: Enabled")
+        print("  - FCM: Enabled")
+        print("  - Storage: Using Cloudinary instead")
 
 
 def get_firestore():
@@ -0,0 +1,259 @@
+"""In-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms served by ``GET /metrics``. Recording a
+value is a dict lookup and a few additions on the event loop, cheap enough
+to leave on in production. Each worker process keeps its own values.
+
+``MetricsMiddleware`` counts requests and their latency per route path
+template, never per raw path, so label cardinality stays bounded.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+
+# Latency buckets in seconds, 5 ms to 30 s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+    
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, names, values, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+    
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+    
+    def samples(self):
+        for labelvalues, value in list(self._values.items()):
+            yield "", self.labelnames, labelvalues, value
+
+
+class Gauge(_Metric):
+    """Current value per label set (set when scraped or as things change)."""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+    
+    def samples(self):
+        for labelvalues, value in list(self._values.items()):
+            yield "", self.labelnames, labelvalues, value
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labelvalues", "_start")
+    
+    def __init__(self, histogram: "Histogram", labelvalues: Tuple[str, ...]):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+    
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labelvalues)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets, per label set."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List] = {}
+    
+    def observe(self, value: float, *labelvalues: str) -> None:
+        state = self._values.get(labelvalues)
+        if state is None:
+            state = self._values[labelvalues] = [[0] * (len(self._buckets) + 1), 0.0]
+        state[0][bisect_left(self._buckets, value)] += 1
+        state[1] += value
+    
+    def time(self, *labelvalues: str) -> _Timer:
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labelvalues)
+    
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for labelvalues, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, labelvalues + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, labelvalues, total
+            yield "_count", self.labelnames, labelvalues, cumulative
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Shared metrics, recorded across the app
+
+HTTP_REQUESTS = Counter(
+    "predator_http_requests_total",
+    "HTTP requests by route template, method and status",
+    ("route", "method", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "predator_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("route",)
+)
+STAGE_DURATION = Histogram(
+    "predator_stage_duration_seconds",
+    "Detection pipeline stage latency "
+    "(decode, normalize, upload, persist, alert_config, fcm_send)",
+    ("stage",)
+)
+COOLDOWN_CHECKS = Counter(
+    "predator_cooldown_checks_total",
+    "Cooldown checks by result (acquired, escalated, suppressed)",
+    ("result",)
+)
+DEPENDENCY_ERRORS = Counter(
+    "predator_dependency_errors_total",
+    "Failed calls by dependency (firestore, cloudinary, fcm, spool)",
+    ("dependency",)
+)
+DEPENDENCY_RETRIES = Counter(
+    "predator_dependency_retries_total",
+    "Retried calls by dependency",
+    ("dependency",)
+)
+IMAGE_NORMALIZATIONS = Counter(
+    "predator_image_normalizations_total",
+    "Images normalized before upload by result (ok, failed)",
+    ("result",)
+)
+IMAGE_NORMALIZATION_BYTES = Counter(
+    "predator_image_normalization_bytes_total",
+    "Image bytes before (in) and after (out) normalization",
+    ("direction",)
+)
+IMAGE_DEDUP_LOOKUPS = Counter(
+    "predator_image_dedup_lookups_total",
+    "Image dedup lookups by result (exact, perceptual, miss)",
+    ("result",)
+)
+IMAGE_DEDUP_BYTES_SAVED = Counter(
+    "predator_image_dedup_bytes_saved_total",
+    "Image upload bytes skipped by reusing an earlier upload"
+)
+QUEUE_DEPTH = Gauge(
+    "predator_queue_depth",
+    "Items waiting per queue (ingest, spool, firestore_writes)",
+    ("queue",)
+)
+
+
+def _route_template(scope) -> str:
+    """Path template of the route serving a request ("unmatched" if none)."""
+    for route in getattr(scope.get("app"), "routes", ()):
+        match, _ = route.matches(scope)
+        if match is not Match.NONE:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and their latency per route."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_template(scope)
+            HTTP_REQUESTS.inc(route, scope["method"], str(status))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, route)
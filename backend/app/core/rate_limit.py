@@ -0,0 +1,283 @@
+"""Token-bucket rate limiting at the ingest edge.
+
+Runs as plain ASGI middleware, so an over-limit request is rejected with
+``429`` and a ``Retry-After`` header before its body (possibly a multi-MB
+base64 image) is read or validated.
+
+Each caller gets a bucket of ``RATE_LIMIT_BURST`` tokens, refilled at
+``RATE_LIMIT_PER_SECOND``. A per-device key is its own caller. Shared keys
+are split by client address, so one noisy device does not throttle the
+fleet. A global bucket (``RATE_LIMIT_GLOBAL_PER_SECOND``) caps the total
+load on Cloudinary and Firestore quotas. Requests without a valid key share
+one bucket of their own and never draw on the global one, so a flood of
+requests that authentication rejects cannot throttle the fleet.
+
+A request costs one token per detection. The middleware charges one; the
+batch endpoint charges the rest once the body is parsed (see
+:func:`charge_batch`). A request larger than the burst is let through when
+the bucket is full and leaves it in debt, which later requests wait out.
+"""
+
+import json
+import math
+import time
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from fastapi import HTTPException, Request, status
+
+from app.config import get_settings, hash_api_key, on_settings_reload
+from app.services.device_credentials import get_device_credentials
+
+
+# Requests that consume tokens: POSTs to these path prefixes
+_LIMITED_PREFIXES = ("/api/detections",)
+
+# Bucket key shared by requests without a valid key
+_UNAUTHENTICATED = "unauthenticated"
+
+
+class TokenBucket:
+    """Bucket of ``burst`` tokens refilled continuously at ``rate`` per second."""
+    
+    __slots__ = ("rate", "burst", "tokens", "updated")
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+    
+    def wait(self, now: float, cost: float = 1, paid: float = 0) -> float:
+        """
+        Refill the bucket and check whether it can pay ``cost`` tokens.
+        
+        A request costing more than the burst only needs a full bucket (and
+        leaves it in debt once taken). ``paid`` is what the same request
+        already took, for a request charged in two steps.
+        
+        Returns:
+            0 if the tokens can be taken, otherwise seconds until they can
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+        needed = min(cost + paid, self.burst) - paid
+        if self.tokens >= needed:
+            return 0.0
+        
+        return (needed - self.tokens) / self.rate
+    
+    def take(self, cost: float = 1) -> None:
+        """Take tokens after :meth:`wait` returned 0."""
+        self.tokens -= cost
+
+
+class RateLimiter:
+    """Per-caller and global token buckets with bounded memory."""
+    
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        global_rate: float,
+        global_burst: float,
+        max_buckets: int,
+        max_cost: float = 1
+    ):
+        self.rate = rate
+        self.burst = burst
+        # An idle bucket refills completely within this time, even from the
+        # debt of the largest request, so evicting it is equivalent to
+        # keeping it.
+        refill_seconds = (burst + max_cost) / rate if rate > 0 else 1
+        self._buckets: TTLCache = TTLCache(maxsize=max_buckets, ttl=refill_seconds)
+        self._global = (
+            TokenBucket(global_rate, global_burst, time.monotonic())
+            if global_rate > 0 else None
+        )
+        self.limited = 0
+        self.limited_global = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self._global is not None
+    
+    def check(self, caller: Optional[str], cost: float = 1, paid: float = 0) -> float:
+        """
+        Take ``cost`` tokens for ``caller`` (None: unauthenticated) and the fleet.
+        
+        Tokens are only taken when both buckets can pay, so a request
+        rejected by one bucket costs nothing in the other. Unauthenticated
+        requests share one bucket and are not charged to the global one:
+        authentication rejects them before they reach any quota.
+        
+        Args:
+            caller: Rate-limit key from :func:`caller_identity`
+            cost: Tokens to take
+            paid: Tokens the same request already took
+        
+        Returns:
+            0 if the request may proceed, otherwise seconds to wait
+        """
+        now = time.monotonic()
+        
+        bucket = None
+        if self.rate > 0:
+            key = caller if caller is not None else _UNAUTHENTICATED
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, now)
+            # Re-inserting refreshes the bucket's TTL
+            self._buckets[key] = bucket
+            
+            wait = bucket.wait(now, cost, paid)
+            if wait:
+                self.limited += 1
+                return wait
+        
+        charge_global = self._global is not None and caller is not None
+        if charge_global:
+            wait = self._global.wait(now, cost, paid)
+            if wait:
+                self.limited_global += 1
+                return wait
+            self._global.take(cost)
+        
+        if bucket is not None:
+            bucket.take(cost)
+        
+        return 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Bucket table size and rejection counters."""
+        return {
+            "buckets": len(self._buckets),
+            "limited": self.limited,
+            "limited_global": self.limited_global
+        }
+
+
+def caller_identity(authorization: Optional[str], client_host: Optional[str]) -> Optional[str]:
+    """
+    Rate-limit key for a request, from its headers only.
+    
+    Returns:
+        The device_id of a per-device key, the key digest plus client address
+        for a shared key, or None if the key is missing or invalid
+    """
+    if not authorization:
+        return None
+    
+    api_key = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    
+    device_id = get_device_credentials().lookup(api_key)
+    if device_id is not None:
+        return f"device:{device_id}"
+    
+    digest = hash_api_key(api_key)
+    if digest in get_settings().api_key_digests:
+        return f"key:{digest.hex()[:16]}:{client_host}"
+    
+    return None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware rejecting over-limit ingest requests before the body is read."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(_LIMITED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        limiter = get_rate_limiter()
+        if not limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        
+        client = scope.get("client")
+        caller = caller_identity(authorization, client[0] if client else None)
+        
+        wait = limiter.check(caller)
+        if not wait:
+            # For charge_batch, once the body is parsed
+            scope.setdefault("state", {})["rate_limit_caller"] = caller
+            await self.app(scope, receive, send)
+            return
+        
+        body = json.dumps({"detail": "Rate limit exceeded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def charge_batch(request: Request, count: int) -> None:
+    """
+    Charge a batch's detections beyond the one the middleware took.
+    
+    Raises:
+        HTTPException: 429 with ``Retry-After`` if the caller or the fleet
+            is over its limit
+    """
+    limiter = get_rate_limiter()
+    if count <= 1 or not limiter.enabled:
+        return
+    
+    caller = getattr(request.state, "rate_limit_caller", None)
+    wait = limiter.check(caller, cost=count - 1, paid=1)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded, retry later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter."""
+    global _rate_limiter
+    
+    if _rate_limiter is None:
+        settings = get_settings()
+        _rate_limiter = RateLimiter(
+            rate=settings.rate_limit_per_second,
+            burst=settings.rate_limit_burst,
+            global_rate=settings.rate_limit_global_per_second,
+            global_burst=settings.rate_limit_global_burst,
+            max_buckets=settings.rate_limit_max_buckets,
+            max_cost=settings.max_batch_size
+        )
+    
+    return _rate_limiter
+
+
+def _reset_rate_limiter() -> None:
+    global _rate_limiter
+    
+    _rate_limiter = None
+
+
+on_settings_reload(_reset_rate_limiter)
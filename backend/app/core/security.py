@@ -1,21 +1,24 @@
 """Security utilities for API authentication."""
 
+from typing import Optional, Tuple
 from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
-from app.config import get_settings
+from app.config import get_settings, hash_api_key
+from app.services.device_credentials import get_device_credentials
 
 
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
 
 
-async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
+def _authenticate(api_key: Optional[str]) -> Tuple[str, Optional[str]]:
     """
-    Verify the API key from the Authorization header.
+    Validate an Authorization header value.
     
-    Expected format: Bearer <api_key>
+    Per-device keys (see ``DeviceCredentialStore``) are checked first, then
+    the shared ``API_KEYS``, which are not bound to a device.
     
     Returns:
-        str: The validated API key
+        Tuple of (API key, device_id bound to it or None for a shared key)
         
     Raises:
         HTTPException: If API key is missing or invalid
@@ -30,19 +33,66 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
     if api_key.startswith("Bearer "):
         api_key = api_key[7:]
     
+    credentials = get_device_credentials()
+    device_id = credentials.lookup(api_key)
+    if device_id is not None:
+        return api_key, device_id
+    
     settings = get_settings()
-    valid_keys = settings.api_keys_list
+    valid_digests = settings.api_key_digests
     
-    if not valid_keys:
+    if not valid_digests and not credentials.enabled:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="No API keys configured on server"
         )
     
-    if api_key not in valid_keys:
+    if hash_api_key(api_key) not in valid_digests:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
     
-    return api_key
+    return api_key, None
+
+
+async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
+    """
+    Verify the API key from the Authorization header.
+    
+    Expected format: Bearer <api_key>
+    
+    Returns:
+        str: The validated API key
+        
+    Raises:
+        HTTPException: If API key is missing or invalid
+    """
+    return _authenticate(api_key)[0]
+
+
+async def verify_device(api_key: str = Security(api_key_header)) -> Optional[str]:
+    """
+    Verify the API key and return the device it belongs to.
+    
+    Returns:
+        The authenticated device_id, or None for a shared (fleet) key
+        
+    Raises:
+        HTTPException: If API key is missing or invalid
+    """
+    return _authenticate(api_key)[1]
+
+
+def check_device(authenticated_device: Optional[str], device_id: str) -> None:
+    """
+    Ensure a per-device key only submits detections for its own device.
+    
+    Raises:
+        HTTPException: 403 if the key belongs to a different device
+    """
+    if authenticated_device is not None and authenticated_device != device_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API key is not valid for device '{device_id}'"
+        )
@@ -0,0 +1,92 @@
+"""Early notice of the server shutting down, for long-lived responses.
+
+On SIGTERM/SIGINT, uvicorn stops accepting connections and waits (up to
+``--timeout-graceful-shutdown``) for the open ones to finish before it runs
+the lifespan shutdown. A stream that is only ended from the lifespan keeps
+the process up until it is killed, which skips draining the ingest queue,
+closing the spool and flushing the rollups.
+
+:func:`install_signal_hook` wraps uvicorn's exit handler so the callbacks
+registered with :func:`on_shutdown` run on the event loop as soon as the
+signal arrives, before uvicorn waits for connections. uvicorn has no hook
+for this, so the wrapper relies on its internals and is only installed on
+the uvicorn versions it was checked against (``_UVICORN_VERSIONS``). On any
+other version, or another server, the streams end from the lifespan
+shutdown, after ``--timeout-graceful-shutdown``.
+"""
+
+import asyncio
+from typing import Callable, List, Tuple
+
+
+_callbacks: List[Callable[[], None]] = []
+_signalled = False
+
+# (major, minor) releases whose ``Server.install_signal_handlers`` binds
+# ``self.handle_exit`` when ``serve()`` starts and whose exit handler has
+# the ``(self, sig, frame)`` signature; keep in step with requirements.txt
+_UVICORN_VERSIONS: Tuple[Tuple[int, int], ...] = ((0, 27),)
+
+
+def shutting_down() -> bool:
+    """Whether the server received its shutdown signal."""
+    return _signalled
+
+
+def on_shutdown(callback: Callable[[], None]) -> None:
+    """Run ``callback`` on the event loop when the shutdown signal arrives."""
+    _callbacks.append(callback)
+
+
+def _notify() -> None:
+    for callback in list(_callbacks):
+        try:
+            callback()
+        except Exception as e:
+            print(f"[!] Shutdown callback failed: {e}")
+
+
+def _signal_received() -> None:
+    global _signalled
+    
+    if _signalled:
+        return
+    _signalled = True
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _notify()
+    else:
+        # May run inside a plain signal handler (Windows)
+        loop.call_soon_threadsafe(_notify)
+
+
+def install_signal_hook() -> None:
+    """
+    Wrap ``uvicorn.Server.handle_exit`` on supported versions (idempotent).
+    
+    Must run before the server installs its signal handlers; uvicorn imports
+    the application first, so calling this at import time is enough (also
+    with gunicorn's ``UvicornWorker``).
+    """
+    try:
+        import uvicorn
+        from uvicorn.server import Server
+    except ImportError:
+        return  # Another server: streams end from the lifespan
+    
+    if tuple(int(part) for part in uvicorn.__version__.split(".")[:2]) not in _UVICORN_VERSIONS:
+        print(f"[*] uvicorn {uvicorn.__version__} not checked for the shutdown hook; "
+              "live streams end after the graceful shutdown timeout")
+        return
+    
+    original = Server.handle_exit
+    if getattr(original, "_notifies_app", False):
+        return
+    
+    def handle_exit(self, sig, frame) -> None:
+        original(self, sig, frame)
+        _signal_received()
+    
+    handle_exit._notifies_app = True
+    Server.handle_exit = handle_exit
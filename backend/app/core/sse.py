@@ -0,0 +1,76 @@
+"""Server-Sent Events response for long-lived, mostly idle streams.
+
+Starlette's ``StreamingResponse`` runs a task group (two tasks and a cancel
+scope) per connection. ``EventStreamResponse`` awaits its source directly
+and watches for the client disconnecting with a single task that closes the
+source, keeping thousands of idle streams cheap.
+"""
+
+import asyncio
+from typing import Mapping, Optional, Protocol
+
+from starlette.responses import Response
+
+
+class EventSource(Protocol):
+    """What ``EventStreamResponse`` streams (e.g. a ``Subscription``)."""
+    
+    async def next(self) -> bytes:
+        """Next encoded frames; empty once the source is closed."""
+    
+    def close(self) -> None:
+        """Stop the source; a pending ``next`` returns empty."""
+
+
+class EventStreamResponse(Response):
+    """``text/event-stream`` response streaming an ``EventSource``."""
+    
+    media_type = "text/event-stream"
+    
+    def __init__(
+        self,
+        source: EventSource,
+        retry_ms: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None
+    ):
+        self.source = source
+        self.retry_ms = retry_ms
+        self.status_code = 200
+        self.background = None
+        self.init_headers({
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy (nginx) buffering
+            **(headers or {})
+        })
+    
+    async def __call__(self, scope, receive, send) -> None:
+        async def watch_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            self.source.close()
+        
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers
+            })
+            if self.retry_ms is not None:
+                # Reconnection delay the client should use
+                await send({
+                    "type": "http.response.body",
+                    "body": f"retry: {self.retry_ms}\n\n".encode(),
+                    "more_body": True
+                })
+            
+            while True:
+                frames = await self.source.next()
+                if not frames:
+                    break
+                await send({"type": "http.response.body", "body": frames, "more_body": True})
+            
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+            self.source.close()
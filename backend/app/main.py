@@ -4,13 +4,51 @@ Predator Alert System - FastAPI Backend
 Main application entry point with Firebase initialization and route registration.
 """
 
+import asyncio
+import signal
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.config import get_settings
-from app.core.firebase import initialize_firebase
-from app.api.routes import health, detections
+from app.config import get_settings, reload_settings
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core.executor import shutdown_executors
+from app.core.metrics import MetricsMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.shutdown import install_signal_hook, on_shutdown
+from app.services.alert_config_cache import get_alert_config_cache
+from app.services.cloudinary_client import close_cloudinary_client
+from app.services.cooldown import close_cooldown_backend
+from app.services.detection_stream import get_detection_broadcaster
+from app.services.device_credentials import get_device_credentials
+from app.services.rollups import get_detection_rollups
+from app.services.spool import close_detection_spool, get_spool_replayer
+from app.services.warmup import get_warmup
+from app.api.routes import health, detections, metrics
+
+
+# uvicorn waits for open connections before the lifespan shutdown, so live
+# streams are ended on the signal itself
+install_signal_hook()
+
+
+def _reload_on_signal() -> None:
+    """Apply an edited ``.env`` (or environment) without a restart."""
+    try:
+        reload_settings()
+    except Exception as e:
+        print(f"[!] Settings reload failed, keeping the running settings: {e}")
+    else:
+        print("[+] Settings reloaded")
+
+
+def _install_reload_signal() -> bool:
+    """Reload settings on SIGHUP (not available on Windows)."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_on_signal)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        return False  # No SIGHUP, or not on the main thread
+    return True
 
 
 @asynccontextmanager
@@ -25,25 +63,65 @@ async def lifespan(app: FastAPI):
     
     settings = get_settings()
     
-    # Initialize Firebase (Firestore + FCM)
-    try:
-        initialize_firebase()
-    except FileNotFoundError as e:
-        print(f"[!] Firebase not initialized: {e}")
-        print("   The API will start but Firebase operations will fail.")
-    except Exception as e:
-        print(f"[!] Firebase initialization error: {e}")
+    # Initialize Firebase (Firestore + FCM) and open the Firestore, FCM and
+    # Cloudinary connections in parallel, so the first alert after a cold
+    # start does not pay for them
+    warmup = get_warmup()
+    warmup.start()
+    if not await warmup.wait(settings.warmup_timeout_seconds):
+        print("[*] Serving while the warmup finishes (GET /ready)")
     
     # Initialize Cloudinary
     from app.services.cloudinary_service import initialize_cloudinary
     initialize_cloudinary()
     
+    # Load per-device API keys from a file and watch for changes. The
+    # Firestore listeners (alert config, Firestore-backed keys) need the
+    # SDK, so the warmup starts them once Firebase is initialized.
+    credentials = get_device_credentials()
+    if credentials.source != "firestore":
+        await credentials.start()
+    
+    # Start background workers for fast-ack ingestion
+    from app.services.ingest_queue import get_ingest_queue
+    if settings.fast_ack_enabled:
+        get_ingest_queue().start()
+    
+    # Deliver detections spooled during outages (or before a crash)
+    replayer = get_spool_replayer()
+    if replayer is not None:
+        replayer.start()
+    
+    # Flush hourly detection rollups in the background
+    get_detection_rollups().start()
+    
+    # End live streams as soon as the shutdown signal arrives
+    on_shutdown(get_detection_broadcaster().close)
+    
+    # Re-read settings (e.g. rate limits, dedup) on SIGHUP
+    reload_signal = _install_reload_signal()
+    
     print(f"[+] API ready on {settings.host}:{settings.port}")
     
     yield
     
     # Shutdown
     print("[*] Shutting down Predator Alert API...")
+    
+    if reload_signal:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    
+    # End live streams (if the signal did not already), then finish every
+    # accepted detection before the pools go away
+    get_detection_broadcaster().close()
+    await get_ingest_queue().drain()
+    await close_detection_spool()
+    await get_detection_rollups().stop()
+    get_alert_config_cache().stop_listener()
+    await get_device_credentials().stop()
+    close_cooldown_backend()
+    await close_cloudinary_client()
+    shutdown_executors()
 
 
 # Create FastAPI application
@@ -78,6 +156,14 @@ Authorization: Bearer <your-api-key>
 )
 
 
+# Cut off oversized bodies while they stream in
+app.add_middleware(BodySizeLimitMiddleware)
+
+
+# Reject over-limit ingest requests before their body is read
+app.add_middleware(RateLimitMiddleware)
+
+
 # CORS middleware for development
 app.add_middleware(
     CORSMiddleware,
@@ -88,9 +174,14 @@ app.add_middleware(
 )
 
 
+# Outermost: counts every request, including ones rejected above
+app.add_middleware(MetricsMiddleware)
+
+
 # Register routes
 app.include_router(health.router)
 app.include_router(detections.router)
+app.include_router(metrics.router)
 
 
 if __name__ == "__main__":
@@ -102,5 +193,7 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=settings.debug
+        reload=settings.debug,
+        # Live streams never finish on their own
+        timeout_graceful_shutdown=30
     )
@@ -1,7 +1,7 @@
 """Detection data models."""
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -59,6 +59,58 @@ class DetectionResponse(BaseModel):
     image_url: Optional[str] = None
 
 
+class DetectionRecord(BaseModel):
+    """A stored detection, as returned by the history API."""
+    
+    detection_id: str
+    device_id: str
+    animal: str
+    confidence: float
+    is_predator: bool
+    image_url: Optional[str] = None
+    detection_time: datetime
+    created_at: datetime
+    alert_sent: bool = False
+    repeat_count: int = 0
+
+
+class DetectionListResponse(BaseModel):
+    """One page of detection history, newest first."""
+    
+    detections: List[DetectionRecord]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Pass as ``cursor`` to get the next page (absent on the last page)"
+    )
+
+
+class DetectionCounts(BaseModel):
+    """Detection counters of a rollup bucket (or a whole range)."""
+    
+    detections: int = 0
+    predators: int = 0
+    alerts: int = 0
+    max_confidence: Optional[float] = None
+
+
+class DetectionStatsBucket(DetectionCounts):
+    """Counters of one device and animal in one interval."""
+    
+    start: datetime
+    device_id: str
+    animal: str
+
+
+class DetectionStatsResponse(BaseModel):
+    """Detection counts over a time range, from the hourly rollups."""
+    
+    since: datetime
+    until: datetime
+    interval: str
+    totals: DetectionCounts
+    buckets: List[DetectionStatsBucket]
+
+
 class DetectionDocument(BaseModel):
     """Firestore document model for detection records."""
     
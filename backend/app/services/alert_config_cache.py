@@ -0,0 +1,163 @@
+"""Cached access to the ``alert_config/global`` Firestore document.
+
+The alert config is read on every predator alert, the most latency-critical
+path in the service. It is cached for ``ALERT_CONFIG_TTL_SECONDS`` and kept
+fresh by a Firestore ``on_snapshot`` listener, so edits made from the app
+apply immediately without a read per alert.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.core.executor import run_blocking
+from app.core.firebase import get_firestore
+from app.core.metrics import DEPENDENCY_ERRORS
+
+
+# Used when the document does not exist (and before any successful read)
+DEFAULT_ALERT_CONFIG: Dict[str, Any] = {
+    "alert_enabled": True,
+    "siren_enabled": True,
+    "sms_enabled": False,
+    "owner_contacts": [],
+    "authority_contacts": [],
+    "fcm_topics": ["predator_alerts"]
+}
+
+
+class AlertConfigCache:
+    """TTL cache for the global alert config with last-known-good fallback."""
+    
+    def __init__(self, ttl_seconds: float):
+        self._ttl = ttl_seconds
+        # (config, monotonic time it was stored); replaced atomically
+        self._entry: Optional[Tuple[Dict[str, Any], float]] = None
+        self._last_good: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+        self._watch = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+    
+    @staticmethod
+    def _document():
+        return get_firestore().collection("alert_config").document("global")
+    
+    def _store(self, config: Dict[str, Any]) -> None:
+        self._entry = (config, time.monotonic())
+        self._last_good = config
+    
+    def _fresh(self) -> Optional[Dict[str, Any]]:
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry[1] < self._ttl:
+            return entry[0]
+        return None
+    
+    async def get(self) -> Dict[str, Any]:
+        """
+        Get the alert config, reading Firestore only when the cache is stale.
+        
+        Returns:
+            Alert configuration dictionary. If Firestore is unreachable, the
+            last known good config (or the default config) is returned.
+        """
+        config = self._fresh()
+        if config is not None:
+            self.hits += 1
+            return config
+        
+        # One read refreshes the cache for every waiting alert
+        async with self._lock:
+            config = self._fresh()
+            if config is not None:
+                self.hits += 1
+                return config
+            
+            self.misses += 1
+            
+            try:
+                doc = await run_blocking(self._document().get)
+                config = doc.to_dict() if doc.exists else dict(DEFAULT_ALERT_CONFIG)
+                self._store(config)
+                return config
+                
+            except Exception as e:
+                self.errors += 1
+                DEPENDENCY_ERRORS.inc("firestore")
+                fallback = self._last_good or DEFAULT_ALERT_CONFIG
+                print(f"[!] Error fetching alert config, using last known good: {e}")
+                return fallback
+    
+    async def warm(self) -> None:
+        """
+        Read the config now, opening the Firestore channel (at startup).
+        
+        Raises:
+            Exception: If the document could not be read
+        """
+        doc = await run_blocking(self._document().get)
+        self._store(doc.to_dict() if doc.exists else dict(DEFAULT_ALERT_CONFIG))
+    
+    def invalidate(self) -> None:
+        """Drop the cached config so the next alert reads Firestore."""
+        self._entry = None
+    
+    def start_listener(self) -> bool:
+        """
+        Start a Firestore snapshot listener that refreshes the cache.
+        
+        Returns:
+            True if the listener is running
+        """
+        if self._watch is not None:
+            return True
+        
+        try:
+            self._watch = self._document().on_snapshot(self._on_snapshot)
+            print("[+] Alert config listener started")
+            return True
+        except Exception as e:
+            print(f"[!] Alert config listener not started (TTL only): {e}")
+            return False
+    
+    def stop_listener(self) -> None:
+        """Stop the snapshot listener, if running."""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+    
+    def _on_snapshot(self, snapshots, changes, read_time) -> None:
+        """Listener callback (runs on a Firestore SDK thread)."""
+        for snapshot in snapshots:
+            if snapshot.exists:
+                self._store(snapshot.to_dict())
+            else:
+                self._store(dict(DEFAULT_ALERT_CONFIG))
+        if not snapshots:
+            self.invalidate()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "listener_active": self._watch is not None
+        }
+
+
+_alert_config_cache: Optional[AlertConfigCache] = None
+
+
+def get_alert_config_cache() -> AlertConfigCache:
+    """Get the process-wide alert config cache."""
+    global _alert_config_cache
+    
+    if _alert_config_cache is None:
+        _alert_config_cache = AlertConfigCache(
+            ttl_seconds=get_settings().alert_config_ttl_seconds
+        )
+    
+    return _alert_config_cache
@@ -0,0 +1,218 @@
+"""Async Cloudinary upload client on a pooled keep-alive HTTP session.
+
+Replaces the SDK's synchronous ``cloudinary.uploader.upload`` on the upload
+path. A single ``httpx.AsyncClient`` keeps up to ``UPLOAD_MAX_WORKERS``
+connections alive with explicit connect/read timeouts. Transient failures
+(timeouts, connection errors, 429 and 5xx) are retried with exponential
+backoff and full jitter, up to ``CLOUDINARY_MAX_RETRIES`` times.
+
+``CLOUDINARY_API_URL`` points the client at a local fake server for tests
+and benchmarks.
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import httpx
+
+from app.config import get_settings
+from app.core.metrics import DEPENDENCY_ERRORS, DEPENDENCY_RETRIES
+
+
+class CloudinaryUploadError(Exception):
+    """An upload failed permanently (or ran out of retries)."""
+
+
+def sign_params(params: Dict[str, Any], api_secret: str) -> str:
+    """Cloudinary request signature: SHA-1 of the sorted params plus secret."""
+    to_sign = "&".join(
+        f"{key}={value}" for key, value in sorted(params.items())
+        if value is not None and value != ""
+    )
+    return hashlib.sha1(f"{to_sign}{api_secret}".encode()).hexdigest()
+
+
+class _FileBody:
+    """
+    Read/seek view of a file object for the multipart encoder.
+    
+    Hides ``fileno``: httpx sizes files with ``fstat(fileno())``, which
+    makes a ``SpooledTemporaryFile`` roll over to disk.
+    """
+    
+    def __init__(self, file: BinaryIO):
+        self._file = file
+    
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+    
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+    
+    def tell(self) -> int:
+        return self._file.tell()
+
+
+class CloudinaryClient:
+    """Signed, retrying uploads over one pooled ``httpx.AsyncClient``."""
+    
+    def __init__(
+        self,
+        cloud_name: str,
+        api_key: str,
+        api_secret: str,
+        api_url: str,
+        max_connections: int,
+        connect_timeout: float,
+        read_timeout: float,
+        max_retries: int,
+        retry_backoff: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._upload_url = f"{api_url.rstrip('/')}/v1_1/{cloud_name}/image/upload"
+        self._ping_url = f"{api_url.rstrip('/')}/v1_1/{cloud_name}/ping"
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            transport=transport
+        )
+        self.retries = 0
+        self.failures = 0
+    
+    async def upload(self, file: Union[bytes, BinaryIO], **options: Any) -> Dict[str, Any]:
+        """
+        Upload an image.
+        
+        Args:
+            file: Image bytes or a readable binary file object
+            **options: Upload parameters (folder, public_id, overwrite, ...)
+        
+        Returns:
+            Cloudinary upload response (``secure_url``, ``public_id``, ...)
+        
+        Raises:
+            CloudinaryUploadError: On a permanent error or after the last retry
+        """
+        params = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in options.items()
+            if value is not None
+        }
+        params["timestamp"] = int(time.time())
+        params["signature"] = sign_params(params, self._api_secret)
+        params["api_key"] = self._api_key
+        
+        if hasattr(file, "read"):
+            file = _FileBody(file)
+        
+        attempt = 0
+        while True:
+            if hasattr(file, "seek"):
+                file.seek(0)
+            
+            try:
+                response = await self._client.post(
+                    self._upload_url,
+                    data=params,
+                    files={"file": ("image.jpg", file, "application/octet-stream")}
+                )
+                if response.status_code < 400:
+                    return response.json()
+                
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                transient = response.status_code == 429 or response.status_code >= 500
+            
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = f"{type(e).__name__}: {e}"
+                transient = True
+            
+            if not transient or attempt >= self._max_retries:
+                self.failures += 1
+                DEPENDENCY_ERRORS.inc("cloudinary")
+                raise CloudinaryUploadError(error)
+            
+            delay = random.uniform(0, self._retry_backoff * 2 ** attempt)
+            attempt += 1
+            self.retries += 1
+            DEPENDENCY_RETRIES.inc("cloudinary")
+            print(f"[!] Cloudinary upload failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    async def ping(self) -> None:
+        """
+        Check the credentials with the Admin API ``ping`` (at startup).
+        
+        Leaves a keep-alive connection, TLS handshake done, in the pool for
+        the first upload.
+        
+        Raises:
+            httpx.HTTPError: If Cloudinary is unreachable or rejects the call
+        """
+        response = await self._client.get(
+            self._ping_url, auth=(self._api_key, self._api_secret)
+        )
+        response.raise_for_status()
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Retry and failure counters."""
+        return {"retries": self.retries, "failures": self.failures}
+
+
+_client: Optional[CloudinaryClient] = None
+
+
+def create_cloudinary_client(
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> CloudinaryClient:
+    """Build a client from the settings (``transport`` replaces the network)."""
+    settings = get_settings()
+    return CloudinaryClient(
+        cloud_name=settings.cloudinary_cloud_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        api_url=settings.cloudinary_api_url,
+        max_connections=settings.upload_max_workers,
+        connect_timeout=settings.cloudinary_connect_timeout,
+        read_timeout=settings.cloudinary_read_timeout,
+        max_retries=settings.cloudinary_max_retries,
+        retry_backoff=settings.cloudinary_retry_backoff_seconds,
+        transport=transport
+    )
+
+
+def get_cloudinary_client() -> CloudinaryClient:
+    """Get the process-wide Cloudinary client."""
+    global _client
+    
+    if _client is None:
+        _client = create_cloudinary_client()
+    
+    return _client
+
+
+def set_cloudinary_client(client: Optional[CloudinaryClient]) -> None:
+    """Replace the process-wide client (e.g. with one on a fake transport)."""
+    global _client
+    _client = client
+
+
+async def close_cloudinary_client() -> None:
+    """Close the pooled connections (on shutdown)."""
+    global _client
+    
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -8,16 +8,26 @@ Cloudinary free tier provides:
 """
 
 import base64
+import binascii
+import tempfile
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import BinaryIO, Optional, Union
 import cloudinary
 import cloudinary.uploader
 from app.config import get_settings
+from app.core.executor import UPLOAD_POOL, run_blocking
+from app.core.metrics import STAGE_DURATION
+from app.services.cloudinary_client import get_cloudinary_client
+from app.services.image_dedup import get_image_dedup
+from app.services.image_processing import get_image_normalizer
 
 
 _cloudinary_configured = False
 
+# Base64 characters decoded per step (a multiple of 4)
+_DECODE_CHUNK_CHARS = 256 * 1024
+
 
 def initialize_cloudinary() -> bool:
     """
@@ -56,7 +66,8 @@ class CloudinaryService:
     async def upload_detection_image(
         device_id: str,
         image_base64: str,
-        timestamp: Optional[datetime] = None
+        timestamp: Optional[datetime] = None,
+        public_id: Optional[str] = None
     ) -> Optional[str]:
         """
         Upload a base64-encoded image to Cloudinary.
@@ -65,6 +76,7 @@ class CloudinaryService:
             device_id: The device ID for folder organization
             image_base64: Base64-encoded image data
             timestamp: Optional timestamp for public_id
+            public_id: Optional fixed public_id (see ``upload_image``)
             
         Returns:
             Secure HTTPS URL of the uploaded image, or None on failure
@@ -73,35 +85,155 @@ class CloudinaryService:
         if not initialize_cloudinary():
             return None
         
+        with STAGE_DURATION.time("decode"):
+            image_file = await run_blocking(
+                CloudinaryService.decode_image_to_file, image_base64
+            )
+        if image_file is None:
+            return None
+        
+        try:
+            return await CloudinaryService.upload_image(
+                device_id, image_file, timestamp, public_id
+            )
+        finally:
+            image_file.close()
+    
+    @staticmethod
+    def decode_image(image_base64: str) -> Optional[bytes]:
+        """
+        Decode a base64 image, accepting the data URL format.
+        
+        Returns:
+            Image bytes, or None if the payload is not valid base64
+        """
         try:
-            # Decode base64 image
             if "," in image_base64:
                 # Handle data URL format: data:image/jpeg;base64,<data>
                 image_base64 = image_base64.split(",")[1]
             
-            image_data = base64.b64decode(image_base64)
+            return base64.b64decode(image_base64)
+            
+        except Exception as e:
+            print(f"[!] Invalid base64 image (non-blocking): {e}")
+            return None
+    
+    @staticmethod
+    def decode_image_to_file(image_base64: str) -> Optional[BinaryIO]:
+        """
+        Decode a base64 image incrementally into a spooled buffer.
+        
+        The decoded image is never held as one more in-memory copy: it is
+        written in chunks to a buffer that moves to disk above
+        ``IMAGE_SPOOL_MAX_BYTES``.
+        
+        Returns:
+            Readable binary file positioned at 0 (the caller closes it), or
+            None if the payload is not valid base64
+        """
+        # Handle data URL format: data:image/jpeg;base64,<data>
+        start = image_base64.find(",") + 1
+        
+        buffer = tempfile.SpooledTemporaryFile(
+            max_size=get_settings().image_spool_max_bytes
+        )
+        pending = ""
+        
+        try:
+            for offset in range(start, len(image_base64), _DECODE_CHUNK_CHARS):
+                chunk = pending + image_base64[offset:offset + _DECODE_CHUNK_CHARS]
+                if "\n" in chunk or "\r" in chunk or " " in chunk:
+                    # Line breaks would shift the 4-character groups
+                    chunk = "".join(chunk.split())
+                whole = len(chunk) - len(chunk) % 4
+                buffer.write(binascii.a2b_base64(chunk[:whole]))
+                pending = chunk[whole:]
+            
+            if pending:
+                raise binascii.Error("Incorrect padding")
+            
+        except (binascii.Error, ValueError) as e:
+            buffer.close()
+            print(f"[!] Invalid base64 image (non-blocking): {e}")
+            return None
+        
+        buffer.seek(0)
+        return buffer
+    
+    @staticmethod
+    async def upload_image(
+        device_id: str,
+        image: Union[bytes, BinaryIO],
+        timestamp: Optional[datetime] = None,
+        public_id: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Upload raw image bytes or a binary file object to Cloudinary.
+        
+        The upload goes through the pooled ``CloudinaryClient``, which
+        retries transient failures. File objects (e.g. the spooled buffer of
+        a multipart upload) are streamed without an intermediate copy,
+        unless image normalization is enabled (see ``ImageNormalizer``). An
+        image uploaded before (see ``ImageDedupCache``) reuses its URL
+        instead.
+        
+        Args:
+            device_id: The device ID for folder organization
+            image: Image bytes or a readable binary file object
+            timestamp: Optional timestamp for public_id
+            public_id: Optional fixed public_id (e.g. the detection ID).
+                Re-uploading it returns the existing asset, so retries
+                are idempotent.
+            
+        Returns:
+            Secure HTTPS URL of the uploaded image, or None on failure
+        """
+        # Ensure Cloudinary is initialized
+        if not initialize_cloudinary():
+            return None
+        
+        # Skip the upload for a frame we already stored
+        dedup = get_image_dedup()
+        fingerprint = await dedup.fingerprint(image)
+        cached_url = dedup.lookup(device_id, fingerprint)
+        if cached_url:
+            print(f"[+] Duplicate image, reusing {cached_url[:50]}...")
+            return cached_url
+        
+        # Downscale/recompress/strip metadata (if enabled)
+        normalized = await get_image_normalizer().normalize(image)
+        if normalized is not None:
+            image = normalized
+        
+        try:
+            if hasattr(image, "seek"):
+                image.seek(0)
             
             # Generate unique public_id
-            ts = timestamp or datetime.utcnow()
-            unique_id = f"{ts.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            if public_id:
+                unique_id = public_id
+            else:
+                ts = timestamp or datetime.utcnow()
+                unique_id = f"{ts.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
             
             # Upload to Cloudinary
             # Folder structure: predator_alert/{device_id}/
-            result = cloudinary.uploader.upload(
-                image_data,
-                folder=f"predator_alert/{device_id}",
-                public_id=unique_id,
-                resource_type="image",
-                format="jpg",
-                overwrite=False,
-                invalidate=True
-            )
+            with STAGE_DURATION.time("upload"):
+                result = await get_cloudinary_client().upload(
+                    image,
+                    folder=f"predator_alert/{device_id}",
+                    public_id=unique_id,
+                    format="jpg",
+                    overwrite=False,
+                    invalidate=True
+                )
             
             # Return the secure HTTPS URL
             secure_url = result.get("secure_url")
             
             if secure_url:
                 print(f"[+] Image uploaded to Cloudinary: {secure_url[:50]}...")
+                dedup.remember(device_id, fingerprint, secure_url)
                 return secure_url
             
             return None
@@ -126,7 +258,11 @@ class CloudinaryService:
             return False
         
         try:
-            result = cloudinary.uploader.destroy(public_id)
+            result = await run_blocking(
+                cloudinary.uploader.destroy,
+                public_id,
+                pool=UPLOAD_POOL
+            )
             return result.get("result") == "ok"
         except Exception as e:
             print(f"Error deleting from Cloudinary: {e}")
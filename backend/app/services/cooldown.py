@@ -0,0 +1,247 @@
+"""Cooldown backends with atomic check-and-set.
+
+A cooldown claim is a single call: either the key is outside its window and
+the caller now owns a fresh window, or the caller is told how long to wait
+(and whether it beat the window's best confidence). There is no separate
+check and update, so two concurrent requests for one key can never both
+pass.
+
+Backends:
+- ``memory``: per-process TTL cache guarded by a lock (single worker)
+- ``sqlite``: SQLite database in WAL mode, shared by every worker process
+  on the host (e.g. ``gunicorn -w N``)
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache
+
+from app.config import get_settings
+
+
+class CooldownClaim(NamedTuple):
+    """Outcome of a cooldown claim."""
+    
+    acquired: bool            # Caller owns a fresh window
+    remaining: int = 0        # Seconds left in the current window
+    detection_id: Optional[str] = None  # Detection that owns the window
+    escalated: bool = False   # In window, but with a higher confidence
+
+
+class CooldownBackend(ABC):
+    """Interface for cooldown stores."""
+    
+    # Whether calls may wait on I/O or locks (callers on the event loop then
+    # run them through ``run_blocking``)
+    blocking = False
+    
+    @abstractmethod
+    def try_acquire(
+        self,
+        key: str,
+        window_seconds: float,
+        detection_id: str,
+        confidence: float
+    ) -> CooldownClaim:
+        """
+        Atomically claim a cooldown window for a key.
+        
+        Inside an existing window, a higher confidence than the window's
+        best so far is recorded and reported as ``escalated``, so the caller
+        can update the owning detection instead of creating a new one.
+        
+        Args:
+            key: Cooldown key (device and species)
+            window_seconds: Length of the cooldown window
+            detection_id: Detection that will own the window if acquired
+            confidence: Detection confidence score
+            
+        Returns:
+            CooldownClaim describing the outcome
+        """
+    
+    @abstractmethod
+    def release(self, key: str, detection_id: str) -> None:
+        """Give a window back if ``detection_id`` still owns it."""
+    
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class MemoryCooldownBackend(CooldownBackend):
+    """In-process cooldown store; only correct with a single worker."""
+    
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        # Value: [window start, owning detection ID, best confidence]
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+    
+    def try_acquire(
+        self,
+        key: str,
+        window_seconds: float,
+        detection_id: str,
+        confidence: float
+    ) -> CooldownClaim:
+        now = time.time()
+        
+        with self._lock:
+            entry = self._cache.get(key)
+            
+            if entry is not None and now - entry[0] < window_seconds:
+                remaining = int(window_seconds - (now - entry[0]))
+                escalated = confidence > entry[2]
+                if escalated:
+                    entry[2] = confidence
+                return CooldownClaim(False, remaining, entry[1], escalated)
+            
+            self._cache[key] = [now, detection_id, confidence]
+            return CooldownClaim(True, 0, detection_id)
+    
+    def release(self, key: str, detection_id: str) -> None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] == detection_id:
+                del self._cache[key]
+
+
+class SQLiteCooldownBackend(CooldownBackend):
+    """Cooldown store shared across worker processes through SQLite (WAL)."""
+    
+    # A claim waits up to 5 s for another process's write lock
+    blocking = True
+    
+    # Expired rows are purged every this many claims
+    _PURGE_INTERVAL = 1000
+    
+    def __init__(self, path: str, ttl_seconds: float):
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._claims = 0
+        
+        self._conn = sqlite3.connect(
+            path,
+            timeout=5.0,
+            isolation_level=None,  # explicit transactions below
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cooldowns ("
+            " key TEXT PRIMARY KEY,"
+            " last_at REAL NOT NULL)"
+        )
+        
+        # Columns added after the first release of this table
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cooldowns)")}
+        if "detection_id" not in columns:
+            self._conn.execute("ALTER TABLE cooldowns ADD COLUMN detection_id TEXT")
+        if "confidence" not in columns:
+            self._conn.execute(
+                "ALTER TABLE cooldowns ADD COLUMN confidence REAL NOT NULL DEFAULT 0"
+            )
+    
+    def try_acquire(
+        self,
+        key: str,
+        window_seconds: float,
+        detection_id: str,
+        confidence: float
+    ) -> CooldownClaim:
+        now = time.time()
+        
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the claim and the
+            # confidence bump below are atomic across processes.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO cooldowns (key, last_at, detection_id, confidence) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET last_at = excluded.last_at, "
+                    "detection_id = excluded.detection_id, "
+                    "confidence = excluded.confidence "
+                    "WHERE cooldowns.last_at <= ?",
+                    (key, now, detection_id, confidence, now - window_seconds)
+                )
+                
+                if cursor.rowcount == 1:
+                    self._claims += 1
+                    if self._claims % self._PURGE_INTERVAL == 0:
+                        self._conn.execute(
+                            "DELETE FROM cooldowns WHERE last_at < ?",
+                            (now - self._ttl,)
+                        )
+                    self._conn.execute("COMMIT")
+                    return CooldownClaim(True, 0, detection_id)
+                
+                escalated = self._conn.execute(
+                    "UPDATE cooldowns SET confidence = ? "
+                    "WHERE key = ? AND confidence < ?",
+                    (confidence, key, confidence)
+                ).rowcount == 1
+                
+                last_at, owner = self._conn.execute(
+                    "SELECT last_at, detection_id FROM cooldowns WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                self._conn.execute("COMMIT")
+                
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        
+        remaining = max(0, int(window_seconds - (now - last_at)))
+        return CooldownClaim(False, remaining, owner, escalated)
+    
+    def release(self, key: str, detection_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cooldowns WHERE key = ? AND detection_id = ?",
+                (key, detection_id)
+            )
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cooldown_backend: Optional[CooldownBackend] = None
+
+
+def get_cooldown_backend() -> CooldownBackend:
+    """Get the process-wide cooldown backend selected by ``COOLDOWN_BACKEND``."""
+    global _cooldown_backend
+    
+    if _cooldown_backend is None:
+        settings = get_settings()
+        # Entries only matter for one window; keep a margin for clock skew
+        longest = max([settings.cooldown_seconds, *settings.cooldown_species_map.values()])
+        ttl = max(300, longest * 2)
+        
+        if settings.cooldown_backend == "sqlite":
+            _cooldown_backend = SQLiteCooldownBackend(
+                settings.cooldown_db_path, ttl_seconds=ttl
+            )
+        elif settings.cooldown_backend == "memory":
+            _cooldown_backend = MemoryCooldownBackend(
+                maxsize=settings.cooldown_max_entries, ttl_seconds=ttl
+            )
+        else:
+            raise ValueError(f"Unknown cooldown backend: {settings.cooldown_backend}")
+    
+    return _cooldown_backend
+
+
+def close_cooldown_backend() -> None:
+    """Close the cooldown backend (on shutdown)."""
+    global _cooldown_backend
+    
+    if _cooldown_backend is not None:
+        _cooldown_backend.close()
+        _cooldown_backend = None
@@ -0,0 +1,353 @@
+"""Detection history queries backed by a cache of the latest detections.
+
+``GET /api/detections`` pages through detections newest first, with keyset
+pagination on ``(created_at, detection_id)``. The most recent
+``DETECTION_CACHE_SIZE`` detections are held in memory: loaded from
+Firestore on first use, then updated as this process stores detections, so
+a page that falls inside the cached window costs no Firestore reads. Older
+pages, and filters matching too few cached detections, query Firestore.
+
+Detections stored by other workers reach the cache when it is reloaded,
+every ``DETECTION_CACHE_REFRESH_SECONDS``.
+"""
+
+import asyncio
+import base64
+import bisect
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import get_settings
+from app.core.executor import run_blocking
+from app.core.firebase import get_firestore
+from app.core.metrics import DEPENDENCY_ERRORS
+from app.models.detection import DetectionListResponse, DetectionRecord
+
+
+# Page order key, served descending: (created_at, detection_id)
+Key = Tuple[datetime, str]
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Aware UTC datetime (naive values are UTC, as Firestore reads them)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _key(record: DetectionRecord) -> Key:
+    return record.created_at, record.detection_id
+
+
+def to_record(detection_id: str, document: Dict[str, Any]) -> DetectionRecord:
+    """History record of a stored detection document."""
+    return DetectionRecord(
+        detection_id=detection_id,
+        device_id=document["device_id"],
+        animal=document["animal"],
+        confidence=document["confidence"],
+        is_predator=document["is_predator"],
+        image_url=document.get("image_url"),
+        detection_time=as_utc(document["detection_time"]),
+        created_at=as_utc(document["created_at"]),
+        alert_sent=document.get("alert_sent", False),
+        repeat_count=document.get("repeat_count", 0)
+    )
+
+
+def encode_cursor(key: Key) -> str:
+    """Opaque page cursor for the detection ``key``."""
+    raw = json.dumps([key[0].isoformat(), key[1]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Key:
+    """
+    Key of the detection a page starts after.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, detection_id = json.loads(raw)
+        return as_utc(datetime.fromisoformat(created_at)), str(detection_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class HistoryQuery(NamedTuple):
+    """Filters and position of a history page."""
+    
+    device_id: Optional[str] = None
+    animal: Optional[str] = None
+    is_predator: Optional[bool] = None
+    since: Optional[datetime] = None  # created_at >= since
+    until: Optional[datetime] = None  # created_at < until
+    cursor: Optional[Key] = None  # Page starts after this detection
+    limit: int = 50
+    
+    def matches(self, record: DetectionRecord) -> bool:
+        """Whether a record passes the equality filters."""
+        return (
+            (self.device_id is None or record.device_id == self.device_id)
+            and (self.animal is None or record.animal == self.animal)
+            and (self.is_predator is None or record.is_predator == self.is_predator)
+        )
+
+
+class DetectionHistory:
+    """Most recent detections in memory, with Firestore for the rest."""
+    
+    def __init__(self, max_entries: int, refresh_seconds: float):
+        self._max_entries = max_entries
+        self._refresh_seconds = refresh_seconds
+        # Cached keys ascending; every stored detection with a key at or
+        # above the first one is cached
+        self._keys: List[Key] = []
+        self._records: Dict[str, DetectionRecord] = {}
+        self._complete = False  # Holds every stored detection
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.document_reads = 0
+        self.errors = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+    
+    def add(self, record: DetectionRecord) -> None:
+        """Cache a detection this process just stored."""
+        if not self.enabled:
+            return
+        self._insert(record)
+        self._trim()
+    
+    def escalate(
+        self,
+        detection_id: str,
+        confidence: float,
+        image_url: Optional[str]
+    ) -> Optional[DetectionRecord]:
+        """
+        Apply a higher-confidence repeat to a cached detection.
+        
+        Returns:
+            The updated record, or None if the detection is not cached
+        """
+        record = self._records.get(detection_id)
+        if record is None:
+            return None
+        
+        updates: Dict[str, Any] = {
+            "confidence": confidence,
+            "repeat_count": record.repeat_count + 1
+        }
+        if image_url:
+            updates["image_url"] = image_url
+        record = self._records[detection_id] = record.model_copy(update=updates)
+        return record
+    
+    def attach_image(self, detection_id: str, image_url: str) -> Optional[DetectionRecord]:
+        """
+        Set the image of a cached detection stored without one.
+        
+        Returns:
+            The updated record, or None if the detection is not cached
+        """
+        record = self._records.get(detection_id)
+        if record is None:
+            return None
+        
+        record = self._records[detection_id] = record.model_copy(
+            update={"image_url": image_url}
+        )
+        return record
+    
+    def _insert(self, record: DetectionRecord) -> None:
+        previous = self._records.get(record.detection_id)
+        if previous is not None:
+            del self._keys[bisect.bisect_left(self._keys, _key(previous))]
+        self._records[record.detection_id] = record
+        bisect.insort(self._keys, _key(record))
+    
+    def _trim(self) -> None:
+        excess = len(self._keys) - self._max_entries
+        if excess > 0:
+            for _, detection_id in self._keys[:excess]:
+                del self._records[detection_id]
+            del self._keys[:excess]
+            self._complete = False
+    
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and (
+            self._refresh_seconds <= 0
+            or time.monotonic() - self._loaded_at < self._refresh_seconds
+        )
+    
+    def _load_recent(self) -> List[DetectionRecord]:
+        query = (
+            get_firestore().collection("detections")
+            .order_by("created_at", direction="DESCENDING")
+            .order_by("__name__", direction="DESCENDING")
+            .limit(self._max_entries)
+        )
+        return [to_record(doc.id, doc.to_dict()) for doc in query.stream()]
+    
+    async def _refresh(self) -> None:
+        """(Re)load the most recent detections once the cache is stale."""
+        if self._fresh():
+            return
+        
+        async with self._lock:
+            if self._fresh():
+                return
+            
+            try:
+                loaded = await run_blocking(self._load_recent)
+            except Exception as e:
+                self.errors += 1
+                DEPENDENCY_ERRORS.inc("firestore")
+                print(f"[!] Detection cache reload failed: {e}")
+                if self._loaded_at is not None:
+                    # Keep serving the current window until the next refresh
+                    self._loaded_at = time.monotonic()
+                return
+            
+            self.document_reads += len(loaded)
+            complete = len(loaded) < self._max_entries
+            floor = _key(loaded[-1]) if loaded and not complete else None
+            
+            # Detections stored while the query ran are newer than its floor
+            loaded_ids = {record.detection_id for record in loaded}
+            kept = [
+                self._records[key[1]] for key in self._keys
+                if key[1] not in loaded_ids and (floor is None or key > floor)
+            ]
+            
+            self._keys = []
+            self._records = {}
+            for record in loaded + kept:
+                self._insert(record)
+            self._complete = complete
+            self._trim()
+            self._loaded_at = time.monotonic()
+    
+    def _lookup(self, query: HistoryQuery) -> Optional[List[DetectionRecord]]:
+        """Page from the cache, or None if matches may be missing from it."""
+        end = len(self._keys)
+        if query.cursor is not None:
+            end = min(end, bisect.bisect_left(self._keys, query.cursor))
+        if query.until is not None:
+            end = min(end, bisect.bisect_left(self._keys, (query.until, "")))
+        
+        page: List[DetectionRecord] = []
+        for index in range(end - 1, -1, -1):
+            created_at, detection_id = self._keys[index]
+            if query.since is not None and created_at < query.since:
+                return page  # Everything newer than `since` is cached
+            
+            record = self._records[detection_id]
+            if query.matches(record):
+                page.append(record)
+                if len(page) == query.limit:
+                    return page
+        
+        return page if self._complete else None
+    
+    @staticmethod
+    def _query_firestore(query: HistoryQuery) -> List[DetectionRecord]:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        
+        firestore_query = get_firestore().collection("detections")
+        
+        for field, op, value in (
+            ("device_id", "==", query.device_id),
+            ("animal", "==", query.animal),
+            ("is_predator", "==", query.is_predator),
+            ("created_at", ">=", query.since),
+            ("created_at", "<", query.until)
+        ):
+            if value is not None:
+                firestore_query = firestore_query.where(filter=FieldFilter(field, op, value))
+        
+        firestore_query = (
+            firestore_query
+            .order_by("created_at", direction="DESCENDING")
+            .order_by("__name__", direction="DESCENDING")
+        )
+        if query.cursor is not None:
+            firestore_query = firestore_query.start_after(
+                {"created_at": query.cursor[0], "__name__": query.cursor[1]}
+            )
+        
+        return [
+            to_record(doc.id, doc.to_dict())
+            for doc in firestore_query.limit(query.limit).stream()
+        ]
+    
+    async def page(self, query: HistoryQuery) -> DetectionListResponse:
+        """
+        One page of detections matching a query, newest first.
+        
+        Raises:
+            Exception: If Firestore had to be queried and the query failed
+        """
+        query = query._replace(since=as_utc(query.since), until=as_utc(query.until))
+        
+        records = None
+        if self.enabled:
+            await self._refresh()
+            if self._loaded_at is not None:
+                records = self._lookup(query)
+        
+        if records is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                records = await run_blocking(self._query_firestore, query)
+            except Exception:
+                self.errors += 1
+                DEPENDENCY_ERRORS.inc("firestore")
+                raise
+            self.document_reads += len(records)
+        
+        return DetectionListResponse(
+            detections=records,
+            next_cursor=encode_cursor(_key(records[-1])) if len(records) == query.limit else None
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss counters."""
+        return {
+            "entries": len(self._keys),
+            "complete": self._complete,
+            "hits": self.hits,
+            "misses": self.misses,
+            "document_reads": self.document_reads,
+            "errors": self.errors
+        }
+
+
+_history: Optional[DetectionHistory] = None
+
+
+def get_detection_history() -> DetectionHistory:
+    """Get the process-wide detection history cache."""
+    global _history
+    
+    if _history is None:
+        settings = get_settings()
+        _history = DetectionHistory(
+            max_entries=settings.detection_cache_size,
+            refresh_seconds=settings.detection_cache_refresh_seconds
+        )
+    
+    return _history
@@ -3,148 +3,581 @@
 Uses Cloudinary for image storage (NOT Firebase Storage).
 """
 
-from datetime import datetime
-from typing import Tuple
-from cachetools import TTLCache
-from google.cloud.firestore import SERVER_TIMESTAMP
+import asyncio
+import functools
+import secrets
+import string
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
 
 from app.config import get_settings
+from app.core.executor import run_blocking
 from app.core.firebase import get_firestore
+from app.core.metrics import COOLDOWN_CHECKS, DEPENDENCY_ERRORS, STAGE_DURATION
 from app.models.detection import DetectionRequest, DetectionResponse
 from app.services.cloudinary_service import CloudinaryService
+from app.services.cooldown import CooldownClaim, get_cooldown_backend
+from app.services.detection_history import get_detection_history, to_record
+from app.services.detection_stream import get_detection_broadcaster
 from app.services.fcm_service import FCMService
+from app.services.image_processing import read_image
+from app.services.ingest_queue import get_ingest_queue
+from app.services.rollups import get_detection_rollups
+from app.services.spool import SpoolEntry, get_detection_spool
+from app.services.write_buffer import FIRESTORE_BATCH_LIMIT, get_write_buffer
+
+
+# Same shape as Firestore auto-generated document IDs
+_ID_ALPHABET = string.ascii_letters + string.digits
+_ID_LENGTH = 20
+
+# Replays retrying a failed image upload before storing the detection
+# without its image
+_SPOOL_IMAGE_ATTEMPTS = 5
+
+
+class _OriginalWrite:
+    """Outcome of a detection's first write, awaited by its escalations."""
+    
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.stored = False
+
+
+# Detections that own a cooldown window but whose document is not written
+# yet, so an escalation lands on top of the original rather than under it
+# (or is skipped when the original could not be stored)
+_unwritten: Dict[str, _OriginalWrite] = {}
+
+# Detections already added to the history, rollups and streams, so a spool
+# replay that overlaps the live job (another process's lease expired) does
+# not count or publish them twice
+_recorded: LRUCache = LRUCache(maxsize=10_000)
 
 
 class DetectionService:
     """Service for processing detection events from edge devices."""
     
-    # In-memory cache for cooldown tracking
-    # Key: device_id, Value: last detection timestamp
-    _cooldown_cache: TTLCache = TTLCache(maxsize=1000, ttl=300)
-    
     @staticmethod
     def is_predator(animal: str) -> bool:
         """Check if the detected animal is classified as a predator."""
         settings = get_settings()
-        return animal.lower() in settings.predator_animals_list
+        return animal.lower() in settings.predator_animals_set
     
     @staticmethod
-    def check_cooldown(device_id: str) -> Tuple[bool, int]:
+    def cooldown_key(request: DetectionRequest) -> str:
+        """Cooldown/dedup key: one window per (device, species)."""
+        return f"{request.device_id}:{request.animal}"
+    
+    @staticmethod
+    def cooldown_window(animal: str) -> int:
+        """Cooldown window for a species, in seconds."""
+        settings = get_settings()
+        return settings.cooldown_species_map.get(animal.lower(), settings.cooldown_seconds)
+    
+    @staticmethod
+    async def acquire_cooldown(request: DetectionRequest, detection_id: str) -> CooldownClaim:
         """
-        Check if device is in cooldown period.
+        Atomically check the (device, species) cooldown and start a new window.
         
         Args:
-            device_id: The device identifier
+            request: Detection request from edge device
+            detection_id: Detection that will own the window if acquired
             
         Returns:
-            Tuple of (is_in_cooldown, seconds_remaining)
+            CooldownClaim. When acquired, the caller owns a fresh window; when
+            escalated, the caller should update the owning detection.
         """
-        settings = get_settings()
-        cooldown_seconds = settings.cooldown_seconds
+        backend = get_cooldown_backend()
+        args = (
+            DetectionService.cooldown_key(request),
+            DetectionService.cooldown_window(request.animal),
+            detection_id,
+            request.confidence
+        )
         
-        last_detection = DetectionService._cooldown_cache.get(device_id)
+        # Registered before the claim can be seen, so an escalation that
+        # wins the race to the event loop still waits for the original
+        _unwritten[detection_id] = _OriginalWrite()
+        try:
+            if backend.blocking:
+                claim = await run_blocking(backend.try_acquire, *args)
+            else:
+                claim = backend.try_acquire(*args)
+        except Exception:
+            _unwritten.pop(detection_id, None)
+            raise
         
-        if last_detection is None:
-            return False, 0
+        if claim.acquired:
+            COOLDOWN_CHECKS.inc("acquired")
+        else:
+            _unwritten.pop(detection_id, None)
+            COOLDOWN_CHECKS.inc("escalated" if claim.escalated else "suppressed")
         
-        elapsed = (datetime.utcnow() - last_detection).total_seconds()
+        return claim
+    
+    @staticmethod
+    async def release_cooldown(request: DetectionRequest, detection_id: str) -> None:
+        """Give back a cooldown window when the detection was not stored."""
+        backend = get_cooldown_backend()
+        key = DetectionService.cooldown_key(request)
         
-        if elapsed < cooldown_seconds:
-            remaining = int(cooldown_seconds - elapsed)
-            return True, remaining
+        if backend.blocking:
+            await run_blocking(backend.release, key, detection_id)
+        else:
+            backend.release(key, detection_id)
+    
+    @staticmethod
+    def _resolve_write(detection_id: str, stored: bool) -> None:
+        """Report whether a detection's document was written to its escalations."""
+        original = _unwritten.pop(detection_id, None)
+        if original is not None:
+            original.stored = stored
+            original.done.set()
+    
+    @staticmethod
+    def new_detection_id() -> str:
+        """Reserve a Firestore-style document ID without a network call."""
+        return "".join(
+            secrets.choice(_ID_ALPHABET) for _ in range(_ID_LENGTH)
+        )
+    
+    @staticmethod
+    def parse_detection_time(timestamp: Optional[str]) -> datetime:
+        """
+        Parse the device timestamp, falling back to the current time.
         
-        return False, 0
+        Returns:
+            Naive UTC datetime (how Firestore interprets naive values), so
+            times from different devices can be compared and sorted
+        """
+        if timestamp:
+            try:
+                parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+                if parsed.tzinfo is not None:
+                    parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+                return parsed
+            except ValueError:
+                pass  # Use current time if parsing fails
+        return datetime.utcnow()
+    
+    @staticmethod
+    def _build_document(
+        request: DetectionRequest,
+        is_predator: bool,
+        detection_time: datetime,
+        image_url: Optional[str] = None,
+        alert_results: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the Firestore document for a detection.
+        
+        ``created_at`` is stamped here rather than with ``SERVER_TIMESTAMP``
+        so the history cache holds the exact value pages are keyed on.
+        """
+        document = {
+            "device_id": request.device_id,
+            "animal": request.animal,
+            "confidence": request.confidence,
+            "is_predator": is_predator,
+            "image_url": image_url,  # Cloudinary URL
+            "detection_time": detection_time,
+            "created_at": datetime.now(timezone.utc),
+            "alert_sent": False
+        }
+        
+        if alert_results:
+            document.update(FCMService.alert_fields(alert_results))
+        
+        return document
     
     @staticmethod
-    def update_cooldown(device_id: str) -> None:
-        """Update the cooldown timestamp for a device."""
-        DetectionService._cooldown_cache[device_id] = datetime.utcnow()
+    def _cooldown_response(request: DetectionRequest, remaining: int) -> DetectionResponse:
+        """Build the response returned for a request inside its cooldown."""
+        return DetectionResponse(
+            success=False,
+            message=f"Device in cooldown. Wait {remaining} seconds.",
+            is_predator=DetectionService.is_predator(request.animal)
+        )
     
     @staticmethod
-    async def process_detection(request: DetectionRequest) -> DetectionResponse:
+    async def process_detection(
+        request: DetectionRequest,
+        image_file: Optional[BinaryIO] = None
+    ) -> DetectionResponse:
         """
         Process a detection event from an edge device.
         
         This method:
-        1. Checks cooldown status
-        2. Uploads image to Cloudinary (if present)
-        3. Stores detection in Firestore
-        4. Triggers FCM alerts for predators
+        1. Checks the (device, species) cooldown; a higher-confidence
+           repeat inside the window updates the existing detection
+        2. Writes the detection to the local spool (if enabled), so it is
+           delivered later should a remote service be unavailable
+        3. Concurrently uploads the image to Cloudinary (if present) and
+           triggers FCM alerts for predators
+        4. Stores the detection in Firestore with one write of its final
+           state (image URL and alert status)
         
         Args:
             request: Detection request from edge device
+            image_file: Optional binary image (multipart uploads), used
+                instead of ``request.image_base64``
             
         Returns:
             DetectionResponse with processing results
         """
-        # Check cooldown
-        in_cooldown, remaining = DetectionService.check_cooldown(request.device_id)
+        detection_id = DetectionService.new_detection_id()
         
-        if in_cooldown:
-            return DetectionResponse(
-                success=False,
-                message=f"Device in cooldown. Wait {remaining} seconds.",
-                is_predator=DetectionService.is_predator(request.animal)
+        # Check cooldown (and claim the window in the same step)
+        claim = await DetectionService.acquire_cooldown(request, detection_id)
+        
+        if claim.escalated:
+            return await DetectionService.escalate_detection(
+                request, claim.detection_id, image_file
             )
         
+        if not claim.acquired:
+            return DetectionService._cooldown_response(request, claim.remaining)
+        
         try:
-            # Parse timestamp
-            detection_time = datetime.utcnow()
-            if request.timestamp:
-                try:
-                    detection_time = datetime.fromisoformat(
-                        request.timestamp.replace("Z", "+00:00")
-                    )
-                except ValueError:
-                    pass  # Use current time if parsing fails
-            
-            # Upload image to Cloudinary (if present)
-            image_url = None
-            if request.image_base64:
-                image_url = await CloudinaryService.upload_detection_image(
-                    device_id=request.device_id,
-                    image_base64=request.image_base64,
-                    timestamp=detection_time
-                )
+            spooled = await DetectionService._spool_detection(
+                request, detection_id, image_file
+            )
+        
+            response = await DetectionService.run_pipeline(
+                request,
+                detection_id=detection_id,
+                image_file=image_file,
+                spooled=spooled
+            )
+        finally:
+            # No-op once the pipeline reported its write
+            DetectionService._resolve_write(detection_id, False)
+        
+        if not response.success:
+            await DetectionService.release_cooldown(request, detection_id)
+        
+        return response
+    
+    @staticmethod
+    async def accept_detection(
+        request: DetectionRequest,
+        image_file: Optional[BinaryIO] = None
+    ) -> DetectionResponse:
+        """
+        Accept a detection for background processing (fast-ack mode).
+        
+        Checks cooldown, reserves a detection ID and enqueues the pipeline
+        on the ingest queue. The cooldown window starts at acceptance so a
+        burst from one device cannot fill the queue. With the spool enabled,
+        a detection that cannot be queued is left to the spool replayer
+        instead of being rejected.
+        
+        Args:
+            request: Detection request from edge device
+            image_file: Optional binary image owned by the caller until the
+                job is queued; the job closes it once processed
             
-            # Determine if predator
-            is_predator = DetectionService.is_predator(request.animal)
+        Returns:
+            DetectionResponse describing the accepted (or cooled-down) request
             
-            # Store in Firestore (schema unchanged)
-            db = get_firestore()
-            doc_ref = db.collection("detections").document()
+        Raises:
+            QueueClosedError: If the ingest queue is draining for shutdown
+                (spool disabled)
+            asyncio.QueueFull: If the ingest queue is at capacity
+                (spool disabled)
+        """
+        detection_id = DetectionService.new_detection_id()
+        claim = await DetectionService.acquire_cooldown(request, detection_id)
+        
+        if not claim.acquired and not claim.escalated:
+            return DetectionService._cooldown_response(request, claim.remaining)
+        
+        spooled = False
+        if claim.escalated:
+            detection_id = claim.detection_id
+            process = DetectionService.escalate_detection
+        else:
+            spooled = await DetectionService._spool_detection(
+                request, detection_id, image_file
+            )
+            process = functools.partial(DetectionService.run_pipeline, spooled=spooled)
+        
+        async def job() -> None:
+            try:
+                await process(request, detection_id, image_file)
+            finally:
+                if claim.acquired:
+                    # No-op once the pipeline reported its write
+                    DetectionService._resolve_write(detection_id, False)
+                if image_file is not None:
+                    image_file.close()
+        
+        try:
+            get_ingest_queue().submit(job)
+        except Exception:
+            if claim.acquired:
+                DetectionService._resolve_write(detection_id, False)
+            if not spooled:
+                if claim.acquired:
+                    await DetectionService.release_cooldown(request, detection_id)
+                raise
             
-            detection_doc = {
-                "device_id": request.device_id,
-                "animal": request.animal,
+            # Already durable: hand it to the replayer right away
+            if image_file is not None:
+                image_file.close()
+            await run_blocking(get_detection_spool().release, detection_id)
+        
+        return DetectionResponse(
+            success=True,
+            detection_id=detection_id,
+            message="Detection accepted for processing",
+            is_predator=DetectionService.is_predator(request.animal)
+        )
+    
+    @staticmethod
+    async def escalate_detection(
+        request: DetectionRequest,
+        detection_id: str,
+        image_file: Optional[BinaryIO] = None
+    ) -> DetectionResponse:
+        """
+        Update an existing detection with a higher-confidence repeat.
+        
+        Used instead of creating a new document (and alert) when the same
+        device sees the same species again inside its cooldown window. The
+        update waits for the original's document and is skipped if the
+        original could not be stored. Escalations are not spooled.
+        
+        Args:
+            request: The higher-confidence detection request
+            detection_id: Detection that owns the cooldown window
+            image_file: Optional binary image, used instead of
+                ``request.image_base64``
+            
+        Returns:
+            DetectionResponse for the updated detection
+        """
+        from google.cloud.firestore import SERVER_TIMESTAMP, Increment
+        
+        is_predator = DetectionService.is_predator(request.animal)
+        
+        try:
+            detection_time = DetectionService.parse_detection_time(request.timestamp)
+            
+            # Keep the best frame alongside the best confidence
+            image_url = await DetectionService._upload_stage(
+                request, detection_time, image_file
+            )
+            
+            updates: Dict[str, Any] = {
                 "confidence": request.confidence,
-                "is_predator": is_predator,
-                "image_url": image_url,  # Now a Cloudinary URL
-                "detection_time": detection_time,
-                "created_at": SERVER_TIMESTAMP,
-                "alert_sent": False
+                "updated_at": SERVER_TIMESTAMP,
+                "repeat_count": Increment(1)
             }
+            if image_url:
+                updates["image_url"] = image_url
             
-            doc_ref.set(detection_doc)
-            detection_id = doc_ref.id
+            # The original is written once its own stages resolve
+            original = _unwritten.get(detection_id)
+            if original is not None:
+                await original.done.wait()
+                if not original.stored:
+                    return DetectionResponse(
+                        success=False,
+                        message="Original detection was not stored; update skipped",
+                        is_predator=is_predator
+                    )
             
-            # Update cooldown
-            DetectionService.update_cooldown(request.device_id)
+            # update() fails on a missing document (e.g. the original is
+            # still in another worker's spool) instead of creating a partial
+            # one. Not buffered: that failure would fail the whole batch.
+            doc_ref = get_firestore().collection("detections").document(detection_id)
+            with STAGE_DURATION.time("persist"):
+                await run_blocking(doc_ref.update, updates)
+            record = get_detection_history().escalate(
+                detection_id, request.confidence, image_url
+            )
+            if record is not None:
+                get_detection_broadcaster().publish(record, event="update")
+            get_detection_rollups().record_repeat(
+                request.device_id, request.animal, detection_time, request.confidence
+            )
             
-            # Trigger alert for predators
-            alert_triggered = False
+            return DetectionResponse(
+                success=True,
+                detection_id=detection_id,
+                message="Detection updated with higher confidence",
+                is_predator=is_predator,
+                image_url=image_url
+            )
+            
+        except Exception as e:
+            print(f"Error updating detection {detection_id}: {e}")
+            return DetectionResponse(
+                success=False,
+                message=f"Processing error: {str(e)}",
+                is_predator=is_predator
+            )
+    
+    @staticmethod
+    async def _upload_stage(
+        request: DetectionRequest,
+        detection_time: datetime,
+        image_file: Optional[BinaryIO] = None,
+        public_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Upload the detection image to Cloudinary (if present)."""
+        if image_file is not None:
+            return await CloudinaryService.upload_image(
+                device_id=request.device_id,
+                image=image_file,
+                timestamp=detection_time,
+                public_id=public_id
+            )
+        
+        if not request.image_base64:
+            return None
+        
+        return await CloudinaryService.upload_detection_image(
+            device_id=request.device_id,
+            image_base64=request.image_base64,
+            timestamp=detection_time,
+            public_id=public_id
+        )
+    
+    @staticmethod
+    async def _persist_stage(doc_ref, detection_doc: Dict[str, Any]) -> None:
+        """Store the detection document in Firestore (see ``WriteBehindBuffer``)."""
+        await get_write_buffer().set(doc_ref, detection_doc)
+        DetectionService._record_stored(doc_ref.id, detection_doc)
+    
+    @staticmethod
+    def _record_stored(detection_id: str, detection_doc: Dict[str, Any]) -> None:
+        """Add a stored detection to the history cache, rollups and live streams (once)."""
+        if detection_id in _recorded:
+            return
+        _recorded[detection_id] = True
+        record = to_record(detection_id, detection_doc)
+        get_detection_history().add(record)
+        get_detection_rollups().record(detection_doc)
+        get_detection_broadcaster().publish(record)
+    
+    @staticmethod
+    async def _alert_stage(
+        request: DetectionRequest,
+        detection_id: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Trigger the FCM alert as soon as the classification is known."""
+        return await FCMService.send_predator_alert(
+            animal=request.animal,
+            confidence=request.confidence,
+            device_id=request.device_id,
+            detection_id=detection_id
+        )
+    
+    @staticmethod
+    async def run_pipeline(
+        request: DetectionRequest,
+        detection_id: str,
+        image_file: Optional[BinaryIO] = None,
+        spooled: bool = False
+    ) -> DetectionResponse:
+        """
+        Run the upload, alert and persist stages for an accepted detection.
+        
+        The upload and alert stages run concurrently so a slow image upload
+        never delays the predator alert. The document is then written once,
+        with the image URL and alert status, instead of being created first
+        and updated afterwards.
+        
+        For a spooled detection, completed stages are recorded in the spool
+        as they finish. The entry is removed once the detection is stored
+        (with its image); otherwise it is left to the spool replayer and the
+        detection is reported as accepted.
+        
+        Args:
+            request: Detection request from edge device
+            detection_id: Reserved Firestore document ID
+            image_file: Optional binary image, used instead of
+                ``request.image_base64``
+            spooled: Whether the detection was written to the spool
+            
+        Returns:
+            DetectionResponse with processing results
+        """
+        # Spooled detections upload under their ID so a replay reuses the asset
+        public_id = detection_id if spooled else None
+        
+        async def upload_stage(detection_time: datetime) -> Optional[str]:
+            image_url = await DetectionService._upload_stage(
+                request, detection_time, image_file, public_id
+            )
+            if spooled and image_url:
+                await DetectionService._spool_record(detection_id, image_url=image_url)
+            return image_url
+        
+        async def alert_stage() -> Dict[str, Dict[str, Any]]:
+            alert_results = await DetectionService._alert_stage(request, detection_id)
+            if spooled:
+                await DetectionService._spool_record(
+                    detection_id, alert_results=alert_results
+                )
+            return alert_results
+        
+        stored = False
+        
+        try:
+            detection_time = DetectionService.parse_detection_time(request.timestamp)
+            
+            # Determine if predator
+            is_predator = DetectionService.is_predator(request.animal)
+            
+            # Fan out: the alert must not wait for the (slow) image upload
+            stages = [upload_stage(detection_time)]
             if is_predator:
-                alert_triggered = await FCMService.send_predator_alert(
-                    animal=request.animal,
-                    confidence=request.confidence,
-                    device_id=request.device_id,
+                stages.append(alert_stage())
+            
+            results = await asyncio.gather(*stages, return_exceptions=True)
+            image_url = results[0]
+            alert_results = results[1] if is_predator else {}
+            
+            if isinstance(image_url, Exception):
+                print(f"[!] Image upload stage failed (non-blocking): {image_url}")
+                image_url = None
+            if isinstance(alert_results, Exception):
+                print(f"[!] Alert stage failed: {alert_results}")
+                alert_results = {}
+            
+            # One write with the final state
+            doc_ref = get_firestore().collection("detections").document(detection_id)
+            await DetectionService._persist_stage(
+                doc_ref,
+                DetectionService._build_document(
+                    request,
+                    is_predator,
+                    detection_time,
                     image_url=image_url,
-                    detection_id=detection_id
+                    alert_results=alert_results
                 )
-                
-                # Update document with alert status
-                if alert_triggered:
-                    doc_ref.update({"alert_sent": True})
+            )
+            stored = True
+            
+            alert_fields = FCMService.alert_fields(alert_results) if alert_results else {}
+            alert_triggered = alert_fields.get("alert_sent", False)
+            
+            if spooled:
+                has_image = image_file is not None or bool(request.image_base64)
+                spool = get_detection_spool()
+                if image_url or not has_image:
+                    await run_blocking(spool.complete, detection_id)
+                else:
+                    # Stored without its image: let the replayer retry it
+                    await run_blocking(
+                        DetectionService._release_spooled, detection_id, True
+                    )
             
             return DetectionResponse(
                 success=True,
@@ -157,8 +590,332 @@ class DetectionService:
             
         except Exception as e:
             print(f"Error processing detection: {e}")
+            is_predator = DetectionService.is_predator(request.animal)
+            
+            if spooled:
+                try:
+                    await run_blocking(
+                        DetectionService._release_spooled, detection_id, stored
+                    )
+                except Exception as spool_error:
+                    print(f"[!] Spool release failed for {detection_id}: {spool_error}")
+                
+                return DetectionResponse(
+                    success=True,
+                    detection_id=detection_id,
+                    message="Detection stored locally, delivery pending",
+                    is_predator=is_predator
+                )
+            
             return DetectionResponse(
                 success=False,
                 message=f"Processing error: {str(e)}",
-                is_predator=DetectionService.is_predator(request.animal)
+                is_predator=is_predator
+            )
+        
+        finally:
+            DetectionService._resolve_write(detection_id, stored)
+    
+    @staticmethod
+    async def _spool_detection(
+        request: DetectionRequest,
+        detection_id: str,
+        image_file: Optional[BinaryIO] = None
+    ) -> bool:
+        """
+        Write an accepted detection (and its image) to the spool.
+        
+        Returns:
+            True if the detection is spooled; False when spooling is
+            disabled or the write failed (the detection is then processed
+            without a durability guarantee)
+        """
+        spool = get_detection_spool()
+        if spool is None:
+            return False
+        
+        def append() -> None:
+            if image_file is not None:
+                image = read_image(image_file)
+            elif request.image_base64:
+                image = CloudinaryService.decode_image(request.image_base64)
+            else:
+                image = None
+            
+            spool.append(
+                detection_id,
+                request.model_dump(exclude={"image_base64"}),
+                image,
+                DetectionService.parse_detection_time(request.timestamp)
             )
+        
+        try:
+            await run_blocking(append)
+            return True
+        except Exception as e:
+            DEPENDENCY_ERRORS.inc("spool")
+            print(f"[!] Spool write failed for {detection_id}: {e}")
+            return False
+    
+    @staticmethod
+    def _release_spooled(detection_id: str, stored: bool) -> None:
+        """Hand a spooled detection to the replayer, noting if its document is stored."""
+        spool = get_detection_spool()
+        if stored:
+            spool.record(detection_id, stored=True)
+        spool.release(detection_id)
+    
+    @staticmethod
+    async def _spool_record(detection_id: str, **stages: Any) -> None:
+        """Record completed stages of a spooled detection (best effort)."""
+        try:
+            await run_blocking(get_detection_spool().record, detection_id, **stages)
+        except Exception as e:
+            DEPENDENCY_ERRORS.inc("spool")
+            print(f"[!] Spool record failed for {detection_id}: {e}")
+    
+    @staticmethod
+    async def replay_detection(entry: SpoolEntry) -> None:
+        """
+        Deliver a spooled detection, skipping stages it already completed.
+        
+        Every step is idempotent: the image is uploaded under the detection
+        ID, alerts are sent only if none were recorded, and the document is
+        written with ``set`` under the reserved ID. Escalations arriving
+        meanwhile wait for the write. A detection already stored without its
+        image only has the image attached to its document.
+        
+        Args:
+            entry: Spooled detection leased from the spool
+            
+        Raises:
+            Exception: If the detection could not be delivered; the replayer
+                retries it with backoff
+        """
+        if entry.stored:
+            await DetectionService._replay_image(entry)
+            return
+        
+        _unwritten.setdefault(entry.detection_id, _OriginalWrite())
+        stored = False
+        try:
+            await DetectionService._replay_stages(entry)
+            stored = True
+        finally:
+            DetectionService._resolve_write(entry.detection_id, stored)
+    
+    @staticmethod
+    async def _replay_upload(entry: SpoolEntry, request: DetectionRequest) -> Optional[str]:
+        """
+        Upload a spooled image not uploaded yet.
+        
+        Returns:
+            The image URL; None when there is no image or the last attempt
+            failed
+            
+        Raises:
+            RuntimeError: If the upload failed and attempts remain
+        """
+        image_url = entry.image_url
+        if image_url is None and entry.image is not None:
+            image_url = await CloudinaryService.upload_image(
+                device_id=request.device_id,
+                image=entry.image,
+                timestamp=entry.detection_time,
+                public_id=entry.detection_id
+            )
+            if image_url:
+                await run_blocking(
+                    get_detection_spool().record, entry.detection_id, image_url=image_url
+                )
+            elif entry.attempts + 1 < _SPOOL_IMAGE_ATTEMPTS:
+                raise RuntimeError("Image upload failed")
+        return image_url
+    
+    @staticmethod
+    async def _replay_image(entry: SpoolEntry) -> None:
+        """Attach the image to a detection stored without it."""
+        request = DetectionRequest(**entry.payload)
+        image_url = await DetectionService._replay_upload(entry, request)
+        if not image_url:
+            return
+        
+        # Not a new detection: history, rollups and streams already have it
+        doc_ref = get_firestore().collection("detections").document(entry.detection_id)
+        with STAGE_DURATION.time("persist"):
+            await run_blocking(doc_ref.update, {"image_url": image_url})
+        record = get_detection_history().attach_image(entry.detection_id, image_url)
+        if record is not None:
+            get_detection_broadcaster().publish(record, event="update")
+    
+    @staticmethod
+    async def _replay_stages(entry: SpoolEntry) -> None:
+        """Run the stages of ``replay_detection`` the entry has not completed."""
+        request = DetectionRequest(**entry.payload)
+        is_predator = DetectionService.is_predator(request.animal)
+        spool = get_detection_spool()
+        
+        image_url = await DetectionService._replay_upload(entry, request)
+        
+        alert_results = entry.alert_results
+        if is_predator and alert_results is None:
+            alert_results = await DetectionService._alert_stage(
+                request, entry.detection_id
+            )
+            await run_blocking(
+                spool.record, entry.detection_id, alert_results=alert_results
+            )
+        
+        doc_ref = get_firestore().collection("detections").document(entry.detection_id)
+        await DetectionService._persist_stage(
+            doc_ref,
+            DetectionService._build_document(
+                request,
+                is_predator,
+                entry.detection_time,
+                image_url=image_url,
+                alert_results=alert_results
+            )
+        )
+    
+    @staticmethod
+    async def process_batch(requests: List[DetectionRequest]) -> List[DetectionResponse]:
+        """
+        Process a batch of detections replayed by an edge device.
+        
+        Items are handled in detection-time order. The (device, species)
+        cooldown window is applied on the detection timestamps within the
+        batch, so an old replay is not suppressed by (nor suppresses) live
+        traffic. A higher-confidence repeat inside a window replaces the
+        window's record instead of creating another one. Only the most
+        recent predator record per device triggers an alert, and records
+        are persisted with chunked WriteBatch commits.
+        
+        Args:
+            requests: Detection requests, in any order
+            
+        Returns:
+            One DetectionResponse per request, in request order. Requests
+            merged into one record share its detection_id.
+        """
+        responses: List[Optional[DetectionResponse]] = [None] * len(requests)
+        
+        times = [DetectionService.parse_detection_time(r.timestamp) for r in requests]
+        order = sorted(range(len(requests)), key=lambda i: times[i])
+        
+        # Apply cooldown windows in event-time order. Each record keeps the
+        # highest-confidence request of its window.
+        records: List[int] = []         # request index stored for each record
+        members: List[List[int]] = []   # requests merged into each record
+        windows: Dict[str, Tuple[datetime, int]] = {}  # key -> (start, record)
+        for i in order:
+            request = requests[i]
+            key = DetectionService.cooldown_key(request)
+            window = windows.get(key)
+            
+            if window is not None:
+                elapsed = (times[i] - window[0]).total_seconds()
+                cooldown = DetectionService.cooldown_window(request.animal)
+                if elapsed < cooldown:
+                    record = window[1]
+                    if request.confidence > requests[records[record]].confidence:
+                        records[record] = i
+                        members[record].append(i)
+                    else:
+                        responses[i] = DetectionService._cooldown_response(
+                            request, int(cooldown - elapsed)
+                        )
+                    continue
+            
+            windows[key] = (times[i], len(records))
+            records.append(i)
+            members.append([i])
+        
+        is_predator = [DetectionService.is_predator(requests[i].animal) for i in records]
+        
+        # Only the latest predator record per device alerts
+        latest_predator: Dict[str, int] = {}
+        for k in sorted(range(len(records)), key=lambda k: times[records[k]]):
+            if is_predator[k]:
+                latest_predator[requests[records[k]].device_id] = k
+        alert_records = set(latest_predator.values())
+        
+        detection_ids = [DetectionService.new_detection_id() for _ in records]
+        
+        async def no_alert() -> Dict[str, Dict[str, Any]]:
+            return {}
+        
+        # Uploads and alerts run concurrently; the documents are written
+        # once both are known.
+        upload_results, alert_results = await asyncio.gather(
+            asyncio.gather(*[
+                DetectionService._upload_stage(requests[i], times[i])
+                for i in records
+            ], return_exceptions=True),
+            asyncio.gather(*[
+                DetectionService._alert_stage(requests[i], detection_ids[k])
+                if k in alert_records else no_alert()
+                for k, i in enumerate(records)
+            ], return_exceptions=True)
+        )
+        
+        # Failed uploads/alerts are non-blocking, as in run_pipeline
+        image_urls = [url if isinstance(url, str) else None for url in upload_results]
+        alerts = [
+            results if isinstance(results, dict) else {}
+            for results in alert_results
+        ]
+        
+        for start in range(0, len(records), FIRESTORE_BATCH_LIMIT):
+            chunk = range(start, min(start + FIRESTORE_BATCH_LIMIT, len(records)))
+            error: Optional[Exception] = None
+            documents = {
+                k: DetectionService._build_document(
+                    requests[records[k]],
+                    is_predator[k],
+                    times[records[k]],
+                    image_url=image_urls[k],
+                    alert_results=alerts[k]
+                )
+                for k in chunk
+            }
+            
+            try:
+                db = get_firestore()
+                collection = db.collection("detections")
+                batch = db.batch()
+                
+                for k in chunk:
+                    batch.set(collection.document(detection_ids[k]), documents[k])
+                
+                with STAGE_DURATION.time("persist"):
+                    await run_blocking(batch.commit)
+                
+                for k in chunk:
+                    DetectionService._record_stored(detection_ids[k], documents[k])
+            except Exception as e:
+                DEPENDENCY_ERRORS.inc("firestore")
+                print(f"Error committing detection batch: {e}")
+                error = e
+            
+            for k in chunk:
+                if error is not None:
+                    result = DetectionResponse(
+                        success=False,
+                        message=f"Processing error: {str(error)}",
+                        is_predator=is_predator[k]
+                    )
+                else:
+                    result = DetectionResponse(
+                        success=True,
+                        detection_id=detection_ids[k],
+                        message="Detection processed successfully",
+                        is_predator=is_predator[k],
+                        alert_triggered=FCMService.alert_fields(alerts[k])["alert_sent"],
+                        image_url=image_urls[k]
+                    )
+                
+                for i in members[k]:
+                    responses[i] = result
+        
+        return responses
@@ -0,0 +1,247 @@
+"""In-process fan-out of stored detections to live stream subscribers.
+
+``GET /api/detections/stream`` subscribes here. Every detection stored by
+this process is serialized once as a Server-Sent Events frame and appended
+to the buffer of each subscriber whose filters match: subscribers are
+indexed by device, so a publish only touches matching subscribers. A
+subscriber whose buffer holds ``STREAM_QUEUE_SIZE`` undelivered frames is
+a slow consumer and is dropped; its client reconnects and can backfill
+from ``GET /api/detections``.
+
+An idle subscriber is a small slotted object with no task or timer of its
+own; one heartbeat task pings every subscriber every
+``STREAM_HEARTBEAT_SECONDS``.
+
+Each worker process streams only the detections it stores. Streams are
+ended when the shutdown signal arrives (see ``app.core.shutdown``), since
+the server waits for open connections before it shuts the app down.
+"""
+
+import asyncio
+from typing import Callable, Dict, FrozenSet, List, Optional, Set
+
+from app.config import get_settings
+from app.models.detection import DetectionRecord
+
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+class StreamFullError(Exception):
+    """No stream can be opened: ``STREAM_MAX_SUBSCRIBERS`` reached, or shutting down."""
+
+
+class Subscription:
+    """Filtered, bounded buffer of SSE frames for one stream client."""
+    
+    __slots__ = (
+        "device_ids", "animal", "is_predator", "_frames", "_max_frames",
+        "_waiter", "_on_close", "closed"
+    )
+    
+    def __init__(
+        self,
+        device_ids: Optional[FrozenSet[str]],
+        animal: Optional[str],
+        is_predator: Optional[bool],
+        max_frames: int,
+        on_close: Callable[["Subscription"], None]
+    ):
+        self.device_ids = device_ids
+        self.animal = animal
+        self.is_predator = is_predator
+        self._frames: List[bytes] = []
+        self._max_frames = max_frames
+        self._waiter: Optional[asyncio.Future] = None
+        self._on_close = on_close
+        self.closed = False
+    
+    def matches(self, record: DetectionRecord) -> bool:
+        """Whether a detection passes the animal and predator filters."""
+        return (
+            (self.animal is None or record.animal == self.animal)
+            and (self.is_predator is None or record.is_predator == self.is_predator)
+        )
+    
+    def push(self, frame: bytes) -> bool:
+        """
+        Buffer a frame for the client.
+        
+        Returns:
+            False if the buffer is full (the client is not keeping up)
+        """
+        if len(self._frames) >= self._max_frames:
+            return False
+        self._frames.append(frame)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+        return True
+    
+    async def next(self) -> bytes:
+        """
+        Wait for frames.
+        
+        Returns:
+            Every buffered frame, joined; empty once the subscription is closed
+        """
+        while not self._frames:
+            if self.closed:
+                return b""
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        
+        if self.closed:
+            return b""
+        frames, self._frames = self._frames, []
+        return b"".join(frames)
+    
+    def close(self) -> None:
+        """End the stream (idempotent)."""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames = []
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+        self._on_close(self)
+
+
+class DetectionBroadcaster:
+    """Publishes stored detections to matching subscriptions."""
+    
+    def __init__(self, max_subscribers: int, queue_size: int, heartbeat_seconds: float):
+        self._max_subscribers = max_subscribers
+        self._queue_size = queue_size
+        self._heartbeat_seconds = heartbeat_seconds
+        self._all_devices: Set[Subscription] = set()
+        self._by_device: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._closed = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+    
+    def subscribe(
+        self,
+        device_ids: Optional[FrozenSet[str]] = None,
+        animal: Optional[str] = None,
+        is_predator: Optional[bool] = None
+    ) -> Subscription:
+        """
+        Open a subscription for detections matching the filters.
+        
+        Raises:
+            StreamFullError: If the subscriber limit is reached or the
+                broadcaster is closed
+        """
+        if self._closed:
+            raise StreamFullError("Shutting down")
+        if self._count >= self._max_subscribers:
+            raise StreamFullError(f"{self._max_subscribers} streams already open")
+        
+        subscription = Subscription(
+            device_ids, animal, is_predator, self._queue_size, self._unsubscribe
+        )
+        if device_ids is None:
+            self._all_devices.add(subscription)
+        else:
+            for device_id in device_ids:
+                self._by_device.setdefault(device_id, set()).add(subscription)
+        self._count += 1
+        
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._run_heartbeat(), name="stream-heartbeat")
+        
+        return subscription
+    
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.device_ids is None:
+            self._all_devices.discard(subscription)
+        else:
+            for device_id in subscription.device_ids:
+                subscribers = self._by_device.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_device[device_id]
+        self._count -= 1
+    
+    def _deliver(self, subscription: Subscription, frame: bytes) -> None:
+        if subscription.push(frame):
+            self.delivered += 1
+        else:
+            self.dropped += 1
+            print("[!] Dropping slow detection stream subscriber")
+            subscription.close()
+    
+    def publish(self, record: DetectionRecord, event: str = "detection") -> None:
+        """Send a detection to every matching subscriber."""
+        if not self._count:
+            return
+        
+        subscribers = list(self._all_devices)
+        subscribers.extend(self._by_device.get(record.device_id, ()))
+        matching = [s for s in subscribers if s.matches(record)]
+        if not matching:
+            return
+        
+        self.published += 1
+        frame = (
+            f"id: {record.detection_id}\nevent: {event}\n"
+            f"data: {record.model_dump_json()}\n\n"
+        ).encode()
+        for subscription in matching:
+            self._deliver(subscription, frame)
+    
+    async def _run_heartbeat(self) -> None:
+        """Ping every subscriber so proxies keep idle streams open."""
+        while self._count:
+            await asyncio.sleep(self._heartbeat_seconds)
+            subscribers = list(self._all_devices)
+            for device_subscribers in list(self._by_device.values()):
+                subscribers.extend(device_subscribers)
+            for subscription in set(subscribers):
+                self._deliver(subscription, HEARTBEAT_FRAME)
+    
+    def close(self) -> None:
+        """End every stream and refuse new ones (on shutdown)."""
+        self._closed = True
+        subscribers = set(self._all_devices)
+        for device_subscribers in self._by_device.values():
+            subscribers.update(device_subscribers)
+        for subscription in subscribers:
+            subscription.close()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+    
+    def stats(self) -> Dict[str, int]:
+        """Subscriber and delivery counters."""
+        return {
+            "subscribers": self._count,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped
+        }
+
+
+_broadcaster: Optional[DetectionBroadcaster] = None
+
+
+def get_detection_broadcaster() -> DetectionBroadcaster:
+    """Get the process-wide detection broadcaster."""
+    global _broadcaster
+    
+    if _broadcaster is None:
+        settings = get_settings()
+        _broadcaster = DetectionBroadcaster(
+            max_subscribers=settings.stream_max_subscribers,
+            queue_size=settings.stream_queue_size,
+            heartbeat_seconds=settings.stream_heartbeat_seconds
+        )
+    
+    return _broadcaster
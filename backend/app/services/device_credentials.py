@@ -0,0 +1,200 @@
+"""Per-device API keys, indexed in memory by key digest.
+
+Each device has its own key, so one device can be revoked without touching
+the others. Only SHA-256 digests of the keys are stored (see
+``app.config.hash_api_key``). The credential source is selected by
+``DEVICE_KEYS_SOURCE``:
+
+- ``file``: a JSON object at ``DEVICE_KEYS_PATH`` mapping each device_id to
+  its key digest (hex), or a list of digests while rotating keys. The file
+  is re-read when its modification time changes.
+- ``firestore``: documents in the ``device_credentials`` collection with
+  ``device_id``, ``key_sha256`` and an optional ``revoked`` flag, kept in
+  sync incrementally by a snapshot listener.
+
+Requests authenticate with one dictionary lookup; no remote read is made.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import get_settings, hash_api_key
+from app.core.executor import run_blocking
+from app.core.firebase import get_firestore
+
+
+CREDENTIALS_COLLECTION = "device_credentials"
+
+
+class DeviceCredentialStore:
+    """In-memory ``key digest -> device_id`` index with hot reload."""
+    
+    def __init__(self, source: str, path: str, poll_seconds: float):
+        self.source = source
+        self._path = path
+        self._poll = poll_seconds
+        self._index: Dict[bytes, str] = {}
+        # Firestore document ID -> digest it contributed, to apply changes
+        self._docs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watch = None
+        self.reloads = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.source in ("file", "firestore")
+    
+    def lookup(self, api_key: str) -> Optional[str]:
+        """Return the device_id bound to an API key, or None if unknown."""
+        return self._index.get(hash_api_key(api_key))
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    async def start(self) -> None:
+        """Load the credentials, then keep them in sync with the source."""
+        if self.source == "file":
+            await run_blocking(self._reload_file)
+            if self._task is None:
+                self._task = asyncio.create_task(self._watch_file(), name="device-keys-watch")
+        elif self.source == "firestore":
+            try:
+                await run_blocking(self._load_firestore)
+            except Exception as e:
+                print(f"[!] Device credentials not loaded: {e}")
+            self._start_listener()
+        
+        if self.enabled:
+            print(f"[+] Loaded {len(self)} device credentials from {self.source}")
+    
+    async def stop(self) -> None:
+        """Stop watching the credential source."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+    
+    # File source
+    
+    def _reload_file(self) -> bool:
+        """Re-read the key file if it changed. Returns True if reloaded."""
+        try:
+            mtime = os.stat(self._path).st_mtime
+        except FileNotFoundError:
+            print(f"[!] Device key file not found: {self._path}")
+            return False
+        
+        if mtime == self._mtime:
+            return False
+        
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                entries = json.load(f)
+            
+            index = {}
+            for device_id, digests in entries.items():
+                if isinstance(digests, str):
+                    digests = [digests]
+                for digest in digests:
+                    index[bytes.fromhex(digest)] = device_id
+        except (OSError, ValueError, AttributeError) as e:
+            # Keep serving the last good index
+            print(f"[!] Invalid device key file {self._path}: {e}")
+            return False
+        
+        self._index = index  # Swapped atomically; lookups never lock
+        self._mtime = mtime
+        self.reloads += 1
+        return True
+    
+    async def _watch_file(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll)
+            if await run_blocking(self._reload_file):
+                print(f"[+] Reloaded {len(self)} device credentials")
+    
+    # Firestore source
+    
+    @staticmethod
+    def _parse_doc(data: Dict[str, Any]) -> Optional[Tuple[bytes, str]]:
+        """Digest and device_id of an active credential document."""
+        if data.get("revoked") or not data.get("device_id") or not data.get("key_sha256"):
+            return None
+        try:
+            return bytes.fromhex(data["key_sha256"]), data["device_id"]
+        except ValueError:
+            return None
+    
+    def _apply(self, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """Apply one added, modified or removed credential document."""
+        with self._lock:
+            old = self._docs.pop(doc_id, None)
+            if old is not None:
+                self._index.pop(old, None)
+            
+            parsed = self._parse_doc(data) if data is not None else None
+            if parsed is not None:
+                digest, device_id = parsed
+                self._index[digest] = device_id
+                self._docs[doc_id] = digest
+    
+    def _load_firestore(self) -> None:
+        for doc in get_firestore().collection(CREDENTIALS_COLLECTION).stream():
+            self._apply(doc.id, doc.to_dict())
+    
+    def _start_listener(self) -> None:
+        if self._watch is not None:
+            return
+        try:
+            self._watch = get_firestore().collection(CREDENTIALS_COLLECTION).on_snapshot(
+                self._on_snapshot
+            )
+        except Exception as e:
+            print(f"[!] Device credential listener not started (no hot reload): {e}")
+    
+    def _on_snapshot(self, snapshots, changes, read_time) -> None:
+        """Listener callback (runs on a Firestore SDK thread)."""
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self._apply(change.document.id, None)
+            else:
+                self._apply(change.document.id, change.document.to_dict())
+        if changes:
+            self.reloads += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Credential index size and reload counters."""
+        with self._lock:
+            devices = len(set(self._index.values()))
+        return {
+            "source": self.source or None,
+            "devices": devices,
+            "reloads": self.reloads,
+            "listener_active": self._watch is not None or self._task is not None
+        }
+
+
+_store: Optional[DeviceCredentialStore] = None
+
+
+def get_device_credentials() -> DeviceCredentialStore:
+    """Get the process-wide device credential store."""
+    global _store
+    
+    if _store is None:
+        settings = get_settings()
+        _store = DeviceCredentialStore(
+            source=settings.device_keys_source.lower(),
+            path=settings.device_keys_path,
+            poll_seconds=settings.device_keys_poll_seconds
+        )
+    
+    return _store
@@ -1,8 +1,17 @@
 """Firebase Cloud Messaging service for push notifications."""
 
-from typing import Dict, List, Optional, Any
-from firebase_admin import messaging
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
+from app.core.executor import run_blocking
 from app.core.firebase import get_firestore
+from app.core.metrics import DEPENDENCY_ERRORS, STAGE_DURATION
+from app.services.alert_config_cache import get_alert_config_cache
+
+
+# FCM and Firestore request limits
+_MULTICAST_LIMIT = 500
+_IN_QUERY_LIMIT = 30
+_WRITE_BATCH_LIMIT = 500
 
 
 class FCMService:
@@ -11,31 +20,13 @@ class FCMService:
     @staticmethod
     async def get_alert_config() -> Dict[str, Any]:
         """
-        Fetch alert configuration from Firestore.
+        Fetch alert configuration (cached, see ``AlertConfigCache``).
         
         Returns:
             Alert configuration dictionary
         """
-        try:
-            db = get_firestore()
-            doc = db.collection("alert_config").document("global").get()
-            
-            if doc.exists:
-                return doc.to_dict()
-            
-            # Default configuration
-            return {
-                "alert_enabled": True,
-                "siren_enabled": True,
-                "sms_enabled": False,
-                "owner_contacts": [],
-                "authority_contacts": [],
-                "fcm_topics": ["predator_alerts"]
-            }
-            
-        except Exception as e:
-            print(f"Error fetching alert config: {e}")
-            return {"alert_enabled": False}
+        with STAGE_DURATION.time("alert_config"):
+            return await get_alert_config_cache().get()
     
     @staticmethod
     async def send_predator_alert(
@@ -44,10 +35,14 @@ class FCMService:
         device_id: str,
         image_url: Optional[str] = None,
         detection_id: Optional[str] = None
-    ) -> bool:
+    ) -> Dict[str, Dict[str, Any]]:
         """
         Send predator alert notification via FCM.
         
+        All configured topics are sent in one ``send_each`` call, so the
+        messages go out concurrently and one failing topic does not stop
+        the others.
+        
         Args:
             animal: Detected predator type
             confidence: Detection confidence score
@@ -56,15 +51,21 @@ class FCMService:
             detection_id: Firestore document ID
             
         Returns:
-            True if alert was sent successfully
+            Per-topic results: ``{topic: {"success", "message_id", "error"}}``.
+            Empty if alerts are disabled or nothing could be sent.
         """
+        # Deferred with the rest of the SDK (see ``app.core.firebase``)
+        from firebase_admin import messaging
+        
+        topics: List[str] = []
+        
         try:
             # Get alert configuration
             config = await FCMService.get_alert_config()
             
             if not config.get("alert_enabled", True):
                 print("Alerts are disabled in configuration")
-                return False
+                return {}
             
             # Build data payload (for handling in app)
             # NOTE: We send data-only message (no notification) so Flutter's
@@ -89,25 +90,74 @@ class FCMService:
                 ttl=0,  # Immediate delivery, no delay
             )
             
-            # Send to topic
-            topics = config.get("fcm_topics", ["predator_alerts"])
+            # Send to every topic in one batched call
+            topics = list(config.get("fcm_topics", ["predator_alerts"]))
             
-            for topic in topics:
-                # Data-only message (no notification key) - allows background processing
-                message = messaging.Message(
+            if not topics:
+                return {}
+            
+            # Data-only messages (no notification key) - allow background processing
+            messages = [
+                messaging.Message(
                     data=data,
                     android=android_config,
                     topic=topic
                 )
-                
-                response = messaging.send(message)
-                print(f"Data-only alert sent to topic '{topic}': {response}")
+                for topic in topics
+            ]
+            
+            with STAGE_DURATION.time("fcm_send"):
+                batch = await run_blocking(messaging.send_each, messages)
             
-            return True
+            results = {}
+            for topic, response in zip(topics, batch.responses):
+                if response.success:
+                    print(f"Data-only alert sent to topic '{topic}': {response.message_id}")
+                    results[topic] = {
+                        "success": True,
+                        "message_id": response.message_id,
+                        "error": None
+                    }
+                else:
+                    DEPENDENCY_ERRORS.inc("fcm")
+                    print(f"Error sending FCM alert to topic '{topic}': {response.exception}")
+                    results[topic] = {
+                        "success": False,
+                        "message_id": None,
+                        "error": str(response.exception)
+                    }
+            
+            return results
             
         except Exception as e:
+            DEPENDENCY_ERRORS.inc("fcm")
             print(f"Error sending FCM alert: {e}")
-            return False
+            return {
+                topic: {"success": False, "message_id": None, "error": str(e)}
+                for topic in topics
+            }
+    
+    @staticmethod
+    def alert_fields(results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Summarize per-topic alert results as detection document fields.
+        
+        Returns:
+            ``alert_sent`` (any topic succeeded), plus ``alert_failed_topics``
+            with the error per topic when some topics failed
+        """
+        fields: Dict[str, Any] = {
+            "alert_sent": any(r["success"] for r in results.values())
+        }
+        
+        failed = [
+            {"topic": topic, "error": r["error"]}
+            for topic, r in results.items() if not r["success"]
+        ]
+        if failed:
+            fields["alert_failed_topics"] = failed
+        
+        return fields
     
     @staticmethod
     async def send_to_tokens(
@@ -119,6 +169,11 @@ class FCMService:
         """
         Send notification to specific device tokens.
         
+        Tokens are split into chunks of 500 (the FCM multicast limit) that are
+        sent concurrently with ``send_each_for_multicast``. Tokens FCM reports
+        as unregistered or invalid are cleared from the ``users`` documents
+        that hold them (see ``prune_tokens``).
+        
         Args:
             tokens: List of FCM device tokens
             title: Notification title
@@ -126,10 +181,48 @@ class FCMService:
             data: Optional data payload
             
         Returns:
-            Dictionary with success and failure counts
+            Dictionary with success, failure and pruned counts
         """
         if not tokens:
-            return {"success": 0, "failure": 0}
+            return {"success": 0, "failure": 0, "pruned": 0}
+        
+        chunks = [
+            tokens[i:i + _MULTICAST_LIMIT]
+            for i in range(0, len(tokens), _MULTICAST_LIMIT)
+        ]
+        
+        results = await asyncio.gather(*[
+            FCMService._send_multicast_chunk(chunk, title, body, data)
+            for chunk in chunks
+        ])
+        
+        success = sum(result[0] for result in results)
+        dead_tokens = [token for result in results for token in result[1]]
+        
+        pruned = 0
+        if dead_tokens:
+            pruned = await FCMService.prune_tokens(dead_tokens)
+        
+        return {
+            "success": success,
+            "failure": len(tokens) - success,
+            "pruned": pruned
+        }
+    
+    @staticmethod
+    async def _send_multicast_chunk(
+        tokens: List[str],
+        title: str,
+        body: str,
+        data: Optional[Dict[str, str]]
+    ) -> Tuple[int, List[str]]:
+        """
+        Send one multicast chunk (at most 500 tokens).
+        
+        Returns:
+            Tuple of (success_count, dead_tokens)
+        """
+        from firebase_admin import exceptions, messaging
         
         try:
             message = messaging.MulticastMessage(
@@ -144,13 +237,86 @@ class FCMService:
                 )
             )
             
-            response = messaging.send_multicast(message)
-            
-            return {
-                "success": response.success_count,
-                "failure": response.failure_count
-            }
+            with STAGE_DURATION.time("fcm_send"):
+                response = await run_blocking(messaging.send_each_for_multicast, message)
             
         except Exception as e:
+            DEPENDENCY_ERRORS.inc("fcm")
             print(f"Error sending multicast: {e}")
-            return {"success": 0, "failure": len(tokens)}
+            return 0, []
+        
+        unregistered = []
+        invalid = []
+        for token, result in zip(tokens, response.responses):
+            if isinstance(result.exception, messaging.UnregisteredError):
+                unregistered.append(token)
+            elif isinstance(result.exception, exceptions.InvalidArgumentError):
+                invalid.append(token)
+        
+        # INVALID_ARGUMENT for every token points at the message, not the
+        # tokens; don't clear every user's token over a bad payload.
+        if invalid and len(invalid) == len(tokens):
+            print(f"[!] Multicast rejected for all {len(tokens)} tokens, not pruning")
+            invalid = []
+        
+        return response.success_count, unregistered + invalid
+    
+    @staticmethod
+    async def prune_tokens(tokens: List[str]) -> int:
+        """
+        Clear dead tokens from the user profiles they are registered on.
+        
+        The app stores each user's device token as ``fcm_token`` on their
+        ``users`` document. Matching documents are looked up with ``in``
+        queries and the field is deleted with batched writes. Each delete
+        requires the document to be unchanged since the lookup, so a token
+        the app registered meanwhile is kept; a batch holding such a
+        document fails as a whole, and its dead tokens are pruned on a
+        later send.
+        
+        Args:
+            tokens: FCM tokens that will never be delivered again
+            
+        Returns:
+            Number of user documents cleared
+        """
+        from google.cloud.firestore import DELETE_FIELD
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        
+        try:
+            db = get_firestore()
+            users = db.collection("users")
+            
+            def find_snapshots(chunk: List[str]) -> list:
+                query = users.where(filter=FieldFilter("fcm_token", "in", chunk))
+                return list(query.stream())
+            
+            lookups = await asyncio.gather(*[
+                run_blocking(find_snapshots, tokens[i:i + _IN_QUERY_LIMIT])
+                for i in range(0, len(tokens), _IN_QUERY_LIMIT)
+            ])
+            snapshots = [snapshot for found in lookups for snapshot in found]
+            
+        except Exception as e:
+            print(f"Error pruning FCM tokens: {e}")
+            return 0
+
+        pruned = 0
+        for i in range(0, len(snapshots), _WRITE_BATCH_LIMIT):
+            chunk = snapshots[i:i + _WRITE_BATCH_LIMIT]
+            batch = db.batch()
+            for snapshot in chunk:
+                batch.update(
+                    snapshot.reference,
+                    {"fcm_token": DELETE_FIELD},
+                    option=db.write_option(last_update_time=snapshot.update_time)
+                )
+            try:
+                await run_blocking(batch.commit)
+                pruned += len(chunk)
+            except Exception as e:
+                print(f"Error pruning FCM tokens: {e}")
+        
+        if pruned:
+            print(f"[+] Pruned {pruned} dead FCM tokens")
+        return pruned
@@ -0,0 +1,177 @@
+"""Content-addressed cache of uploaded images.
+
+A static camera watching a sleeping predator sends the same frame again and
+again. Before uploading, the image is looked up by its SHA-256 digest and,
+optionally, by a perceptual hash (``perceptual_hash``) within
+``IMAGE_DEDUP_MAX_DISTANCE`` bits of a recent upload from the same device.
+A match reuses the stored ``secure_url`` without a network call.
+
+Both indexes are bounded LRU caches (``IMAGE_DEDUP_MAX_ENTRIES``).
+"""
+
+import hashlib
+from collections import deque
+from typing import Any, BinaryIO, Deque, Dict, NamedTuple, Optional, Tuple, Union
+
+from cachetools import LRUCache
+
+from app.config import get_settings, on_settings_reload
+from app.core.executor import run_blocking, run_in_process
+from app.core.metrics import IMAGE_DEDUP_BYTES_SAVED, IMAGE_DEDUP_LOOKUPS
+from app.services.image_processing import Image, perceptual_hash, read_image
+
+
+# Recent perceptual hashes compared per device
+_RECENT_PER_DEVICE = 16
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class ImageFingerprint(NamedTuple):
+    """Identity of an image for deduplication."""
+    
+    digest: bytes
+    size: int
+    phash: Optional[int] = None
+
+
+def _digest(image: Union[bytes, BinaryIO]) -> Tuple[bytes, int]:
+    """SHA-256 and size of an image, streaming file objects in chunks."""
+    if not hasattr(image, "read"):
+        return hashlib.sha256(image).digest(), len(image)
+    
+    sha = hashlib.sha256()
+    size = 0
+    image.seek(0)
+    for chunk in iter(lambda: image.read(_HASH_CHUNK_BYTES), b""):
+        sha.update(chunk)
+        size += len(chunk)
+    image.seek(0)
+    return sha.digest(), size
+
+
+class ImageDedupCache:
+    """Maps image fingerprints to the ``secure_url`` of an earlier upload."""
+    
+    def __init__(self, max_entries: int, perceptual: bool, max_distance: int):
+        self.enabled = max_entries > 0
+        self.perceptual = self.enabled and perceptual and Image is not None
+        self._max_distance = max_distance
+        self._exact: LRUCache = LRUCache(maxsize=max(1, max_entries))
+        # device_id -> recent (phash, url) pairs
+        self._recent: LRUCache = LRUCache(maxsize=max(1, max_entries // _RECENT_PER_DEVICE))
+        self.lookups = 0
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.bytes_saved = 0
+        
+        if self.enabled and perceptual and Image is None:
+            print("[!] Pillow not installed - perceptual image dedup disabled")
+    
+    async def fingerprint(self, image: Union[bytes, BinaryIO]) -> Optional[ImageFingerprint]:
+        """Hash an image off the event loop (None when dedup is disabled)."""
+        if not self.enabled:
+            return None
+        
+        digest, size = await run_blocking(_digest, image)
+        if not self.perceptual or digest in self._exact:
+            return ImageFingerprint(digest, size)
+        
+        data = image
+        if hasattr(image, "read"):
+            data = await run_blocking(read_image, image)
+        
+        try:
+            phash = await run_in_process(perceptual_hash, data)
+        except Exception as e:
+            print(f"[!] Perceptual hash failed (exact match only): {e}")
+            phash = None
+        
+        return ImageFingerprint(digest, size, phash)
+    
+    def lookup(self, device_id: str, fingerprint: Optional[ImageFingerprint]) -> Optional[str]:
+        """URL of an earlier upload of the same (or a near-identical) image."""
+        if fingerprint is None:
+            return None
+        
+        self.lookups += 1
+        
+        url = self._exact.get(fingerprint.digest)
+        if url is not None:
+            self.exact_hits += 1
+            self.bytes_saved += fingerprint.size
+            IMAGE_DEDUP_LOOKUPS.inc("exact")
+            IMAGE_DEDUP_BYTES_SAVED.inc(amount=fingerprint.size)
+            return url
+        
+        if fingerprint.phash is not None:
+            for phash, url in self._recent.get(device_id, ()):
+                if bin(phash ^ fingerprint.phash).count("1") <= self._max_distance:
+                    self.perceptual_hits += 1
+                    self.bytes_saved += fingerprint.size
+                    IMAGE_DEDUP_LOOKUPS.inc("perceptual")
+                    IMAGE_DEDUP_BYTES_SAVED.inc(amount=fingerprint.size)
+                    return url
+        
+        IMAGE_DEDUP_LOOKUPS.inc("miss")
+        return None
+    
+    def remember(
+        self,
+        device_id: str,
+        fingerprint: Optional[ImageFingerprint],
+        url: str
+    ) -> None:
+        """Record a completed upload."""
+        if fingerprint is None:
+            return
+        
+        self._exact[fingerprint.digest] = url
+        
+        if fingerprint.phash is not None:
+            recent: Optional[Deque[Tuple[int, str]]] = self._recent.get(device_id)
+            if recent is None:
+                recent = deque(maxlen=_RECENT_PER_DEVICE)
+                self._recent[device_id] = recent
+            recent.appendleft((fingerprint.phash, url))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Upload-skip rate and bandwidth saved."""
+        hits = self.exact_hits + self.perceptual_hits
+        return {
+            "enabled": self.enabled,
+            "perceptual": self.perceptual,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "skip_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "entries": len(self._exact)
+        }
+
+
+_dedup: Optional[ImageDedupCache] = None
+
+
+def get_image_dedup() -> ImageDedupCache:
+    """Get the process-wide image dedup cache."""
+    global _dedup
+    
+    if _dedup is None:
+        settings = get_settings()
+        _dedup = ImageDedupCache(
+            max_entries=settings.image_dedup_max_entries,
+            perceptual=settings.image_dedup_perceptual,
+            max_distance=settings.image_dedup_max_distance
+        )
+    
+    return _dedup
+
+
+def _reset_dedup() -> None:
+    global _dedup
+    
+    _dedup = None
+
+
+on_settings_reload(_reset_dedup)
@@ -0,0 +1,191 @@
+"""Image normalization before upload.
+
+Edge cameras send full-resolution frames with EXIF metadata. With
+``IMAGE_NORMALIZE_ENABLED``, each image is downscaled to
+``IMAGE_MAX_DIMENSION``, re-encoded as JPEG at ``IMAGE_JPEG_QUALITY`` and
+stripped of metadata before it is uploaded, which saves Cloudinary storage
+and bandwidth and the app's mobile data.
+
+Decoding and encoding are CPU-bound, so they run on the process pool and
+never stall the event loop. Pillow is optional; without it the stage is
+skipped and images are uploaded as received.
+"""
+
+import io
+from typing import Any, BinaryIO, Dict, NamedTuple, Optional, Union
+
+from app.config import get_settings, on_settings_reload
+from app.core.executor import run_blocking, run_in_process
+from app.core.metrics import IMAGE_NORMALIZATION_BYTES, IMAGE_NORMALIZATIONS, STAGE_DURATION
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+
+class NormalizedImage(NamedTuple):
+    """Result of normalizing one image."""
+    
+    data: bytes
+    original_bytes: int
+    width: int
+    height: int
+    
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+def read_image(image: BinaryIO) -> bytes:
+    """
+    Whole content of an image file object, rewound for the next reader.
+    
+    Blocking: large multipart uploads are spooled to disk, so callers on
+    the event loop run it through ``run_blocking``.
+    """
+    image.seek(0)
+    data = image.read()
+    image.seek(0)
+    return data
+
+
+def normalize_image(data: bytes, max_dimension: int, quality: int) -> NormalizedImage:
+    """
+    Downscale, re-encode as JPEG and strip metadata (runs in a worker process).
+    
+    Args:
+        data: Encoded image in any format Pillow reads
+        max_dimension: Longest side of the result, in pixels
+        quality: JPEG quality (1-95)
+    
+    Returns:
+        NormalizedImage with the JPEG bytes
+    
+    Raises:
+        OSError: If the data is not a readable image
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        
+        # A new save without exif= carries no EXIF/ICC/comment metadata
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        
+        return NormalizedImage(output.getvalue(), len(data), image.width, image.height)
+
+
+def perceptual_hash(data: bytes) -> int:
+    """
+    64-bit difference hash (dHash) of an image (runs in a worker process).
+    
+    Nearly identical frames (sensor noise, recompression) differ in only a
+    few bits, unlike a content digest.
+    
+    Raises:
+        OSError: If the data is not a readable image
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ImageNormalizer:
+    """Runs ``normalize_image`` off the event loop and tracks bytes saved."""
+    
+    def __init__(self, enabled: bool, max_dimension: int, quality: int):
+        self.enabled = enabled and Image is not None
+        self._max_dimension = max_dimension
+        self._quality = quality
+        self.images = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        
+        if enabled and Image is None:
+            print("[!] Pillow not installed - image normalization disabled")
+    
+    async def normalize(self, image: Union[bytes, BinaryIO]) -> Optional[bytes]:
+        """
+        Normalize an image for upload.
+        
+        Returns:
+            JPEG bytes, or None if disabled or the image could not be
+            processed (the caller uploads the original)
+        """
+        if not self.enabled:
+            return None
+        
+        if hasattr(image, "read"):
+            image = await run_blocking(read_image, image)
+        
+        try:
+            with STAGE_DURATION.time("normalize"):
+                result = await run_in_process(
+                    normalize_image, image, self._max_dimension, self._quality
+                )
+        except Exception as e:
+            self.failures += 1
+            IMAGE_NORMALIZATIONS.inc("failed")
+            print(f"[!] Image normalization failed, uploading original: {e}")
+            return None
+        
+        self.images += 1
+        self.bytes_in += result.original_bytes
+        self.bytes_out += len(result.data)
+        IMAGE_NORMALIZATIONS.inc("ok")
+        IMAGE_NORMALIZATION_BYTES.inc("in", amount=result.original_bytes)
+        IMAGE_NORMALIZATION_BYTES.inc("out", amount=len(result.data))
+        print(f"[+] Image normalized to {result.width}x{result.height}: "
+              f"{result.original_bytes} -> {len(result.data)} bytes "
+              f"(saved {result.bytes_saved})")
+        return result.data
+    
+    def stats(self) -> Dict[str, Any]:
+        """Images processed and bytes saved."""
+        return {
+            "enabled": self.enabled,
+            "images": self.images,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out
+        }
+
+
+_normalizer: Optional[ImageNormalizer] = None
+
+
+def get_image_normalizer() -> ImageNormalizer:
+    """Get the process-wide image normalizer."""
+    global _normalizer
+    
+    if _normalizer is None:
+        settings = get_settings()
+        _normalizer = ImageNormalizer(
+            enabled=settings.image_normalize_enabled,
+            max_dimension=settings.image_max_dimension,
+            quality=settings.image_jpeg_quality
+        )
+    
+    return _normalizer
+
+
+def _reset_normalizer() -> None:
+    global _normalizer
+    
+    _normalizer = None
+
+
+on_settings_reload(_reset_normalizer)
@@ -0,0 +1,110 @@
+"""In-process ingestion queue for fast-ack detection processing.
+
+When ``FAST_ACK_ENABLED`` is set, the detections route only validates the
+request, reserves a detection ID and enqueues the remaining work here. A
+fixed number of worker tasks then run the upload/persist/alert pipeline.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from app.config import get_settings
+
+
+Job = Callable[[], Awaitable[object]]
+
+
+class QueueClosedError(RuntimeError):
+    """Raised when submitting to a queue that is draining for shutdown."""
+
+
+class IngestQueue:
+    """Bounded job queue drained by a fixed pool of worker tasks."""
+    
+    def __init__(self, maxsize: int, workers: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._worker_count = workers
+        self._workers: List[asyncio.Task] = []
+        self._closed = False
+    
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting to be picked up by a worker."""
+        return self._queue.qsize()
+    
+    @property
+    def running(self) -> bool:
+        """Whether workers have been started and the queue accepts jobs."""
+        return bool(self._workers) and not self._closed
+    
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._workers:
+            return
+        
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ingest-worker-{i}")
+            for i in range(self._worker_count)
+        ]
+        print(f"[+] Ingest queue started ({self._worker_count} workers)")
+    
+    def submit(self, job: Job) -> None:
+        """
+        Enqueue a job without waiting.
+        
+        Raises:
+            QueueClosedError: If the queue is draining for shutdown
+            asyncio.QueueFull: If the queue is at capacity
+        """
+        if self._closed:
+            raise QueueClosedError("Ingest queue is shutting down")
+        
+        self._queue.put_nowait(job)
+        self.start()
+    
+    async def drain(self) -> None:
+        """Stop accepting jobs, finish every queued job, then stop workers."""
+        self._closed = True
+        
+        if not self._workers:
+            return
+        
+        pending = self._queue.qsize()
+        if pending:
+            print(f"[*] Draining ingest queue ({pending} pending)...")
+        
+        await self._queue.join()
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        print("[+] Ingest queue drained")
+    
+    async def _worker(self, index: int) -> None:
+        """Run queued jobs until cancelled."""
+        while True:
+            job = await self._queue.get()
+            try:
+                await job()
+            except Exception as e:
+                print(f"[!] Ingest worker {index} job failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_ingest_queue: Optional[IngestQueue] = None
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Get the process-wide ingest queue, creating it from settings."""
+    global _ingest_queue
+    
+    if _ingest_queue is None:
+        settings = get_settings()
+        _ingest_queue = IngestQueue(
+            maxsize=settings.ingest_queue_size,
+            workers=settings.ingest_workers
+        )
+    
+    return _ingest_queue
@@ -0,0 +1,396 @@
+"""Hourly and daily detection rollups per device and animal.
+
+Every stored detection adds to the counters of its hour (of detection
+time) in memory. A background task flushes them every
+``ROLLUP_FLUSH_SECONDS`` as batched ``Increment``/``Maximum`` writes: one
+document per (hour, device, animal) in ``detection_rollups`` and one per
+(day, device, animal) in ``detection_rollups_daily``, each hour committed
+in the same batch as its day. ``GET /api/detections/stats`` reads only
+rollup documents: hourly ones for ``interval=hour`` and for the partial
+days at the ends of a range, daily ones for the whole days in between. Its
+cost grows with the days in the range (and the devices active in them),
+not with the number of detections, and is capped at
+``STATS_MAX_ROLLUP_READS`` documents.
+
+Counters of a failed flush are kept for the next one; counters not yet
+flushed are lost if the process dies.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from app.config import get_settings
+from app.core.executor import run_blocking
+from app.core.firebase import get_firestore
+from app.core.metrics import DEPENDENCY_ERRORS
+from app.models.detection import (
+    DetectionCounts, DetectionStatsBucket, DetectionStatsResponse
+)
+from app.services.detection_history import as_utc
+from app.services.write_buffer import FIRESTORE_BATCH_LIMIT
+
+
+ROLLUPS_COLLECTION = "detection_rollups"
+DAILY_ROLLUPS_COLLECTION = "detection_rollups_daily"
+
+# (hour, device_id, animal)
+RollupKey = Tuple[datetime, str, str]
+
+
+class RollupCounts(NamedTuple):
+    """Counters of one rollup bucket."""
+    
+    detections: int = 0
+    predators: int = 0
+    alerts: int = 0
+    max_confidence: Optional[float] = None
+    
+    def __add__(self, other: "RollupCounts") -> "RollupCounts":
+        confidences = [c for c in (self.max_confidence, other.max_confidence) if c is not None]
+        return RollupCounts(
+            self.detections + other.detections,
+            self.predators + other.predators,
+            self.alerts + other.alerts,
+            max(confidences) if confidences else None
+        )
+
+
+class RollupReadLimitError(Exception):
+    """A stats query would read more than ``STATS_MAX_ROLLUP_READS`` documents."""
+
+
+def rollup_id(key: RollupKey, daily: bool = False) -> str:
+    """
+    Document ID of a rollup bucket, e.g. ``2024060114:cam_1:leopard``
+    (``20240601:cam_1:leopard`` for a day).
+    """
+    start, device_id, animal = key
+    period = f"{start:%Y%m%d}" if daily else f"{start:%Y%m%d%H}"
+    return f"{period}:{quote(device_id, safe='')}:{quote(animal, safe='')}"
+
+
+def _day(key: RollupKey) -> RollupKey:
+    hour, device_id, animal = key
+    return (hour.replace(hour=0), device_id, animal)
+
+
+class DetectionRollups:
+    """In-memory rollup counters, flushed to Firestore in batches."""
+    
+    def __init__(self, flush_seconds: float, max_reads: int):
+        self._flush_seconds = flush_seconds
+        self._max_reads = max_reads
+        self._pending: Dict[RollupKey, RollupCounts] = {}
+        self._lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_buckets = 0
+        self.document_reads = 0
+        self.errors = 0
+    
+    def _add(
+        self,
+        detection_time: datetime,
+        device_id: str,
+        animal: str,
+        counts: RollupCounts
+    ) -> None:
+        hour = as_utc(detection_time).replace(minute=0, second=0, microsecond=0)
+        key = (hour, device_id, animal)
+        self._pending[key] = self._pending.get(key, RollupCounts()) + counts
+    
+    def record(self, document: Dict[str, Any]) -> None:
+        """Count a stored detection document in its hour bucket."""
+        self._add(
+            document["detection_time"],
+            document["device_id"],
+            document["animal"],
+            RollupCounts(
+                detections=1,
+                predators=int(document["is_predator"]),
+                alerts=int(bool(document.get("alert_sent"))),
+                max_confidence=document["confidence"]
+            )
+        )
+    
+    def record_repeat(
+        self,
+        device_id: str,
+        animal: str,
+        detection_time: datetime,
+        confidence: float
+    ) -> None:
+        """Raise the max confidence with a repeat (not counted as a detection)."""
+        self._add(detection_time, device_id, animal, RollupCounts(max_confidence=confidence))
+    
+    def start(self) -> None:
+        """Start flushing on the running event loop."""
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run(), name="rollup-flusher")
+    
+    async def stop(self) -> None:
+        """Stop the flusher after a final flush."""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        else:
+            await self.flush()
+    
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    async def flush(self) -> int:
+        """
+        Write the buffered counters as batched increments.
+        
+        Returns:
+            Number of rollup documents written
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            
+            # Hours grouped by day: a day's document is written in the same
+            # batch as its hours, so a failed batch is retried as a whole
+            days: Dict[RollupKey, List[Tuple[RollupKey, RollupCounts]]] = {}
+            for key, counts in self._pending.items():
+                days.setdefault(_day(key), []).append((key, counts))
+            self._pending = {}
+            
+            chunks: List[List[List[Tuple[RollupKey, RollupCounts]]]] = [[]]
+            writes = 0
+            for hours in days.values():
+                if chunks[-1] and writes + len(hours) + 1 > FIRESTORE_BATCH_LIMIT:
+                    chunks.append([])
+                    writes = 0
+                chunks[-1].append(hours)
+                writes += len(hours) + 1
+            
+            written = 0
+            try:
+                for index, chunk in enumerate(chunks):
+                    await run_blocking(self._commit, chunk)
+                    written += sum(len(hours) for hours in chunk)
+            except Exception as e:
+                self.errors += 1
+                unwritten = [item for chunk in chunks[index:] for hours in chunk for item in hours]
+                DEPENDENCY_ERRORS.inc("firestore")
+                print(f"[!] Rollup flush failed, keeping {len(unwritten)} buckets: {e}")
+                # Counted meanwhile, plus what was not written
+                for key, counts in unwritten:
+                    self._pending[key] = self._pending.get(key, RollupCounts()) + counts
+            
+            self.flushes += 1
+            self.flushed_buckets += written
+            return written
+    
+    @staticmethod
+    def _commit(days: List[List[Tuple[RollupKey, RollupCounts]]]) -> None:
+        from google.cloud.firestore import SERVER_TIMESTAMP, Increment, Maximum
+        
+        db = get_firestore()
+        hourly = db.collection(ROLLUPS_COLLECTION)
+        daily = db.collection(DAILY_ROLLUPS_COLLECTION)
+        batch = db.batch()
+        
+        def update(field: str, key: RollupKey, counts: RollupCounts) -> Dict[str, Any]:
+            start, device_id, animal = key
+            data: Dict[str, Any] = {
+                field: start,
+                "device_id": device_id,
+                "animal": animal,
+                "detections": Increment(counts.detections),
+                "predators": Increment(counts.predators),
+                "alerts": Increment(counts.alerts),
+                "updated_at": SERVER_TIMESTAMP
+            }
+            if counts.max_confidence is not None:
+                data["max_confidence"] = Maximum(counts.max_confidence)
+            return data
+        
+        for hours in days:
+            total = RollupCounts()
+            for key, counts in hours:
+                batch.set(hourly.document(rollup_id(key)), update("hour", key, counts), merge=True)
+                total = total + counts
+            day = _day(hours[0][0])
+            batch.set(
+                daily.document(rollup_id(day, daily=True)), update("day", day, total), merge=True
+            )
+        
+        batch.commit()
+    
+    @staticmethod
+    def _query(
+        ranges: List[Tuple[str, datetime, datetime]],
+        device_id: Optional[str],
+        animal: Optional[str],
+        max_reads: int
+    ) -> List[Tuple[RollupKey, RollupCounts]]:
+        """
+        Read rollup documents for ("hour" or "day", since, until) ranges.
+        
+        Raises:
+            RollupReadLimitError: If more than ``max_reads`` documents match
+        """
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        
+        rows: List[Tuple[RollupKey, RollupCounts]] = []
+        for field, since, until in ranges:
+            collection = DAILY_ROLLUPS_COLLECTION if field == "day" else ROLLUPS_COLLECTION
+            query = get_firestore().collection(collection)
+            for name, op, value in (
+                ("device_id", "==", device_id),
+                ("animal", "==", animal),
+                (field, ">=", since),
+                (field, "<", until)
+            ):
+                if value is not None:
+                    query = query.where(filter=FieldFilter(name, op, value))
+            
+            # One extra document tells a full range from one over the cap
+            for doc in query.limit(max_reads - len(rows) + 1).stream():
+                if len(rows) == max_reads:
+                    raise RollupReadLimitError(
+                        f"More than {max_reads} rollup documents in range"
+                    )
+                data = doc.to_dict()
+                rows.append((
+                    (as_utc(data[field]), data["device_id"], data["animal"]),
+                    RollupCounts(
+                        data.get("detections", 0),
+                        data.get("predators", 0),
+                        data.get("alerts", 0),
+                        data.get("max_confidence")
+                    )
+                ))
+        return rows
+    
+    async def summarize(
+        self,
+        since: datetime,
+        until: datetime,
+        interval: str = "day",
+        device_id: Optional[str] = None,
+        animal: Optional[str] = None
+    ) -> DetectionStatsResponse:
+        """
+        Detection counts over a time range, per device and animal.
+        
+        Counts are by hour of detection time, so ``since`` is rounded down
+        to the hour. Counters not flushed yet by this process are included.
+        Whole days (UTC) of "day" and "total" queries are read from the
+        daily rollups.
+        
+        Args:
+            since: Start of the range (inclusive)
+            until: End of the range (exclusive)
+            interval: Bucket size: "hour", "day" or "total"
+            device_id: Only this device
+            animal: Only this animal
+        
+        Raises:
+            RollupReadLimitError: If the range holds more rollup documents
+                than ``STATS_MAX_ROLLUP_READS``
+            Exception: If the rollups could not be read from Firestore
+        """
+        since = as_utc(since).replace(minute=0, second=0, microsecond=0)
+        until = as_utc(until)
+        
+        # Whole days from the daily rollups, the partial ones at both ends
+        # from the hourly rollups
+        first_day = since.replace(hour=0)
+        if first_day < since:
+            first_day += timedelta(days=1)
+        last_day = until.replace(hour=0, minute=0, second=0, microsecond=0)
+        if interval == "hour" or first_day >= last_day:
+            ranges = [("hour", since, until)]
+        else:
+            ranges = [("day", first_day, last_day)]
+            if since < first_day:
+                ranges.append(("hour", since, first_day))
+            if last_day < until:
+                ranges.append(("hour", last_day, until))
+        
+        try:
+            rows = await run_blocking(
+                self._query, ranges, device_id, animal, self._max_reads
+            )
+        except RollupReadLimitError:
+            self.document_reads += self._max_reads
+            raise
+        except Exception:
+            self.errors += 1
+            DEPENDENCY_ERRORS.inc("firestore")
+            raise
+        self.document_reads += len(rows)
+        
+        rows.extend(
+            (key, counts) for key, counts in self._pending.items()
+            if since <= key[0] < until
+            and (device_id is None or key[1] == device_id)
+            and (animal is None or key[2] == animal)
+        )
+        
+        buckets: Dict[RollupKey, RollupCounts] = {}
+        totals = RollupCounts()
+        for (hour, device, species), counts in rows:
+            if interval == "hour":
+                start = hour
+            elif interval == "day":
+                start = hour.replace(hour=0)
+            else:
+                start = since
+            key = (start, device, species)
+            buckets[key] = buckets.get(key, RollupCounts()) + counts
+            totals = totals + counts
+        
+        return DetectionStatsResponse(
+            since=since,
+            until=until,
+            interval=interval,
+            totals=DetectionCounts(**totals._asdict()),
+            buckets=[
+                DetectionStatsBucket(
+                    start=start, device_id=device, animal=species, **counts._asdict()
+                )
+                for (start, device, species), counts in sorted(buckets.items())
+            ]
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Flush and read counters."""
+        return {
+            "pending_buckets": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_buckets": self.flushed_buckets,
+            "document_reads": self.document_reads,
+            "errors": self.errors
+        }
+
+
+_rollups: Optional[DetectionRollups] = None
+
+
+def get_detection_rollups() -> DetectionRollups:
+    """Get the process-wide rollup buffer."""
+    global _rollups
+    
+    if _rollups is None:
+        settings = get_settings()
+        _rollups = DetectionRollups(
+            flush_seconds=settings.rollup_flush_seconds,
+            max_reads=settings.stats_max_rollup_reads
+        )
+    
+    return _rollups
@@ -0,0 +1,372 @@
+"""Durable local spool for accepted detections.
+
+With ``SPOOL_ENABLED``, every accepted detection (including its image) is
+written to a local SQLite database in WAL mode before any remote call. The
+row is deleted once the detection is stored in Firestore. Whatever is left,
+because Firestore/Cloudinary was down or the process died mid-pipeline, is
+delivered by :class:`SpoolReplayer` with exponential backoff.
+
+Replays are idempotent: the Firestore document ID and the Cloudinary
+public_id are the reserved detection ID, and stage results (image URL,
+alert results, whether the document is stored) are recorded as they
+complete so a replay skips them. A detection stored without its image is
+kept until the image is attached to its document.
+
+An entry is leased (``SPOOL_LEASE_SECONDS``) to whoever works on it: the
+live pipeline from the moment it is appended, or a replayer. Entries this
+process is working on are never handed to its own replayer, and their
+leases are renewed while the work lasts, so a slow upload or a backlog in
+the fast-ack queue does not let another replayer deliver them a second
+time.
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from app.config import get_settings
+from app.core.executor import run_blocking
+
+
+class SpoolEntry(NamedTuple):
+    """A spooled detection awaiting delivery."""
+    
+    detection_id: str
+    payload: Dict[str, Any]       # DetectionRequest fields, without the image
+    image: Optional[bytes]
+    detection_time: datetime
+    image_url: Optional[str]
+    alert_results: Optional[Dict[str, Dict[str, Any]]]
+    attempts: int
+    stored: bool = False          # Document written; only the image is missing
+
+
+class DetectionSpool:
+    """Append-only SQLite spool of detections not yet stored in Firestore."""
+    
+    def __init__(self, path: str, lease_seconds: float):
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # Entries this process is working on (live pipeline or replay)
+        self._live: Set[str] = set()
+        
+        self._conn = sqlite3.connect(
+            path,
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: an acknowledged detection survives power loss, not just a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " detection_id TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " image BLOB,"
+            " detection_time TEXT NOT NULL,"
+            " image_url TEXT,"
+            " alert_results TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " stored INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Spool files written before the column existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(spool)")}
+        if "stored" not in columns:
+            self._conn.execute(
+                "ALTER TABLE spool ADD COLUMN stored INTEGER NOT NULL DEFAULT 0"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS spool_due ON spool (next_attempt_at)"
+        )
+    
+    def append(
+        self,
+        detection_id: str,
+        payload: Dict[str, Any],
+        image: Optional[bytes],
+        detection_time: datetime
+    ) -> None:
+        """
+        Durably store an accepted detection.
+        
+        The entry is leased to the caller for ``SPOOL_LEASE_SECONDS`` so the
+        replayer leaves it alone while the live pipeline processes it.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO spool (detection_id, payload, image, "
+                "detection_time, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    detection_id,
+                    json.dumps(payload),
+                    image,
+                    detection_time.isoformat(),
+                    now + self.lease_seconds,
+                    now
+                )
+            )
+            self._live.add(detection_id)
+    
+    def record(
+        self,
+        detection_id: str,
+        image_url: Optional[str] = None,
+        alert_results: Optional[Dict[str, Dict[str, Any]]] = None,
+        stored: bool = False
+    ) -> None:
+        """Record completed stages so a replay does not repeat them."""
+        with self._lock:
+            if image_url is not None:
+                self._conn.execute(
+                    "UPDATE spool SET image_url = ?, image = NULL WHERE detection_id = ?",
+                    (image_url, detection_id)
+                )
+            if alert_results is not None:
+                self._conn.execute(
+                    "UPDATE spool SET alert_results = ? WHERE detection_id = ?",
+                    (json.dumps(alert_results), detection_id)
+                )
+            if stored:
+                self._conn.execute(
+                    "UPDATE spool SET stored = 1 WHERE detection_id = ?",
+                    (detection_id,)
+                )
+    
+    def complete(self, detection_id: str) -> None:
+        """Remove a detection that is now stored in Firestore."""
+        with self._lock:
+            self._live.discard(detection_id)
+            self._conn.execute("DELETE FROM spool WHERE detection_id = ?", (detection_id,))
+    
+    def release(self, detection_id: str) -> None:
+        """Make an entry due for the replayer right away."""
+        with self._lock:
+            self._live.discard(detection_id)
+            self._conn.execute(
+                "UPDATE spool SET next_attempt_at = ? WHERE detection_id = ?",
+                (time.time(), detection_id)
+            )
+    
+    def defer(self, detection_id: str, delay_seconds: float) -> None:
+        """Count a failed attempt and schedule the next one."""
+        with self._lock:
+            self._live.discard(detection_id)
+            self._conn.execute(
+                "UPDATE spool SET attempts = attempts + 1, next_attempt_at = ? "
+                "WHERE detection_id = ?",
+                (time.time() + delay_seconds, detection_id)
+            )
+    
+    def lease_due(self, limit: int) -> List[SpoolEntry]:
+        """
+        Lease up to ``limit`` due entries to the caller.
+        
+        Leased entries are not handed out again until the lease expires, so
+        several worker processes can share one spool file. Entries this
+        process is already working on are skipped.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT detection_id, payload, image, detection_time, "
+                    "image_url, alert_results, attempts, stored FROM spool "
+                    "WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                    (now, limit + len(self._live))
+                ).fetchall()
+                rows = [row for row in rows if row[0] not in self._live][:limit]
+                self._conn.executemany(
+                    "UPDATE spool SET next_attempt_at = ? WHERE detection_id = ?",
+                    [(now + self.lease_seconds, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._live.update(row[0] for row in rows)
+        
+        return [
+            SpoolEntry(
+                detection_id=row[0],
+                payload=json.loads(row[1]),
+                image=row[2],
+                detection_time=datetime.fromisoformat(row[3]),
+                image_url=row[4],
+                alert_results=json.loads(row[5]) if row[5] else None,
+                attempts=row[6],
+                stored=bool(row[7])
+            )
+            for row in rows
+        ]
+    
+    def renew(self) -> int:
+        """
+        Extend the leases of the entries this process is working on.
+        
+        Returns:
+            Number of leases renewed
+        """
+        with self._lock:
+            live = list(self._live)
+            if live:
+                self._conn.executemany(
+                    "UPDATE spool SET next_attempt_at = ? WHERE detection_id = ?",
+                    [(time.time() + self.lease_seconds, detection_id) for detection_id in live]
+                )
+        return len(live)
+    
+    def depth(self) -> int:
+        """Number of detections not yet delivered."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolReplayer:
+    """Background task that delivers spooled detections with backoff."""
+    
+    def __init__(
+        self,
+        spool: DetectionSpool,
+        interval_seconds: float,
+        max_backoff_seconds: float,
+        batch_size: int = 50
+    ):
+        self._spool = spool
+        self._interval = interval_seconds
+        self._max_backoff = max_backoff_seconds
+        self._batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._renew_task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start replaying on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="spool-replayer")
+            self._renew_task = asyncio.create_task(self._renew(), name="spool-lease-renewal")
+            print("[+] Spool replayer started")
+    
+    async def stop(self) -> None:
+        """Stop replaying; undelivered entries stay in the spool."""
+        for task in (self._task, self._renew_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._renew_task = None
+    
+    def backoff(self, attempts: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self._max_backoff, self._interval * 2 ** attempts))
+    
+    async def replay_once(self) -> int:
+        """
+        Deliver one batch of due entries.
+        
+        Returns:
+            Number of entries delivered
+        """
+        # Imported here: the detection service depends on this module
+        from app.services.detection_service import DetectionService
+        
+        entries = await run_blocking(self._spool.lease_due, self._batch_size)
+        delivered = 0
+        
+        for entry in entries:
+            try:
+                await DetectionService.replay_detection(entry)
+                await run_blocking(self._spool.complete, entry.detection_id)
+                delivered += 1
+            except Exception as e:
+                delay = self.backoff(entry.attempts)
+                print(f"[!] Spool replay of {entry.detection_id} failed "
+                      f"(attempt {entry.attempts + 1}, retry in {delay:.0f}s): {e}")
+                await run_blocking(self._spool.defer, entry.detection_id, delay)
+        
+        if delivered:
+            print(f"[+] Spool replayed {delivered} detections")
+        return delivered
+    
+    async def _renew(self) -> None:
+        """Renew live leases well before they expire."""
+        while True:
+            await asyncio.sleep(max(self._spool.lease_seconds / 3, 0.1))
+            try:
+                await run_blocking(self._spool.renew)
+            except Exception as e:
+                print(f"[!] Spool lease renewal failed: {e}")
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                delivered = await self.replay_once()
+            except Exception as e:
+                print(f"[!] Spool replayer error: {e}")
+                delivered = 0
+            
+            # Keep draining without pause while there is a backlog
+            if delivered < self._batch_size:
+                await asyncio.sleep(self._interval)
+
+
+_spool: Optional[DetectionSpool] = None
+_replayer: Optional[SpoolReplayer] = None
+
+
+def get_detection_spool() -> Optional[DetectionSpool]:
+    """Get the process-wide spool, or None when ``SPOOL_ENABLED`` is off."""
+    global _spool
+    
+    settings = get_settings()
+    if not settings.spool_enabled:
+        return None
+    
+    if _spool is None:
+        _spool = DetectionSpool(settings.spool_path, settings.spool_lease_seconds)
+    
+    return _spool
+
+
+def get_spool_replayer() -> Optional[SpoolReplayer]:
+    """Get the process-wide replayer, or None when spooling is disabled."""
+    global _replayer
+    
+    spool = get_detection_spool()
+    if spool is None:
+        return None
+    
+    if _replayer is None:
+        settings = get_settings()
+        _replayer = SpoolReplayer(
+            spool,
+            interval_seconds=settings.spool_replay_interval_seconds,
+            max_backoff_seconds=settings.spool_max_backoff_seconds
+        )
+    
+    return _replayer
+
+
+async def close_detection_spool() -> None:
+    """Stop the replayer and close the spool (on shutdown)."""
+    global _spool, _replayer
+    
+    if _replayer is not None:
+        await _replayer.stop()
+        _replayer = None
+    
+    if _spool is not None:
+        _spool.close()
+        _spool = None
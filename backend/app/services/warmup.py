@@ -0,0 +1,152 @@
+"""Startup warmup: the connections the first alert needs, opened in parallel.
+
+After a cold start (Render's free plan sleeps when idle), the first
+detection would otherwise pay, one after the other, for importing the
+Firebase SDK, opening the Firestore channel, fetching the OAuth2 token FCM
+requests are signed with and the TLS handshake with Cloudinary. The
+lifespan runs these as concurrent steps instead:
+
+- ``firebase``: import the SDK and load the credentials (always run)
+- ``listeners``: start the Firestore snapshot listeners (alert config and,
+  with ``DEVICE_KEYS_SOURCE=firestore``, device keys); always run, after
+  ``firebase``, so the lifespan never blocks on the SDK import
+- ``firestore``: read the alert config, which opens the channel
+- ``fcm``: fetch the access token
+- ``cloudinary``: authenticated ping over the upload connection pool
+
+The last three run when ``WARMUP_ENABLED`` is set. Startup waits up to
+``WARMUP_TIMEOUT_SECONDS`` for the warmup, then serves while it finishes;
+``GET /ready`` answers 503 until it has. A failed step is logged and its
+first real call sets the connection up as it would without a warmup.
+"""
+
+import asyncio
+import importlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_settings
+from app.core.executor import run_blocking
+from app.core.firebase import get_firebase_app, initialize_firebase
+from app.services.alert_config_cache import get_alert_config_cache
+from app.services.cloudinary_client import get_cloudinary_client
+from app.services.device_credentials import get_device_credentials
+
+
+def _fetch_fcm_token() -> None:
+    importlib.import_module("firebase_admin.messaging")
+    # Cached on the credential every FCM request is signed with
+    credential = getattr(get_firebase_app(), "credential", None)
+    if credential is not None:
+        credential.get_access_token()
+
+
+async def _start_listeners() -> None:
+    await run_blocking(get_alert_config_cache().start_listener)
+    
+    credentials = get_device_credentials()
+    if credentials.source == "firestore":
+        await credentials.start()
+
+
+class Warmup:
+    """Runs the warmup steps once and tracks their outcome."""
+    
+    def __init__(self, connections: bool, cloudinary: bool):
+        self._connections = connections
+        self._cloudinary = connections and cloudinary
+        self._task: Optional[asyncio.Task] = None
+        self.steps: Dict[str, str] = {"firebase": "pending", "listeners": "pending"}
+        if connections:
+            self.steps.update(firestore="pending", fcm="pending")
+        if self._cloudinary:
+            self.steps["cloudinary"] = "pending"
+        self.seconds: Dict[str, float] = {}
+    
+    @property
+    def ready(self) -> bool:
+        """Whether every step has finished (successfully or not)."""
+        return self._task is not None and self._task.done()
+    
+    def start(self) -> None:
+        """Start warming up on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="warmup")
+    
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait for the warmup to finish (it keeps running on timeout).
+        
+        Returns:
+            True if it finished within ``timeout`` seconds
+        """
+        if self._task is None:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    async def _step(self, name: str, warm: Callable[[], Awaitable[Any]]) -> bool:
+        started = time.perf_counter()
+        try:
+            await warm()
+            self.steps[name] = "ok"
+        except Exception as e:
+            self.steps[name] = "failed"
+            print(f"[!] Warmup: {name} failed: {e}")
+        self.seconds[name] = round(time.perf_counter() - started, 3)
+        return self.steps[name] == "ok"
+    
+    async def _warm_firebase(self) -> None:
+        if not await self._step("firebase", lambda: run_blocking(initialize_firebase)):
+            print("   The API will start but Firebase operations will fail.")
+            for name in ("listeners", "firestore", "fcm"):
+                if name in self.steps:
+                    self.steps[name] = "skipped"
+            return
+        
+        steps = [self._step("listeners", _start_listeners)]
+        if self._connections:
+            steps.append(self._step("firestore", get_alert_config_cache().warm))
+            steps.append(self._step("fcm", lambda: run_blocking(_fetch_fcm_token)))
+        await asyncio.gather(*steps)
+    
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        steps = [self._warm_firebase()]
+        if self._cloudinary:
+            steps.append(self._step("cloudinary", get_cloudinary_client().ping))
+        await asyncio.gather(*steps)
+        
+        summary = ", ".join(
+            f"{name} {status} ({self.seconds.get(name, 0):.2f}s)"
+            for name, status in self.steps.items()
+        )
+        print(f"[+] Warmup finished in {time.perf_counter() - started:.2f}s: {summary}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Step outcomes and durations."""
+        return {
+            "ready": self.ready,
+            "steps": dict(self.steps),
+            "seconds": dict(self.seconds)
+        }
+
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    """Get the process-wide startup warmup."""
+    global _warmup
+    
+    if _warmup is None:
+        settings = get_settings()
+        _warmup = Warmup(
+            connections=settings.warmup_enabled,
+            cloudinary=settings.cloudinary_configured
+        )
+    
+    return _warmup
@@ -0,0 +1,6 @@
+"""Offline benchmarks for the Predator Alert backend.
+
+Run from the ``backend`` directory, e.g.::
+
+    python -m benchmarks.event_loop_latency
+"""
@@ -0,0 +1,73 @@
+"""Detection-to-FCM-dispatch latency for predator detections with images.
+
+Submits predator detections carrying an image and measures the time from
+the start of each request until the (fake) FCM transport is called.
+
+Usage::
+
+    python -m benchmarks.alert_latency [--upload-latency 1.0]
+"""
+
+import argparse
+import asyncio
+import base64
+import statistics
+import time
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+IMAGE = base64.b64encode(b"\xff\xd8" + b"\x00" * 200_000).decode()
+
+
+async def main(args: argparse.Namespace) -> None:
+    fakes = install_fakes(
+        firestore_latency=args.firestore_latency,
+        fcm_latency=args.fcm_latency,
+        upload_latency=args.upload_latency
+    )
+    fcm = fakes["fcm"]
+    
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        for i in range(args.requests):
+            sent_before = len(fcm.sent_at)
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/detections",
+                json={
+                    "device_id": f"cam_{i}",
+                    "animal": "tiger",
+                    "confidence": 0.9,
+                    "image_base64": IMAGE
+                },
+                headers=HEADERS
+            )
+            response.raise_for_status()
+            latencies.append((fcm.sent_at[sent_before] - start) * 1000)
+    
+    print(f"upload latency: {args.upload_latency:.2f}s, "
+          f"firestore latency: {args.firestore_latency:.3f}s")
+    print(f"  detection -> FCM dispatch  p50={statistics.median(latencies):8.1f} ms  "
+          f"max={max(latencies):8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--upload-latency", type=float, default=1.0)
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--fcm-latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
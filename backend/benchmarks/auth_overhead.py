@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-request API-key and predator lookup overhead.
+
+Compares the per-request parsing the service used to do (split the
+comma-separated env strings, then scan a list) with the precomputed
+frozensets on ``Settings``, for a fleet of 10k per-device keys.
+
+Usage::
+
+    python -m benchmarks.auth_overhead [--keys 10000] [--iterations 2000]
+"""
+
+import argparse
+import secrets
+import time
+
+from benchmarks.fakes import configure_environment
+
+configure_environment()
+
+from app.config import Settings, hash_api_key  # noqa: E402
+
+
+def per_request_parsing(settings: Settings, api_key: str, animal: str) -> bool:
+    """What every request did before: re-parse, then a linear scan."""
+    valid_keys = [key.strip() for key in settings.api_keys.split(",") if key.strip()]
+    predators = [a.strip().lower() for a in settings.predator_animals.split(",")]
+    return api_key in valid_keys and animal.lower() in predators
+
+
+def precomputed(settings: Settings, api_key: str, animal: str) -> bool:
+    """Digest lookup and predator lookup in sets built once per settings load."""
+    return (
+        hash_api_key(api_key) in settings.api_key_digests
+        and animal.lower() in settings.predator_animals_set
+    )
+
+
+def time_per_call(check, settings: Settings, api_key: str, iterations: int) -> float:
+    """Mean microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        check(settings, api_key, "Tiger")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(args: argparse.Namespace) -> None:
+    keys = [secrets.token_urlsafe(24) for _ in range(args.keys)]
+    settings = Settings(api_keys=",".join(keys))
+    
+    # Build the cached sets up front, as the first request would
+    precomputed(settings, keys[0], "Tiger")
+    
+    print(f"{args.keys} API keys, {args.iterations} requests per case\n")
+    print(f"{'key position':<14}{'per-request parse':>20}{'precomputed':>14}")
+    for label, api_key in (
+        ("first", keys[0]),
+        ("last", keys[-1]),
+        ("invalid", secrets.token_urlsafe(24)),
+    ):
+        before = time_per_call(per_request_parsing, settings, api_key, args.iterations)
+        after = time_per_call(precomputed, settings, api_key, args.iterations)
+        print(f"{label:<14}{before:>17.1f} us{after:>11.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,137 @@
+"""Cloudinary uploads against a local fake server with injected failures.
+
+Runs the same batch of concurrent uploads through the synchronous SDK (on
+the upload thread pool, as before) and through the pooled async
+``CloudinaryClient``. The fake server fails the first attempt of some
+uploads with ``503`` and stalls others past the read timeout.
+
+Reports uploads stored, connections opened, retries and latency. Exits
+non-zero unless the client stores every upload.
+
+Usage::
+
+    python -m benchmarks.cloudinary_upload [--uploads 200] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from benchmarks.fakes import FakeCloudinaryServer, configure_environment
+
+configure_environment()
+
+
+IMAGE = b"\xff\xd8" + os.urandom(50_000)
+
+
+async def run_batch(
+    upload: Callable[[str], Awaitable[Optional[str]]],
+    uploads: int,
+    concurrency: int
+) -> List[Optional[float]]:
+    """Latency (s) of each upload, None for failures."""
+    limit = asyncio.Semaphore(concurrency)
+    
+    async def one(index: int) -> Optional[float]:
+        async with limit:
+            started = time.perf_counter()
+            url = await upload(f"upload_{index:05d}")
+            return time.perf_counter() - started if url else None
+    
+    return await asyncio.gather(*[one(i) for i in range(uploads)])
+
+
+def sdk_uploader(server: FakeCloudinaryServer) -> Callable[[str], Awaitable[Optional[str]]]:
+    import cloudinary
+    import cloudinary.uploader
+    from app.core.executor import UPLOAD_POOL, run_blocking
+    
+    cloudinary.config(cloud_name="bench", api_key="bench", api_secret="bench",
+                      upload_prefix=server.url)
+    
+    async def upload(public_id: str) -> Optional[str]:
+        try:
+            result = await run_blocking(
+                cloudinary.uploader.upload, IMAGE, pool=UPLOAD_POOL,
+                folder="bench", public_id=public_id, overwrite=False
+            )
+            return result.get("secure_url")
+        except Exception:
+            return None
+    
+    return upload
+
+
+async def main(args: argparse.Namespace) -> int:
+    from app.config import reload_settings
+    from app.services.cloudinary_client import CloudinaryUploadError, create_cloudinary_client
+    
+    print(f"{args.uploads} uploads of {len(IMAGE) // 1024} KB, concurrency "
+          f"{args.concurrency}, first attempt: 503 for 1 in {args.fail_every}, "
+          f"stall {args.stall_seconds:.0f}s for 1 in {args.stall_every}\n")
+    print(f"{'mode':<8}{'stored':>8}{'conns':>7}{'retries':>9}{'p50':>9}{'p95':>9}{'wall':>8}")
+    
+    failures = 0
+    for mode in ("sdk", "client"):
+        server = FakeCloudinaryServer(
+            latency=args.latency,
+            fail_every=args.fail_every,
+            stall_every=args.stall_every,
+            stall_seconds=args.stall_seconds
+        ).start()
+        
+        if mode == "sdk":
+            upload = sdk_uploader(server)
+            client = None
+        else:
+            os.environ["CLOUDINARY_API_URL"] = server.url
+            reload_settings()
+            client = create_cloudinary_client()
+            
+            async def upload(public_id: str) -> Optional[str]:
+                try:
+                    result = await client.upload(IMAGE, folder="bench", public_id=public_id,
+                                                 overwrite=False)
+                    return result.get("secure_url")
+                except CloudinaryUploadError:
+                    return None
+        
+        started = time.perf_counter()
+        latencies = await run_batch(upload, args.uploads, args.concurrency)
+        wall = time.perf_counter() - started
+        stored = [latency for latency in latencies if latency is not None]
+        retries = server.requests - args.uploads
+        
+        if client is not None:
+            await client.close()
+            failures += len(stored) != args.uploads
+        server.stop()
+        
+        stored.sort()
+        p95 = stored[max(0, round(0.95 * len(stored)) - 1)] if stored else 0.0
+        median = statistics.median(stored) if stored else 0.0
+        print(f"{mode:<8}{len(stored):>8}{server.connections:>7}{retries:>9}"
+              f"{median * 1000:>7.0f}ms{p95 * 1000:>7.0f}ms{wall:>7.1f}s")
+    
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per fake Cloudinary upload")
+    parser.add_argument("--fail-every", type=int, default=5)
+    parser.add_argument("--stall-every", type=int, default=25)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parsed = parser.parse_args()
+    
+    os.environ.setdefault("CLOUDINARY_READ_TIMEOUT", "1")
+    os.environ.setdefault("CLOUDINARY_RETRY_BACKOFF_SECONDS", "0.1")
+    sys.exit(asyncio.run(main(parsed)))
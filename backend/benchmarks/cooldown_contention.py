@@ -0,0 +1,180 @@
+"""Concurrency check: exactly one of K simultaneous claims wins a cooldown.
+
+Releases K threads (memory backend) and K processes (SQLite backend, as with
+several gunicorn workers) at the same instant against one device key, and
+exits non-zero unless exactly one of them acquired the window.
+
+Then measures how long the event loop stalls while SQLite claims wait on a
+write lock held by another process (``--hold`` seconds): once with the
+backend called inline, as the service did before, and once through
+``DetectionService.acquire_cooldown``. Exits non-zero if the service path
+stalls the loop for more than a quarter of the hold.
+
+Usage::
+
+    python -m benchmarks.cooldown_contention [--contenders 32] [--rounds 20] [--hold 0.5]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.fakes import configure_environment
+
+configure_environment()
+
+from app.services.cooldown import (  # noqa: E402
+    MemoryCooldownBackend,
+    SQLiteCooldownBackend,
+)
+
+
+WINDOW_SECONDS = 30
+
+
+def memory_round(contenders: int, key: str) -> int:
+    """Race ``contenders`` threads on one shared in-memory backend."""
+    backend = MemoryCooldownBackend(maxsize=1000, ttl_seconds=300)
+    barrier = threading.Barrier(contenders)
+    wins = []
+    
+    def contend() -> None:
+        barrier.wait()
+        claim = backend.try_acquire(key, WINDOW_SECONDS, uuid.uuid4().hex, 0.5)
+        if claim.acquired:
+            wins.append(1)
+    
+    threads = [threading.Thread(target=contend) for _ in range(contenders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(wins)
+
+
+def sqlite_contender(path: str, key: str, barrier, wins) -> None:
+    """One worker process with its own connection to the shared database."""
+    backend = SQLiteCooldownBackend(path, ttl_seconds=300)
+    barrier.wait()
+    claim = backend.try_acquire(key, WINDOW_SECONDS, uuid.uuid4().hex, 0.5)
+    if claim.acquired:
+        with wins.get_lock():
+            wins.value += 1
+    backend.close()
+
+
+def sqlite_round(contenders: int, path: str, key: str) -> int:
+    """Race ``contenders`` processes on one SQLite database."""
+    barrier = multiprocessing.Barrier(contenders)
+    wins = multiprocessing.Value("i", 0)
+    processes = [
+        multiprocessing.Process(target=sqlite_contender, args=(path, key, barrier, wins))
+        for _ in range(contenders)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return wins.value
+
+
+def lock_holder(path: str, hold: float, ready) -> None:
+    """Another worker process holding the database's write lock."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    ready.set()
+    time.sleep(hold)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+async def loop_stall(claim, contenders: int, path: str, hold: float) -> float:
+    """Longest event-loop stall (ms) while ``contenders`` claims wait on the lock."""
+    ready = multiprocessing.Event()
+    holder = multiprocessing.Process(target=lock_holder, args=(path, hold, ready))
+    holder.start()
+    ready.wait()
+    
+    stalls = [0.0]
+    
+    async def ticker() -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - start - 0.005)
+    
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await asyncio.gather(*(claim(f"loop_{uuid.uuid4().hex}") for _ in range(contenders)))
+    await asyncio.sleep(0.01)  # let the ticker record the last stall
+    task.cancel()
+    holder.join()
+    return max(stalls) * 1000
+
+
+async def event_loop_rounds(contenders: int, path: str, hold: float) -> bool:
+    """Compare inline claims with ``DetectionService.acquire_cooldown``."""
+    from app.models.detection import DetectionRequest
+    from app.services.detection_service import DetectionService
+    
+    inline_backend = SQLiteCooldownBackend(path, ttl_seconds=300)
+    
+    async def inline(key: str) -> None:
+        inline_backend.try_acquire(key, WINDOW_SECONDS, uuid.uuid4().hex, 0.5)
+    
+    async def service(key: str) -> None:
+        await DetectionService.acquire_cooldown(
+            DetectionRequest(device_id=key, animal="deer", confidence=0.5),
+            uuid.uuid4().hex
+        )
+    
+    inline_stall = await loop_stall(inline, contenders, path, hold)
+    service_stall = await loop_stall(service, contenders, path, hold)
+    inline_backend.close()
+    
+    ok = service_stall < hold * 1000 / 4
+    print(f"event loop under a {hold * 1000:.0f} ms write lock, {contenders} claims: "
+          f"longest stall inline {inline_stall:.0f} ms, "
+          f"acquire_cooldown {service_stall:.0f} ms  {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def main(args: argparse.Namespace) -> int:
+    failures = 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cooldown.db")
+        SQLiteCooldownBackend(path, ttl_seconds=300).close()  # create schema
+        os.environ.update(COOLDOWN_BACKEND="sqlite", COOLDOWN_DB_PATH=path)
+        
+        for label, run in (
+            ("memory/threads", lambda key: memory_round(args.contenders, key)),
+            ("sqlite/processes", lambda key: sqlite_round(args.contenders, path, key)),
+        ):
+            winners = [run(f"device_{i}") for i in range(args.rounds)]
+            bad = [w for w in winners if w != 1]
+            failures += len(bad)
+            status = "OK" if not bad else f"FAILED ({len(bad)} rounds)"
+            print(f"{label:<17} {args.rounds} rounds x {args.contenders} contenders, "
+                  f"winners per round: {sorted(set(winners))}  {status}")
+        
+        if not asyncio.run(event_loop_rounds(args.contenders, path, args.hold)):
+            failures += 1
+    
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contenders", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--hold", type=float, default=0.5,
+                        help="seconds another process holds the write lock")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""Firestore reads and latency of GET /api/detections, cached vs uncached.
+
+Stores detections from a fleet of devices, then requests the latest page,
+a per-device page and the second page (by cursor) repeatedly, once served
+from the history cache and once straight from (fake) Firestore. Every page
+of the full history is also walked both ways and compared. Exits non-zero
+if any page differs.
+
+Usage::
+
+    python -m benchmarks.detection_history [--detections 1000] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+os.environ.setdefault("COOLDOWN_SECONDS", "0")
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services import detection_history  # noqa: E402
+from app.services.detection_history import DetectionHistory  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+ANIMALS = ["tiger", "deer", "monkey", "cow", "leopard"]
+
+
+async def walk(client: httpx.AsyncClient, params: Dict[str, str]) -> List[str]:
+    """Detection IDs of every page of a listing."""
+    ids: List[str] = []
+    cursor: Optional[str] = None
+    while True:
+        response = await client.get(
+            "/api/detections",
+            params=dict(params, **({"cursor": cursor} if cursor else {})),
+            headers=HEADERS
+        )
+        response.raise_for_status()
+        page = response.json()
+        ids.extend(d["detection_id"] for d in page["detections"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+async def main(args: argparse.Namespace) -> int:
+    fakes = install_fakes()
+    db = fakes["firestore"]
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for index in range(args.detections):
+            response = await client.post(
+                "/api/detections",
+                json={
+                    "device_id": f"cam_{index % args.devices}",
+                    "animal": ANIMALS[index % len(ANIMALS)],
+                    "confidence": 0.9
+                },
+                headers=HEADERS
+            )
+            response.raise_for_status()
+        
+        db.latency = args.firestore_latency
+        first = await client.get("/api/detections", params={"limit": 50}, headers=HEADERS)
+        second_cursor = first.json()["next_cursor"]
+        views = {
+            "latest": {"limit": "50"},
+            "predator": {"limit": "50", "is_predator": "true"},
+            "device": {"limit": "50", "device_id": "cam_3"},
+            "page 2": {"limit": "50", "cursor": second_cursor},
+        }
+        
+        print(f"{len(db.data['detections'])} detections from {args.devices} devices, "
+              f"firestore latency {args.firestore_latency * 1000:.0f} ms, "
+              f"{args.requests} requests per view\n")
+        print(f"{'mode':<8}{'view':<9}{'reads':>8}{'p50':>10}{'p99':>10}")
+        
+        walks = {}
+        for mode, size in (("cached", args.cache_size), ("direct", 0)):
+            detection_history._history = DetectionHistory(size, refresh_seconds=0)
+            
+            for view, params in views.items():
+                await client.get("/api/detections", params=params, headers=HEADERS)
+                calls = db.calls
+                latencies = []
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = await client.get("/api/detections", params=params, headers=HEADERS)
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                latencies.sort()
+                print(f"{mode:<8}{view:<9}{db.calls - calls:>8}"
+                      f"{statistics.median(latencies):>8.2f}ms"
+                      f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f}ms")
+            
+            db.latency = 0
+            walks[mode] = [
+                await walk(client, {"limit": "100"}),
+                await walk(client, {"limit": "20", "is_predator": "true"}),
+                await walk(client, {"limit": "20", "device_id": "cam_1", "animal": "tiger"}),
+            ]
+            db.latency = args.firestore_latency
+    
+    identical = walks["cached"] == walks["direct"]
+    print(f"\nfull pagination identical cached vs direct: {identical} "
+          f"({len(walks['cached'][0])} detections walked)")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detections", type=int, default=1000)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--cache-size", type=int, default=500)
+    parser.add_argument("--firestore-latency", type=float, default=0.02)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,139 @@
+"""Documents read by GET /api/detections/stats vs scanning detections.
+
+Stores a month of detections from a fleet of devices through the batch
+endpoint, flushes the rollups, then asks for the last day, week and month of
+counts by hour, day and in total. Reports the rollup documents each query
+read next to the detections a scan of the same range would read. Exits
+non-zero unless the totals and the per-day counts match the stored
+detections, or if a query over ``STATS_MAX_ROLLUP_READS`` is not refused
+with 400.
+
+Usage::
+
+    python -m benchmarks.detection_stats [--detections 60000] [--devices 4]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services.detection_history import as_utc  # noqa: E402
+from app.services.rollups import get_detection_rollups  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+ANIMALS = ["tiger", "deer", "monkey", "cow", "leopard", "bear"]
+
+
+async def main(args: argparse.Namespace) -> int:
+    fakes = install_fakes()
+    db = fakes["firestore"]
+    rng = random.Random(1)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        detections = [
+            {
+                "device_id": f"cam_{rng.randrange(args.devices)}",
+                "animal": rng.choice(ANIMALS),
+                "confidence": round(rng.uniform(0.5, 1.0), 2),
+                "timestamp": (now - timedelta(seconds=rng.uniform(0, 30 * 86400))).isoformat()
+            }
+            for _ in range(args.detections)
+        ]
+        for start in range(0, len(detections), 1000):
+            response = await client.post(
+                "/api/detections/batch", json=detections[start:start + 1000], headers=HEADERS
+            )
+            response.raise_for_status()
+        
+        await get_detection_rollups().flush()
+        stored = list(db.data["detections"].values())
+        print(f"{len(stored)} detections stored over 30 days from {args.devices} devices, "
+              f"{len(db.data['detection_rollups'])} hourly and "
+              f"{len(db.data['detection_rollups_daily'])} daily rollup documents\n")
+        print(f"{'range':<8}{'interval':>9}{'rollups read':>14}{'scan would read':>17}"
+              f"{'latency':>10}  totals")
+        
+        mismatches = 0
+        until = datetime.now(timezone.utc)
+        for days in (1, 7, 30):
+            since = until - timedelta(days=days)
+            
+            # Rollups cover whole hours: the scan starts at the same hour
+            floor = since.replace(minute=0, second=0, microsecond=0)
+            in_range = [d for d in stored if floor <= as_utc(d["detection_time"]) < until]
+            expected = (
+                len(in_range),
+                sum(d["is_predator"] for d in in_range),
+                sum(d["alert_sent"] for d in in_range)
+            )
+            per_day = Counter(as_utc(d["detection_time"]).date() for d in in_range)
+            
+            for interval in ("hour", "day", "total"):
+                reads = get_detection_rollups().document_reads
+                started = time.perf_counter()
+                response = await client.get(
+                    "/api/detections/stats",
+                    params={
+                        "since": since.isoformat(),
+                        "until": until.isoformat(),
+                        "interval": interval
+                    },
+                    headers=HEADERS
+                )
+                elapsed = (time.perf_counter() - started) * 1000
+                response.raise_for_status()
+                body = response.json()
+                totals = body["totals"]
+                
+                actual = (totals["detections"], totals["predators"], totals["alerts"])
+                mismatch = actual != expected
+                if interval == "day":
+                    buckets = Counter()
+                    for bucket in body["buckets"]:
+                        buckets[datetime.fromisoformat(bucket["start"]).date()] += bucket["detections"]
+                    mismatch = mismatch or buckets != per_day
+                mismatches += mismatch
+                
+                print(f"{days:>3} days{interval:>9}"
+                      f"{get_detection_rollups().document_reads - reads:>14}"
+                      f"{len(in_range):>17}{elapsed:>8.1f}ms  {actual}"
+                      f"{f' != expected {expected} (or per-day counts)' if mismatch else ''}")
+        
+        # A range over the read cap is refused, not read
+        get_detection_rollups()._max_reads = 100
+        response = await client.get(
+            "/api/detections/stats",
+            params={"since": (until - timedelta(days=30)).isoformat(), "interval": "hour"},
+            headers=HEADERS
+        )
+        capped = response.status_code == 400
+        mismatches += not capped
+        print(f"\n30 days by hour with a 100-document cap: {response.status_code} "
+              f"{'OK' if capped else 'FAILED (expected 400)'}")
+    
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detections", type=int, default=60000)
+    parser.add_argument("--devices", type=int, default=4)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,157 @@
+"""Load test: image-less request latency while slow image uploads are in flight.
+
+Fires a steady stream of image-less detections at the app while a number of
+image uploads (each blocking for ``--upload-latency`` seconds) run
+concurrently, then reports p50/p99 latency for the image-less requests.
+
+With the blocking calls on the executor the p99 stays close to the idle
+baseline. ``--inline`` runs the same SDK calls directly on the event loop,
+which is how the service behaved before, for comparison.
+
+Usage::
+
+    python -m benchmarks.event_loop_latency [--uploads 8] [--inline]
+"""
+
+import argparse
+import asyncio
+import base64
+import statistics
+import time
+from typing import List
+
+from benchmarks.fakes import (
+    FakeCloudinaryTransport,
+    FakeUploader,
+    configure_environment,
+    install_cloudinary_transport,
+    install_fakes,
+)
+
+configure_environment()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+IMAGE = base64.b64encode(b"\xff\xd8" + b"\x00" * 200_000).decode()
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_inline(uploader: FakeUploader) -> None:
+    """Call the blocking fakes straight from the event loop."""
+    from app.services import cloudinary_service, detection_service, fcm_service
+    
+    async def inline(func, *args, pool=None, **kwargs):
+        return func(*args, **kwargs)
+    
+    for module in (cloudinary_service, detection_service, fcm_service):
+        module.run_blocking = inline
+    # Like the synchronous SDK upload before the async Cloudinary client
+    install_cloudinary_transport(FakeCloudinaryTransport(uploader.upload, blocking=True))
+
+
+async def probe(
+    client: httpx.AsyncClient,
+    label: str,
+    count: int,
+    interval: float
+) -> List[float]:
+    """Send ``count`` image-less detections and return their latencies (ms)."""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/detections",
+            json={"device_id": f"{label}_{i}", "animal": "deer", "confidence": 0.5},
+            headers=HEADERS
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def upload_loop(client: httpx.AsyncClient, index: int, stop: asyncio.Event) -> None:
+    """Keep sending detections carrying an image until ``stop`` is set."""
+    sequence = 0
+    while not stop.is_set():
+        await client.post(
+            "/api/detections",
+            json={
+                "device_id": f"uploader_{index}_{sequence}",
+                "animal": "deer",
+                "confidence": 0.5,
+                "image_base64": IMAGE
+            },
+            headers=HEADERS
+        )
+        sequence += 1
+
+
+async def main(args: argparse.Namespace) -> None:
+    fakes = install_fakes(
+        firestore_latency=args.firestore_latency,
+        fcm_latency=args.firestore_latency,
+        upload_latency=args.upload_latency
+    )
+    if args.inline:
+        run_inline(fakes["cloudinary"])
+    
+    # A real socket server, so requests interleave the way they do in production
+    config = uvicorn.Config(app, port=args.port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    
+    limits = httpx.Limits(max_connections=args.uploads + 1)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}",
+        limits=limits,
+        timeout=None
+    ) as client:
+        idle = await probe(client, "idle", args.requests, args.interval)
+        
+        stop = asyncio.Event()
+        uploaders = [
+            asyncio.create_task(upload_loop(client, i, stop))
+            for i in range(args.uploads)
+        ]
+        await asyncio.sleep(0.05)  # let the uploads reach the uploader
+        loaded = await probe(client, "loaded", args.requests, args.interval)
+        stop.set()
+        await asyncio.gather(*uploaders)
+    
+    server.should_exit = True
+    await serving
+    
+    mode = "inline (blocking)" if args.inline else "executor"
+    print(f"mode: {mode}, concurrent uploads: {args.uploads}, "
+          f"upload latency: {args.upload_latency:.2f}s")
+    for label, samples in (("idle", idle), ("uploads in flight", loaded)):
+        print(
+            f"  {label:<18} p50={statistics.median(samples):8.1f} ms  "
+            f"p99={percentile(samples, 99):8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--upload-latency", type=float, default=0.5)
+    parser.add_argument("--firestore-latency", type=float, default=0.005)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--inline", action="store_true")
+    asyncio.run(main(parser.parse_args()))
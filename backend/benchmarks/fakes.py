@@ -0,0 +1,684 @@
+"""Local stand-ins for Firestore, FCM and Cloudinary.
+
+The Firestore and FCM fakes block the calling thread for a configurable
+latency, exactly like the real synchronous SDKs do, so benchmarks exercise
+the same threading behaviour as production without touching any cloud
+service. Both can fail a given fraction of calls with the errors the SDKs
+raise (``error_rate``, from a seeded generator). Cloudinary is faked at the
+HTTP level: in-process through ``FakeCloudinaryTransport``, or over real
+sockets with ``FakeCloudinaryServer``.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from google.api_core.exceptions import ServiceUnavailable
+from google.cloud.firestore import SERVER_TIMESTAMP, Increment, Maximum
+
+
+def configure_environment() -> None:
+    """Set the env vars the app needs before ``app`` is imported."""
+    os.environ.setdefault("API_KEYS", "bench_key")
+    os.environ.setdefault("CLOUDINARY_CLOUD_NAME", "bench")
+    os.environ.setdefault("CLOUDINARY_API_KEY", "bench")
+    os.environ.setdefault("CLOUDINARY_API_SECRET", "bench")
+    # Benchmarks resend one image; measure the uploads, not the dedup cache
+    os.environ.setdefault("IMAGE_DEDUP_MAX_ENTRIES", "0")
+
+
+def _resolve(current: Optional[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply ``Increment``/``Maximum``/``SERVER_TIMESTAMP`` as Firestore does."""
+    resolved = {}
+    for field, value in data.items():
+        old = (current or {}).get(field)
+        if isinstance(value, Increment):
+            value = (old or 0) + value.value
+        elif isinstance(value, Maximum):
+            value = value.value if old is None else max(old, value.value)
+        elif value is SERVER_TIMESTAMP:
+            value = datetime.now(timezone.utc)
+        resolved[field] = value
+    return resolved
+
+
+class FakeSnapshot:
+    """Minimal ``DocumentSnapshot``."""
+    
+    def __init__(
+        self,
+        doc_id: str,
+        data: Optional[Dict[str, Any]],
+        reference: Optional["FakeDocumentReference"] = None
+    ):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+    
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+    
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    """Minimal ``DocumentReference`` backed by a dict."""
+    
+    def __init__(self, store: "FakeFirestore", collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+    
+    def _docs(self) -> Dict[str, Dict[str, Any]]:
+        return self._store.data.setdefault(self._collection, {})
+    
+    def get(self) -> FakeSnapshot:
+        self._store.wait()
+        return FakeSnapshot(self.id, self._docs().get(self.id))
+    
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._store.wait(write=True)
+        self._apply(data, merge)
+    
+    def update(self, data: Dict[str, Any]) -> None:
+        self._store.wait(write=True)
+        if self.id not in self._docs():
+            raise KeyError(f"No document to update: {self.id}")
+        self._apply(data, merge=True)
+    
+    def _apply(self, data: Optional[Dict[str, Any]], merge: bool) -> None:
+        docs = self._docs()
+        if data is None:
+            docs.pop(self.id, None)
+        elif merge:
+            current = docs.setdefault(self.id, {})
+            current.update(_resolve(current, data))
+        else:
+            docs[self.id] = _resolve(None, data)
+    
+    def on_snapshot(self, callback: Any) -> "FakeWatch":
+        # Delivers the current state once; later writes are not streamed
+        callback([FakeSnapshot(self.id, self._docs().get(self.id))], [], None)
+        return FakeWatch()
+
+
+class FakeWatch:
+    """Minimal ``Watch`` returned by ``on_snapshot``."""
+    
+    def unsubscribe(self) -> None:
+        pass
+
+
+_OPERATORS = {
+    "==": lambda field, value: field == value,
+    "in": lambda field, value: field in value,
+    ">=": lambda field, value: field is not None and field >= value,
+    "<": lambda field, value: field is not None and field < value,
+}
+
+
+class FakeQuery:
+    """
+    Minimal ``Query``: ``where(filter=FieldFilter(...))``, descending
+    ``order_by``, ``start_after`` (a dict of the order fields) and ``limit``.
+    """
+    
+    def __init__(
+        self,
+        store: "FakeFirestore",
+        name: str,
+        filters: tuple = (),
+        orders: tuple = (),
+        start_after: Optional[tuple] = None,
+        limit: Optional[int] = None
+    ):
+        self._store = store
+        self._name = name
+        self._filters = filters
+        self._orders = orders
+        self._start_after = start_after
+        self._limit = limit
+    
+    def _copy(self, **changes: Any) -> "FakeQuery":
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "start_after": self._start_after,
+            "limit": self._limit,
+        }
+        state.update(changes)
+        return FakeQuery(self._store, self._name, **state)
+    
+    def where(self, filter: Any) -> "FakeQuery":
+        return self._copy(filters=self._filters + (filter,))
+    
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        if direction != "DESCENDING":
+            raise NotImplementedError("FakeQuery only orders descending")
+        return self._copy(orders=self._orders + (field_path,))
+    
+    def start_after(self, fields: Dict[str, Any]) -> "FakeQuery":
+        return self._copy(start_after=tuple(fields[field] for field in self._orders))
+    
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit=count)
+    
+    def _sort_key(self, doc_id: str, data: Dict[str, Any]) -> tuple:
+        return tuple(doc_id if field == "__name__" else data.get(field) for field in self._orders)
+    
+    def stream(self):
+        self._store.wait()
+        docs = self._store.data.get(self._name, {})
+        matches = [
+            (doc_id, data) for doc_id, data in list(docs.items())
+            if all(
+                _OPERATORS[f.op_string](data.get(f.field_path), f.value)
+                for f in self._filters
+            )
+        ]
+        
+        if self._orders:
+            matches = [
+                (doc_id, data) for doc_id, data in matches
+                if all(data.get(field) is not None for field in self._orders if field != "__name__")
+            ]
+            matches.sort(key=lambda match: self._sort_key(*match), reverse=True)
+            if self._start_after is not None:
+                matches = [m for m in matches if self._sort_key(*m) < self._start_after]
+        
+        for doc_id, data in matches[:self._limit]:
+            yield FakeSnapshot(
+                doc_id, data, FakeDocumentReference(self._store, self._name, doc_id)
+            )
+
+
+class FakeCollectionReference(FakeQuery):
+    """Minimal ``CollectionReference``."""
+    
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(
+            self._store, self._name, doc_id or uuid.uuid4().hex[:20]
+        )
+
+
+class FakeWriteBatch:
+    """Minimal ``WriteBatch``: buffers sets, applies them in one call."""
+    
+    def __init__(self, store: "FakeFirestore"):
+        self._store = store
+        self._writes = []
+    
+    def set(self, doc_ref: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((doc_ref, data, merge))
+    
+    def delete(self, doc_ref: FakeDocumentReference) -> None:
+        self._writes.append((doc_ref, None, False))
+    
+    def commit(self) -> list:
+        if len(self._writes) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        self._store.wait(write=True)
+        for doc_ref, data, merge in self._writes:
+            doc_ref._apply(data, merge)
+        return []
+
+
+class FakeFirestore:
+    """
+    In-memory Firestore client with injected per-call latency.
+    
+    The first call also waits ``connect_latency`` (calls made meanwhile wait
+    with it), like the SDK opening its gRPC channel. ``error_rate`` of the
+    calls fail with ``ServiceUnavailable`` after their latency.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.calls = 0
+        self.write_calls = 0  # set/update/commit round trips
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._connected = False
+        self._connect_lock = threading.Lock()
+    
+    def wait(self, write: bool = False) -> None:
+        self.calls += 1
+        self.write_calls += write
+        if not self._connected:
+            with self._connect_lock:
+                if not self._connected:
+                    time.sleep(self.connect_latency)
+                    self._connected = True
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            raise ServiceUnavailable("Injected Firestore error")
+    
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+    
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+
+class FakeCredential:
+    """Firebase credential whose first access token takes ``token_latency``."""
+    
+    def __init__(self, token_latency: float = 0.0):
+        self.token_latency = token_latency
+        self.token: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def get_access_token(self) -> str:
+        with self._lock:
+            if self.token is None:
+                time.sleep(self.token_latency)
+                self.token = uuid.uuid4().hex
+            return self.token
+
+
+class FakeFirebaseApp:
+    """Minimal ``firebase_admin.App``."""
+    
+    def __init__(self, credential: FakeCredential):
+        self.credential = credential
+
+
+class FakeMessaging:
+    """
+    Stand-in for ``firebase_admin.messaging.send``.
+    
+    Every send signs with ``credential``, fetching its token first if the
+    warmup has not, as the SDK does. ``error_rate`` of the messages fail
+    with ``UnavailableError``.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.0,
+        credential: Optional[FakeCredential] = None,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.credential = credential or FakeCredential()
+        self.error_rate = error_rate
+        self.sent = []
+        self.sent_at = []
+        self.dead_tokens = set()
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+    
+    def _injected_error(self) -> Optional[Exception]:
+        from firebase_admin import exceptions
+        
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            return exceptions.UnavailableError("Injected FCM error")
+        return None
+    
+    def send(self, message: Any, dry_run: bool = False) -> str:
+        self.credential.get_access_token()
+        self.sent_at.append(time.perf_counter())
+        if self.latency:
+            time.sleep(self.latency)
+        error = self._injected_error()
+        if error is not None:
+            raise error
+        self.sent.append(message)
+        return f"projects/bench/messages/{uuid.uuid4().hex}"
+
+
+    def send_each(self, messages: List[Any], dry_run: bool = False) -> "FakeBatchResponse":
+        # The real SDK sends each message on its own thread
+        self.credential.get_access_token()
+        dispatched = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        responses = []
+        for message in messages:
+            self.sent_at.append(dispatched)
+            error = self._injected_error()
+            if error is not None:
+                responses.append(FakeSendResponse(exception=error))
+                continue
+            self.sent.append(message)
+            responses.append(FakeSendResponse(f"projects/bench/messages/{uuid.uuid4().hex}"))
+        return FakeBatchResponse(responses)
+
+
+    def send_each_for_multicast(self, multicast: Any, dry_run: bool = False) -> "FakeBatchResponse":
+        from firebase_admin import exceptions, messaging
+        
+        if len(multicast.tokens) > 500:
+            raise ValueError("tokens must not contain more than 500 tokens")
+        self.credential.get_access_token()
+        if self.latency:
+            time.sleep(self.latency)
+        responses = []
+        for token in multicast.tokens:
+            if token in self.dead_tokens:
+                responses.append(FakeSendResponse(
+                    exception=messaging.UnregisteredError("Requested entity was not found.")
+                ))
+            elif self.error_rate and self._random.random() < self.error_rate:
+                self.injected_errors += 1
+                responses.append(FakeSendResponse(
+                    exception=exceptions.UnavailableError("Injected FCM error")
+                ))
+            else:
+                self.sent.append(token)
+                responses.append(FakeSendResponse(f"projects/bench/messages/{uuid.uuid4().hex}"))
+        return FakeBatchResponse(responses)
+
+
+class FakeSendResponse:
+    """Minimal ``messaging.SendResponse``."""
+    
+    def __init__(self, message_id: Optional[str] = None, exception: Optional[Exception] = None):
+        self.message_id = message_id
+        self.exception = exception
+    
+    @property
+    def success(self) -> bool:
+        return self.exception is None
+
+
+class FakeBatchResponse:
+    """Minimal ``messaging.BatchResponse``."""
+    
+    def __init__(self, responses: List[FakeSendResponse]):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r.success)
+        self.failure_count = len(responses) - self.success_count
+
+
+class FakeUploader:
+    """Cloudinary's upload endpoint: ``upload(size, **fields)`` -> response."""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.uploads = 0
+        self.bytes_received = 0
+    
+    def upload(self, size: int, **options: Any) -> Dict[str, Any]:
+        self.bytes_received += size
+        if self.latency:
+            time.sleep(self.latency)
+        self.uploads += 1
+        folder = options.get("folder", "")
+        public_id = options.get("public_id", uuid.uuid4().hex)
+        return {
+            "public_id": f"{folder}/{public_id}",
+            "secure_url": f"https://res.cloudinary.com/bench/{folder}/{public_id}.jpg"
+        }
+
+
+_PART_NAME = re.compile(rb'name="([^"]*)"')
+
+
+class UploadParser:
+    """
+    Incremental parser for a multipart upload request.
+    
+    Keeps the form fields and only counts the bytes of the ``file`` part
+    (sent last), so the fakes don't add copies of the image to the memory
+    profile of the process under test.
+    """
+    
+    def __init__(self, content_type: str):
+        self._delimiter = b"--" + content_type.split("boundary=", 1)[1].strip('"').encode()
+        self._head = bytearray()
+        self._in_file = False
+        self.fields: Dict[str, str] = {}
+        self.size = 0
+    
+    def feed(self, chunk: bytes) -> None:
+        if self._in_file:
+            self.size += len(chunk)
+            return
+        
+        self._head += chunk
+        file_part = self._head.find(b'name="file"')
+        if file_part == -1:
+            return
+        data_start = self._head.find(b"\r\n\r\n", file_part)
+        if data_start == -1:
+            return
+        
+        self._in_file = True
+        self.size = len(self._head) - data_start - 4
+        for part in bytes(self._head[:file_part]).split(self._delimiter)[1:-1]:
+            headers, _, content = part[2:-2].partition(b"\r\n\r\n")
+            self.fields[_PART_NAME.search(headers).group(1).decode()] = content.decode()
+        self._head.clear()
+    
+    def close(self) -> None:
+        # "\r\n--boundary--\r\n" follows the file
+        self.size -= len(self._delimiter) + 6
+
+
+def _upload_response(upload: Callable[..., Dict[str, Any]],
+                     parser: UploadParser) -> Tuple[int, Dict[str, Any]]:
+    fields = dict(parser.fields)
+    for name in ("api_key", "signature", "timestamp"):
+        if name not in fields:
+            return 401, {"error": {"message": f"Missing required parameter - {name}"}}
+        fields.pop(name)
+    try:
+        return 200, upload(parser.size, **fields)
+    except Exception as e:
+        return 503, {"error": {"message": str(e)}}
+
+
+class FakeCloudinaryTransport(httpx.AsyncBaseTransport):
+    """
+    In-process Cloudinary upload API for ``CloudinaryClient``.
+    
+    Requests are parsed and handed to ``upload`` on a worker thread, so a
+    slow fake upload stalls only that request, like a slow network would
+    (``blocking`` runs it on the event loop instead). An exception from
+    ``upload`` becomes a ``503``.
+    """
+    
+    def __init__(self, upload: Callable[..., Dict[str, Any]], blocking: bool = False):
+        self._upload = upload
+        self._blocking = blocking
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET" and request.url.path.endswith("/ping"):
+            return httpx.Response(200, json={"status": "ok"})
+        
+        parser = UploadParser(request.headers["content-type"])
+        async for chunk in request.stream:
+            parser.feed(chunk)
+        parser.close()
+        
+        if self._blocking:
+            status, payload = _upload_response(self._upload, parser)
+        else:
+            status, payload = await asyncio.to_thread(_upload_response, self._upload, parser)
+        return httpx.Response(status, json=payload)
+
+
+class FakeCloudinaryServer:
+    """
+    Cloudinary upload API on a local HTTP/1.1 server (keep-alive).
+    
+    Point ``CLOUDINARY_API_URL`` (or ``CloudinaryClient``) at ``url``.
+    Failures are injected per ``public_id``, so every upload can succeed on
+    a retry: the first attempt of one in ``fail_every`` returns ``503`` and
+    the first attempt of one in ``stall_every`` answers only after
+    ``stall_seconds``. Each new connection waits ``connect_latency`` before
+    its first request is read, like a TLS handshake.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.0,
+        fail_every: int = 0,
+        stall_every: int = 0,
+        stall_seconds: float = 0.0,
+        connect_latency: float = 0.0
+    ):
+        self.uploader = FakeUploader(latency=latency)
+        self.fail_every = fail_every
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.connect_latency = connect_latency
+        self.requests = 0
+        self.connections = 0
+        self.injected_failures = 0
+        self.injected_stalls = 0
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "FakeCloudinaryServer":
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def _upload(self, size: int, **fields: Any) -> Dict[str, Any]:
+        public_id = fields.get("public_id", "")
+        key = zlib.crc32(public_id.encode())
+        with self._lock:
+            attempt = self._attempts.get(public_id, 0)
+            self._attempts[public_id] = attempt + 1
+        
+        if attempt == 0 and self.fail_every and key % self.fail_every == 0:
+            self.injected_failures += 1
+            raise ConnectionError("Injected 503")
+        if attempt == 0 and self.stall_every and key % self.stall_every == 1:
+            self.injected_stalls += 1
+            time.sleep(self.stall_seconds)
+        return self.uploader.upload(size, **fields)
+    
+    def _handler(self) -> type:
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes: no Nagle/delayed-ACK stall
+            disable_nagle_algorithm = True
+            
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                if server.connect_latency:
+                    time.sleep(server.connect_latency)
+            
+            def do_GET(self) -> None:
+                response = b'{"status": "ok"}'
+                self.send_response(200 if self.path.endswith("/ping") else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+            
+            def do_POST(self) -> None:
+                with server._lock:
+                    server.requests += 1
+                parser = UploadParser(self.headers["Content-Type"])
+                remaining = int(self.headers["Content-Length"])
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 65536))
+                    remaining -= len(chunk)
+                    parser.feed(chunk)
+                parser.close()
+                status, payload = _upload_response(server._upload, parser)
+                response = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(response)))
+                    self.end_headers()
+                    self.wfile.write(response)
+                except OSError:
+                    pass  # The client gave up (read timeout)
+            
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+        
+        return Handler
+
+
+def install_fakes(
+    firestore_latency: float = 0.0,
+    fcm_latency: float = 0.0,
+    upload_latency: float = 0.0,
+    firestore_connect_latency: float = 0.0,
+    fcm_token_latency: float = 0.0,
+    firestore_error_rate: float = 0.0,
+    fcm_error_rate: float = 0.0,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Patch the app's Firestore client, FCM transport and Cloudinary client.
+    
+    Returns:
+        Dictionary with the installed fakes, keyed by dependency name
+    """
+    from firebase_admin import messaging
+    from app.core import firebase
+    
+    db = FakeFirestore(
+        latency=firestore_latency,
+        connect_latency=firestore_connect_latency,
+        error_rate=firestore_error_rate,
+        seed=seed
+    )
+    credential = FakeCredential(token_latency=fcm_token_latency)
+    fcm = FakeMessaging(
+        latency=fcm_latency, credential=credential, error_rate=fcm_error_rate, seed=seed + 1
+    )
+    uploader = FakeUploader(latency=upload_latency)
+    
+    firebase._firestore_client = db
+    firebase._firebase_app = FakeFirebaseApp(credential)
+    messaging.send = fcm.send
+    messaging.send_each = fcm.send_each
+    messaging.send_each_for_multicast = fcm.send_each_for_multicast
+    install_cloudinary_transport(FakeCloudinaryTransport(uploader.upload))
+    
+    return {"firestore": db, "fcm": fcm, "cloudinary": uploader}
+
+
+def install_cloudinary_transport(transport: httpx.AsyncBaseTransport) -> None:
+    """Route the app's Cloudinary uploads through ``transport``."""
+    from app.services.cloudinary_client import create_cloudinary_client, set_cloudinary_client
+    
+    set_cloudinary_client(create_cloudinary_client(transport))
@@ -0,0 +1,86 @@
+"""Firestore write round trips per detection under concurrent load.
+
+Submits predator detections with images (half of them) from many devices at
+once and counts the set/update/commit round trips the (fake) Firestore
+receives, alongside request latency and throughput.
+
+Usage::
+
+    python -m benchmarks.firestore_writes [--detections 400] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import base64
+import statistics
+import time
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+IMAGE = base64.b64encode(b"\xff\xd8" + b"\x00" * 20_000).decode()
+
+
+async def main(args: argparse.Namespace) -> None:
+    fakes = install_fakes(
+        firestore_latency=args.firestore_latency,
+        fcm_latency=args.fcm_latency,
+        upload_latency=args.upload_latency
+    )
+    db = fakes["firestore"]
+    limit = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    
+    async def submit(client: httpx.AsyncClient, index: int) -> None:
+        async with limit:
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/detections",
+                json={
+                    "device_id": f"cam_{index}",
+                    "animal": "tiger",
+                    "confidence": 0.9,
+                    "image_base64": IMAGE if index % 2 else None
+                },
+                headers=HEADERS
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[submit(client, i) for i in range(args.detections)])
+        elapsed = time.perf_counter() - started
+    
+    stored = len(db.data.get("detections", {}))
+    latencies.sort()
+    print(f"{args.detections} predator detections, concurrency {args.concurrency}, "
+          f"firestore latency {args.firestore_latency * 1000:.0f} ms")
+    print(f"  documents stored          {stored}")
+    print(f"  write round trips         {db.write_calls} "
+          f"({db.write_calls / args.detections:.2f} per detection)")
+    print(f"  request latency           p50={statistics.median(latencies):7.1f} ms  "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:7.1f} ms")
+    print(f"  throughput                {args.detections / elapsed:7.1f} detections/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detections", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--upload-latency", type=float, default=0.1)
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--fcm-latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+"""Memory and throughput: base64 JSON vs multipart image ingestion.
+
+For each frame size, submits detections through ``POST /api/detections``
+(base64 in JSON) and ``POST /api/detections/upload`` (binary multipart) and
+reports peak traced Python memory per request and ingest throughput.
+
+Request bodies are built before each pass, so the peak reflects what the
+server holds while handling the request.
+
+Usage::
+
+    python -m benchmarks.image_ingest [--sizes 1 2 3 4 5] [--requests 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+MB = 1024 * 1024
+
+
+def json_body(frame: bytes) -> dict:
+    """Build a base64 JSON request."""
+    payload = {
+        "device_id": f"cam_{uuid.uuid4().hex[:8]}",
+        "animal": "deer",
+        "confidence": 0.5,
+        "image_base64": base64.b64encode(frame).decode()
+    }
+    return {
+        "url": "/api/detections",
+        "content": json.dumps(payload).encode(),
+        "headers": {**HEADERS, "Content-Type": "application/json"}
+    }
+
+
+def multipart_body(frame: bytes) -> dict:
+    """Build a multipart request."""
+    request = httpx.Request(
+        "POST",
+        "http://bench/api/detections/upload",
+        data={
+            "device_id": f"cam_{uuid.uuid4().hex[:8]}",
+            "animal": "deer",
+            "confidence": "0.5"
+        },
+        files={"image": ("frame.jpg", frame, "image/jpeg")}
+    )
+    return {
+        "url": "/api/detections/upload",
+        "content": request.read(),
+        "headers": {**HEADERS, "Content-Type": request.headers["Content-Type"]}
+    }
+
+
+async def measure_memory(client: httpx.AsyncClient, bodies: list) -> int:
+    """Return the peak traced bytes of the most expensive request."""
+    tracemalloc.start()
+    peak = 0
+    for body in bodies:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        response = await client.post(
+            body["url"], content=body["content"], headers=body["headers"]
+        )
+        response.raise_for_status()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return peak
+
+
+async def measure_time(client: httpx.AsyncClient, bodies: list) -> float:
+    """Return the seconds spent serving a set of requests.
+    
+    Timed separately from the memory pass: tracemalloc slows down the
+    chunk-by-chunk multipart parser far more than a single JSON parse.
+    """
+    elapsed = 0.0
+    for body in bodies:
+        start = time.perf_counter()
+        response = await client.post(
+            body["url"], content=body["content"], headers=body["headers"]
+        )
+        elapsed += time.perf_counter() - start
+        response.raise_for_status()
+    return elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    install_fakes()
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        print(f"{'frame':>6} {'path':<10} {'wire MB':>8} {'peak MB/req':>12} {'MB/s':>8}")
+        
+        for size in args.sizes:
+            frame = b"\xff\xd8" + os.urandom(size * MB - 2)
+            
+            for label, build in (("base64", json_body), ("multipart", multipart_body)):
+                bodies = [build(frame) for _ in range(args.requests)]
+                wire = len(bodies[0]["content"]) / MB
+                elapsed = await measure_time(client, bodies)
+                bodies = [build(frame) for _ in range(args.requests)]
+                peak = await measure_memory(client, bodies)
+                throughput = size * args.requests / elapsed
+                print(f"{size:>4}MB {label:<10} {wire:>8.2f} {peak / MB:>12.2f} {throughput:>8.1f}")
+                del bodies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--requests", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,427 @@
+"""Offline load test: a fleet of devices against the API on fake dependencies.
+
+Starts the API in a child process with the in-memory Firestore and FCM
+fakes and a local Cloudinary HTTP server, each with configurable latency
+and injected errors, then drives it with a fleet of simulated Raspberry
+Pis. Each device sends detections as a Poisson process (``--rate`` per
+second): ``--predator-ratio`` of them predators, ``--image-ratio`` with a
+JPEG-sized image (log-normal around ``--image-kb``). Arrivals are
+open-loop, so a slow server does not slow the load down and latencies
+include queueing.
+
+Reports throughput, latency percentiles (all detections, predators and
+others), per-stage latency from the server's ``/metrics`` histograms
+(percentiles interpolated within buckets), cooldown outcomes, dependency
+errors and retries, and what the fakes saw. ``--output`` writes it all as
+JSON, with the git commit; ``--compare`` prints the change against an
+earlier file and exits non-zero if throughput or p95/p99 latency got worse
+by more than ``--tolerance``.
+
+Usage::
+
+    python -m benchmarks.load_test [--devices 50] [--rate 0.2] [--duration 30]
+        [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+PORT = 8769
+PREDATORS = ["Tiger", "Leopard", "Bear", "Elephant", "Wild-Boar", "Monkey"]
+OTHERS = ["Deer", "Cow", "Goat", "Dog", "Peacock"]
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+IMAGE_POOL = 32  # Distinct frames per run; dedup is off in benchmarks
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Child process: the API on fakes; writes what the fakes saw on exit."""
+    from benchmarks.fakes import FakeCloudinaryServer, configure_environment, install_fakes
+    
+    configure_environment()
+    os.environ["COOLDOWN_SECONDS"] = str(args.cooldown)
+    cloudinary = FakeCloudinaryServer(
+        latency=args.upload_latency,
+        fail_every=args.cloudinary_fail_every,
+        stall_every=args.cloudinary_stall_every,
+        stall_seconds=args.cloudinary_stall_seconds
+    ).start()
+    os.environ["CLOUDINARY_API_URL"] = cloudinary.url
+    
+    import uvicorn
+    from app.main import app
+    from app.services.cloudinary_client import create_cloudinary_client, set_cloudinary_client
+    
+    fakes = install_fakes(
+        firestore_latency=args.firestore_latency,
+        fcm_latency=args.fcm_latency,
+        firestore_error_rate=args.firestore_error_rate,
+        fcm_error_rate=args.fcm_error_rate,
+        seed=args.seed
+    )
+    set_cloudinary_client(create_cloudinary_client())
+    uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning")
+    
+    db, fcm = fakes["firestore"], fakes["fcm"]
+    with open(args.stats_file, "w") as f:
+        json.dump({
+            "firestore": {
+                "calls": db.calls,
+                "write_calls": db.write_calls,
+                "injected_errors": db.injected_errors,
+                "detections_stored": len(db.data.get("detections", {}))
+            },
+            "fcm": {"sent": len(fcm.sent), "injected_errors": fcm.injected_errors},
+            "cloudinary": {
+                "requests": cloudinary.requests,
+                "uploads": cloudinary.uploader.uploads,
+                "connections": cloudinary.connections,
+                "injected_failures": cloudinary.injected_failures,
+                "injected_stalls": cloudinary.injected_stalls
+            }
+        }, f)
+    cloudinary.stop()
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+    summary = {
+        name: values[min(len(values) - 1, int(q * len(values)))]
+        for name, q in QUANTILES.items()
+    }
+    summary["mean"] = sum(values) / len(values)
+    summary["max"] = values[-1]
+    return {name: round(value, 2) for name, value in summary.items()}
+
+
+def parse_metrics(text: str) -> Dict[str, List[Tuple[Dict[str, str], float]]]:
+    """Prometheus text format -> ``{name: [(labels, value), ...]}``."""
+    samples: Dict[str, List[Tuple[Dict[str, str], float]]] = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples.setdefault(name, []).append((dict(_LABEL.findall(labels or "")), float(value)))
+    return samples
+
+
+def histogram_quantile(buckets: List[Tuple[float, float]], q: float) -> float:
+    """Quantile from cumulative ``(upper bound, count)`` buckets."""
+    total = buckets[-1][1]
+    target = q * total
+    lower, below = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= target:
+            if math.isinf(bound):
+                return lower  # Beyond the last finite bucket
+            inside = cumulative - below
+            return lower + (bound - lower) * ((target - below) / inside if inside else 0)
+        lower, below = bound, cumulative
+    return lower
+
+
+def stage_breakdown(samples: Dict[str, List[Tuple[Dict[str, str], float]]]) -> Dict[str, Dict[str, float]]:
+    """Per-stage count, mean and percentiles (ms) from the stage histogram."""
+    name = "predator_stage_duration_seconds"
+    buckets: Dict[str, List[Tuple[float, float]]] = {}
+    for labels, value in samples.get(f"{name}_bucket", []):
+        buckets.setdefault(labels["stage"], []).append((float(labels["le"]), value))
+    sums = {labels["stage"]: value for labels, value in samples.get(f"{name}_sum", [])}
+    
+    stages = {}
+    for stage, stage_buckets in buckets.items():
+        stage_buckets.sort()
+        count = stage_buckets[-1][1]
+        if not count:
+            continue
+        stages[stage] = {"count": int(count), "mean": round(sums[stage] / count * 1000, 2)}
+        for label, q in QUANTILES.items():
+            stages[stage][label] = round(histogram_quantile(stage_buckets, q) * 1000, 2)
+    return stages
+
+
+def counters(samples: Dict[str, List[Tuple[Dict[str, str], float]]], name: str, label: str) -> Dict[str, int]:
+    return {labels[label]: int(value) for labels, value in samples.get(name, [])}
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no", "."],
+            capture_output=True, text=True, check=True
+        ).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def make_images(args: argparse.Namespace, rng: random.Random) -> List[str]:
+    """Base64 frames with log-normal sizes around ``--image-kb``."""
+    images = []
+    for _ in range(IMAGE_POOL):
+        size = int(rng.lognormvariate(math.log(args.image_kb * 1024), 0.4))
+        images.append(base64.b64encode(b"\xff\xd8" + rng.randbytes(size)).decode())
+    return images
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    images = make_images(args, rng)
+    results: List[Tuple[str, float, int]] = []  # (kind, latency ms, status)
+    pending: List[asyncio.Task] = []
+    
+    limits = httpx.Limits(max_connections=args.devices, max_keepalive_connections=args.devices)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{PORT}", timeout=120, limits=limits
+    ) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.05)
+        
+        async def send(kind: str, body: Dict[str, Any], scheduled: float) -> None:
+            try:
+                if args.multipart:
+                    image = body.pop("image_base64", None)
+                    files = {"image": ("frame.jpg", base64.b64decode(image), "image/jpeg")} if image else None
+                    response = await client.post(
+                        "/api/detections/upload", data=body, files=files, headers=HEADERS
+                    )
+                else:
+                    response = await client.post("/api/detections", json=body, headers=HEADERS)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            # From the scheduled arrival: client-side queueing counts too
+            results.append((kind, (time.perf_counter() - scheduled) * 1000, status))
+        
+        async def device(index: int, deadline: float) -> None:
+            device_rng = random.Random(f"{args.seed}:{index}")
+            next_at = time.perf_counter() + device_rng.expovariate(args.rate)
+            while next_at < deadline:
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                predator = device_rng.random() < args.predator_ratio
+                body: Dict[str, Any] = {
+                    "device_id": f"pi_{index:04d}",
+                    "animal": device_rng.choice(PREDATORS if predator else OTHERS),
+                    "confidence": round(device_rng.uniform(0.5, 0.99), 2)
+                }
+                if device_rng.random() < args.image_ratio:
+                    body["image_base64"] = device_rng.choice(images)
+                pending.append(asyncio.create_task(
+                    send("predator" if predator else "other", body, next_at)
+                ))
+                next_at += device_rng.expovariate(args.rate)
+        
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(device(i, deadline) for i in range(args.devices)))
+        await asyncio.gather(*pending)
+        elapsed = time.perf_counter() - started
+        
+        samples = parse_metrics((await client.get("/metrics")).text)
+    
+    statuses: Dict[str, int] = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    succeeded = [r for r in results if 200 <= r[2] < 300]
+    
+    return {
+        "requests": {
+            "sent": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "status": statuses
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(succeeded) / elapsed, 2),
+        "latency_ms": {
+            "all": percentiles([r[1] for r in succeeded]),
+            "predator": percentiles([r[1] for r in succeeded if r[0] == "predator"]),
+            "other": percentiles([r[1] for r in succeeded if r[0] == "other"])
+        },
+        "stages_ms": stage_breakdown(samples),
+        "cooldown": counters(samples, "predator_cooldown_checks_total", "result"),
+        "dependency_errors": counters(samples, "predator_dependency_errors_total", "dependency"),
+        "dependency_retries": counters(samples, "predator_dependency_retries_total", "dependency")
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    requests = report["requests"]
+    print(f"{requests['sent']} detections in {report['elapsed_seconds']}s: "
+          f"{report['throughput_rps']} succeeded/s, {requests['failed']} failed "
+          f"(status {requests['status']})\n")
+    
+    columns = ["p50", "p95", "p99", "mean", "max"]
+    print(f"{'latency (ms)':<14}" + "".join(f"{c:>10}" for c in columns))
+    for kind, summary in report["latency_ms"].items():
+        if summary:
+            print(f"{kind:<14}" + "".join(f"{summary[c]:>10.1f}" for c in columns))
+    
+    columns = ["count", "mean", "p50", "p95", "p99"]
+    print(f"\n{'stage (ms)':<14}" + "".join(f"{c:>10}" for c in columns))
+    for stage, summary in report["stages_ms"].items():
+        print(f"{stage:<14}" + "".join(f"{summary[c]:>10}" for c in columns))
+    
+    print(f"\ncooldown: {report['cooldown']}")
+    print(f"dependency errors: {report['dependency_errors']}, "
+          f"retries: {report['dependency_retries']}")
+    for name, stats in report.get("fakes", {}).items():
+        print(f"fake {name}: {stats}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Print the change against ``baseline``; False if anything regressed."""
+    rows = [("throughput_rps", report["throughput_rps"], baseline["throughput_rps"], True)]
+    for name in ("p50", "p95", "p99"):
+        rows.append((
+            f"latency {name}",
+            report["latency_ms"]["all"].get(name),
+            baseline["latency_ms"]["all"].get(name),
+            False
+        ))
+    for stage, summary in report["stages_ms"].items():
+        if stage in baseline["stages_ms"]:
+            rows.append((f"{stage} p95", summary["p95"], baseline["stages_ms"][stage]["p95"], False))
+    
+    print(f"\nvs {baseline.get('commit')}{' (dirty)' if baseline.get('dirty') else ''} "
+          f"from {baseline.get('timestamp')}:")
+    regressed = False
+    for name, new, old, higher_is_better in rows:
+        if new is None or old is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        # Only p95/p99 and throughput gate; p50 and stages are informational
+        gated = higher_is_better or name in ("latency p95", "latency p99")
+        flag = "  REGRESSION" if gated and worse > tolerance else ""
+        regressed |= bool(flag)
+        print(f"  {name:<18}{old:>10}{new:>10}{change:>+9.1%}{flag}")
+    return not regressed
+
+
+def main(args: argparse.Namespace) -> int:
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    
+    stats_file = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+    child_args = ["--stats-file", stats_file]
+    for option in (
+        "cooldown", "firestore_latency", "fcm_latency", "upload_latency",
+        "firestore_error_rate", "fcm_error_rate", "cloudinary_fail_every",
+        "cloudinary_stall_every", "cloudinary_stall_seconds", "seed"
+    ):
+        child_args += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve", *child_args],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(300):
+            try:
+                httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        report = asyncio.run(run_load(args))
+    finally:
+        server.terminate()
+        server.wait()
+    
+    try:
+        with open(stats_file) as f:
+            report["fakes"] = json.load(f)
+    except (OSError, ValueError):
+        report["fakes"] = {}
+    finally:
+        if os.path.exists(stats_file):
+            os.unlink(stats_file)
+    
+    report = {
+        "benchmark": "load_test",
+        **git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("serve", "stats_file", "output", "compare", "tolerance")
+        },
+        **report
+    }
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    
+    if baseline is not None and not compare(report, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    fleet = parser.add_argument_group("fleet")
+    fleet.add_argument("--devices", type=int, default=50)
+    fleet.add_argument("--rate", type=float, default=0.2,
+                       help="detections per second per device (Poisson)")
+    fleet.add_argument("--duration", type=float, default=30, help="seconds of load")
+    fleet.add_argument("--predator-ratio", type=float, default=0.2)
+    fleet.add_argument("--image-ratio", type=float, default=0.9)
+    fleet.add_argument("--image-kb", type=float, default=80, help="median image size")
+    fleet.add_argument("--multipart", action="store_true",
+                       help="send images as multipart parts instead of base64 JSON")
+    fleet.add_argument("--cooldown", type=int, default=30, help="COOLDOWN_SECONDS")
+    fleet.add_argument("--seed", type=int, default=1)
+    
+    fakes = parser.add_argument_group("fake dependencies")
+    fakes.add_argument("--firestore-latency", type=float, default=0.02)
+    fakes.add_argument("--fcm-latency", type=float, default=0.05)
+    fakes.add_argument("--upload-latency", type=float, default=0.2)
+    fakes.add_argument("--firestore-error-rate", type=float, default=0.0)
+    fakes.add_argument("--fcm-error-rate", type=float, default=0.0)
+    fakes.add_argument("--cloudinary-fail-every", type=int, default=0,
+                       help="first attempt of 1 in N uploads gets a 503")
+    fakes.add_argument("--cloudinary-stall-every", type=int, default=0,
+                       help="first attempt of 1 in N uploads stalls")
+    fakes.add_argument("--cloudinary-stall-seconds", type=float, default=0.0)
+    
+    results = parser.add_argument_group("results")
+    results.add_argument("--output", help="write the results as JSON to this path")
+    results.add_argument("--compare", help="results JSON of an earlier run to compare with")
+    results.add_argument("--tolerance", type=float, default=0.1,
+                         help="allowed throughput/p95/p99 regression (fraction)")
+    
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stats-file", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    
+    if parsed.serve:
+        serve(parsed)
+    else:
+        sys.exit(main(parsed))
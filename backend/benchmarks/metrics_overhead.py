@@ -0,0 +1,75 @@
+"""Per-request cost of the metrics middleware and stage timers.
+
+Times ``GET /health`` in-process with and without ``MetricsMiddleware``
+(alternating rounds to cancel out drift), and the cost of one stage timer.
+
+Usage::
+
+    python -m benchmarks.metrics_overhead [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import configure_environment
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.core.metrics import STAGE_DURATION, MetricsMiddleware  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+ALL_MIDDLEWARE = list(app.user_middleware)
+
+
+def set_metrics(enabled: bool) -> None:
+    """Rebuild the app's middleware stack with or without the metrics middleware."""
+    app.user_middleware = [
+        m for m in ALL_MIDDLEWARE if enabled or m.cls is not MetricsMiddleware
+    ]
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def round_trip_us(client: httpx.AsyncClient, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.get("/health")
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = {True: [], False: []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await round_trip_us(client, 200)  # warm up
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                set_metrics(enabled)
+                results[enabled].append(
+                    await round_trip_us(client, args.requests // args.rounds)
+                )
+    
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        with STAGE_DURATION.time("bench"):
+            pass
+    timer_us = (time.perf_counter() - start) / args.requests * 1e6
+    
+    without = statistics.median(results[False])
+    with_metrics = statistics.median(results[True])
+    print(f"GET /health, {args.requests} requests each way (median of {args.rounds} rounds)")
+    print(f"  without metrics   {without:8.1f} us/request")
+    print(f"  with metrics      {with_metrics:8.1f} us/request")
+    print(f"  middleware cost   {with_metrics - without:8.1f} us/request")
+    print(f"  stage timer       {timer_us:8.2f} us/observation")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
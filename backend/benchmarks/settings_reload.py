@@ -0,0 +1,104 @@
+"""Check: SIGHUP applies an edited ``.env`` to a running server.
+
+Serves the app (real socket, lifespan on, fake dependencies) from a
+directory holding a ``.env`` without a rate limit and sends a burst of
+detections. It then sets a per-device rate limit in ``.env``, sends the
+server SIGHUP and repeats the burst, which must now be cut off with 429s.
+Finally it writes an invalid ``.env`` and sends SIGHUP again: the server
+must keep the running limit.
+
+Exits non-zero if a reload is not applied, or an invalid one is.
+
+Usage::
+
+    python -m benchmarks.settings_reload [--requests 30]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+
+from benchmarks.fakes import configure_environment, install_fakes
+
+configure_environment()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+
+
+async def burst(client: httpx.AsyncClient, requests: int) -> int:
+    """Send ``requests`` detections from one device; return how many got 429."""
+    limited = 0
+    for i in range(requests):
+        response = await client.post(
+            "/api/detections",
+            json={"device_id": "reload_cam", "animal": "deer", "confidence": 0.5},
+            headers=HEADERS
+        )
+        limited += response.status_code == 429
+    return limited
+
+
+async def reload_with(env: str) -> None:
+    """Rewrite ``.env`` and signal the server, as an operator would."""
+    with open(".env", "w") as f:
+        f.write(env)
+    os.kill(os.getpid(), signal.SIGHUP)
+    await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> int:
+    install_fakes()
+    with open(".env", "w") as f:
+        f.write("RATE_LIMIT_PER_SECOND=0\n")
+    
+    config = uvicorn.Config(app, port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as client:
+        before = await burst(client, args.requests)
+        
+        await reload_with("RATE_LIMIT_PER_SECOND=0.1\nRATE_LIMIT_BURST=5\n")
+        after = await burst(client, args.requests)
+        
+        await reload_with("RATE_LIMIT_PER_SECOND=0.1\nRATE_LIMIT_BURST=not-a-number\n")
+        invalid = await burst(client, args.requests)
+    
+    server.should_exit = True
+    await serving
+    
+    print(f"429s per burst of {args.requests}: no limit {before}, "
+          f"after SIGHUP (burst 5) {after}, after an invalid reload {invalid}")
+    
+    ok = before == 0 and after >= args.requests - 6 and invalid == args.requests
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+def main(args: argparse.Namespace) -> int:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings read .env from the working directory
+        os.chdir(tmp)
+        try:
+            return asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8767)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,242 @@
+"""Crash-recovery check for the durable detection spool.
+
+Runs three child processes against one spool file and one "remote" SQLite
+file standing in for Firestore, FCM and Cloudinary (so remote state outlives
+the processes):
+
+1. ``fill``: accepts N detections while Firestore and Cloudinary are down;
+   every detection ends up in the spool (alerts still go out).
+2. ``drain``: replays the spool and is killed with SIGKILL part-way through.
+3. ``drain``: restarts and replays the remainder.
+
+Exits non-zero unless every accepted detection is stored exactly once, the
+spool is empty and no alert was sent twice.
+
+Usage::
+    
+    python -m benchmarks.spool_crash_recovery [--detections 200]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from benchmarks.fakes import (
+    FakeBatchResponse,
+    FakeCloudinaryTransport,
+    FakeSendResponse,
+    FakeSnapshot,
+    configure_environment,
+    install_cloudinary_transport,
+)
+
+
+class RemoteStore:
+    """Firestore/FCM/Cloudinary side effects, persisted across processes."""
+    
+    def __init__(self, path: str, latency: float = 0.0, available: bool = True):
+        self.latency = latency
+        self.available = available
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, image_url TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS writes (id TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS alerts (id TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS uploads (public_id TEXT)")
+    
+    def _call(self) -> None:
+        if not self.available:
+            raise ConnectionError("503 Service Unavailable")
+        if self.latency:
+            time.sleep(self.latency)
+    
+    # Firestore
+    def collection(self, name: str) -> "RemoteStore":
+        return self
+    
+    def document(self, doc_id: str) -> "RemoteDocument":
+        return RemoteDocument(self, doc_id)
+    
+    # FCM
+    def send_each(self, messages, dry_run: bool = False) -> FakeBatchResponse:
+        for message in messages:
+            self._conn.execute("INSERT INTO alerts VALUES (?)", (message.data["detection_id"],))
+        return FakeBatchResponse([FakeSendResponse("projects/bench/messages/1") for _ in messages])
+    
+    # Cloudinary
+    def upload(self, size: int, **options: Any) -> Dict[str, Any]:
+        self._call()
+        self._conn.execute("INSERT INTO uploads VALUES (?)", (options["public_id"],))
+        return {"secure_url": f"https://res.cloudinary.com/bench/{options['public_id']}.jpg"}
+    
+    def count(self, sql: str) -> int:
+        return self._conn.execute(sql).fetchone()[0]
+
+
+class RemoteDocument:
+    """Minimal ``DocumentReference`` writing to the remote store."""
+    
+    def __init__(self, store: RemoteStore, doc_id: str):
+        self._store = store
+        self.id = doc_id
+    
+    def get(self) -> FakeSnapshot:
+        self._store._call()
+        return FakeSnapshot(self.id, None)
+    
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._store._call()
+        self._store._conn.execute("INSERT INTO writes VALUES (?)", (self.id,))
+        self._store._conn.execute(
+            "INSERT OR REPLACE INTO docs VALUES (?, ?)", (self.id, data.get("image_url"))
+        )
+    
+    def update(self, data: Dict[str, Any]) -> None:
+        self.set(data, merge=True)
+    
+    def on_snapshot(self, callback: Any) -> None:
+        raise NotImplementedError
+
+
+def install_remote(path: str, latency: float, available: bool) -> RemoteStore:
+    """Patch the app's SDK entry points with one shared remote store."""
+    from firebase_admin import messaging
+    from app.core import firebase
+    
+    remote = RemoteStore(path, latency, available)
+    firebase._firestore_client = remote
+    firebase._firebase_app = object()
+    messaging.send_each = remote.send_each
+    install_cloudinary_transport(FakeCloudinaryTransport(remote.upload))
+    return remote
+
+
+async def fill(detections: int) -> None:
+    from app.models.detection import DetectionRequest
+    from app.services.detection_service import DetectionService
+    
+    image = base64.b64encode(os.urandom(2048)).decode()
+    pending = 0
+    for i in range(detections):
+        response = await DetectionService.process_detection(DetectionRequest(
+            device_id=f"cam_{i}",
+            animal="tiger" if i % 2 else "deer",
+            confidence=0.9,
+            image_base64=image if i % 3 else None
+        ))
+        pending += response.message == "Detection stored locally, delivery pending"
+    print(f"fill: {pending}/{detections} detections spooled during the outage")
+
+
+async def drain() -> None:
+    from app.services.spool import get_detection_spool, get_spool_replayer
+    
+    spool = get_detection_spool()
+    replayer = get_spool_replayer()
+    while spool.depth():
+        if not await replayer.replay_once():
+            await asyncio.sleep(0.1)
+
+
+def child(phase: str, args: argparse.Namespace) -> None:
+    configure_environment()
+    install_remote(args.remote, args.latency, available=phase != "fill")
+    
+    if phase == "fill":
+        asyncio.run(fill(args.detections))
+    else:
+        asyncio.run(drain())
+
+
+def spawn(phase: str, args: argparse.Namespace, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.spool_crash_recovery", "--phase", phase,
+         "--detections", str(args.detections), "--latency", str(args.latency),
+         "--remote", args.remote],
+        env=env,
+        stdout=subprocess.DEVNULL if phase == "drain" else None
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        args.remote = os.path.join(tmp, "remote.db")
+        env = dict(
+            os.environ,
+            SPOOL_ENABLED="true",
+            SPOOL_PATH=os.path.join(tmp, "spool.db"),
+            SPOOL_LEASE_SECONDS="1",
+            SPOOL_REPLAY_INTERVAL_SECONDS="1",
+            # The spool retries outages; don't stretch the fill phase
+            CLOUDINARY_MAX_RETRIES="0",
+        )
+        remote = RemoteStore(args.remote)
+        
+        if spawn("fill", args, env).wait() != 0:
+            return 1
+        
+        # Kill the replayer once about a third of the spool is delivered
+        victim = spawn("drain", args, env)
+        while remote.count("SELECT COUNT(*) FROM docs") < args.detections // 3:
+            if victim.poll() is not None:
+                break
+            time.sleep(0.01)
+        victim.send_signal(signal.SIGKILL)
+        victim.wait()
+        delivered = remote.count("SELECT COUNT(*) FROM docs")
+        print(f"drain: killed with {delivered}/{args.detections} detections delivered")
+        
+        started = time.perf_counter()
+        if spawn("drain", args, env).wait() != 0:
+            return 1
+        print(f"drain: restarted, finished in {time.perf_counter() - started:.1f}s")
+        
+        spool = sqlite3.connect(env["SPOOL_PATH"])
+        left = spool.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        docs = remote.count("SELECT COUNT(*) FROM docs")
+        writes = remote.count("SELECT COUNT(*) FROM writes")
+        missing_images = remote.count(
+            "SELECT COUNT(*) FROM docs WHERE image_url IS NULL"
+        )
+        duplicate_alerts = remote.count(
+            "SELECT COUNT(*) FROM (SELECT id FROM alerts GROUP BY id HAVING COUNT(*) > 1)"
+        )
+        expected_images = sum(1 for i in range(args.detections) if i % 3)
+        
+        print(f"documents stored: {docs}/{args.detections} "
+              f"({writes - docs} idempotent rewrites)")
+        print(f"images attached:  {docs - missing_images}/{expected_images}")
+        print(f"spool entries left: {left}, duplicate alerts: {duplicate_alerts}")
+        
+        ok = (
+            docs == args.detections
+            and left == 0
+            and duplicate_alerts == 0
+            and docs - missing_images == expected_images
+        )
+        print("OK" if ok else "FAILED")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detections", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per Firestore/Cloudinary call")
+    parser.add_argument("--phase", choices=["fill", "drain"], help=argparse.SUPPRESS)
+    parser.add_argument("--remote", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    
+    if parsed.phase:
+        child(parsed.phase, parsed)
+    else:
+        sys.exit(main(parsed))
@@ -0,0 +1,127 @@
+"""Slow live jobs must not overlap the spool replayer.
+
+Accepts predator detections (with images) in fast-ack mode with the spool
+on, a short spool lease, one ingest worker and uploads slower than the
+lease, so every job is still queued or running when its lease would
+expire. The replayer runs alongside. Each detection must then be
+uploaded, alerted, written, counted in the rollups and published to the
+live stream exactly once.
+
+Exits non-zero on any duplicate.
+
+Usage::
+
+    python -m benchmarks.spool_lease_overlap [--detections 3] [--upload-latency 3]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+
+async def run(args: argparse.Namespace) -> int:
+    from benchmarks.fakes import FakeCloudinaryTransport, install_cloudinary_transport, install_fakes
+    from app.models.detection import DetectionRequest
+    from app.services.detection_service import DetectionService
+    from app.services.detection_stream import get_detection_broadcaster
+    from app.services.ingest_queue import get_ingest_queue
+    from app.services.rollups import get_detection_rollups
+    from app.services.spool import get_detection_spool, get_spool_replayer
+    
+    fakes = install_fakes()
+    uploads: Counter = Counter()
+    
+    def upload(size: int, **options):
+        uploads[options["public_id"]] += 1
+        return fakes["cloudinary"].upload(size, **options)
+    
+    fakes["cloudinary"].latency = args.upload_latency
+    install_cloudinary_transport(FakeCloudinaryTransport(upload))
+    db = fakes["firestore"]
+    writes: Counter = Counter()
+    set_document = type(db.collection("detections").document("x")).set
+    
+    def counting_set(doc_ref, data, merge=False):
+        writes[doc_ref.id] += 1
+        set_document(doc_ref, data, merge)
+    
+    type(db.collection("detections").document("x")).set = counting_set
+    
+    subscription = get_detection_broadcaster().subscribe()
+    get_ingest_queue().start()
+    get_spool_replayer().start()
+    
+    image = base64.b64encode(os.urandom(4096)).decode()
+    ids = []
+    for i in range(args.detections):
+        response = await DetectionService.accept_detection(DetectionRequest(
+            device_id=f"cam{i}", animal="tiger", confidence=0.9, image_base64=image
+        ))
+        ids.append(response.detection_id)
+    
+    started = time.perf_counter()
+    spool = get_detection_spool()
+    while spool.depth() or get_ingest_queue().depth:
+        await asyncio.sleep(0.1)
+    # Let a replay leased just before the live job finished complete too
+    await asyncio.sleep(args.upload_latency + 1)
+    elapsed = time.perf_counter() - started
+    
+    events = Counter()
+    frames = await asyncio.wait_for(subscription.next(), 1)
+    for line in frames.split(b"\n"):
+        if line.startswith(b"id: "):
+            events[line[4:].decode()] += 1
+    
+    rollups = Counter()
+    for (_, device_id, _), counts in get_detection_rollups()._pending.items():
+        rollups[device_id] += counts.detections
+    
+    alerts = len(fakes["fcm"].sent)
+    print(f"{args.detections} detections in {elapsed:.1f}s (lease {args.lease}s, "
+          f"uploads {args.upload_latency}s, 1 worker)")
+    print(f"uploads: {dict(uploads)}")
+    print(f"document writes: {dict(writes)}")
+    print(f"alerts sent: {alerts}, rollup detections: {dict(rollups)}, "
+          f"stream events: {dict(events)}")
+    
+    ok = (
+        alerts == args.detections
+        and all(uploads[i] == 1 and writes[i] == 1 and events[i] == 1 for i in ids)
+        and all(rollups[f"cam{i}"] == 1 for i in range(args.detections))
+    )
+    print("OK" if ok else "FAILED: duplicated work")
+    
+    await get_ingest_queue().drain()
+    return 0 if ok else 1
+
+
+def main(args: argparse.Namespace) -> int:
+    from benchmarks.fakes import configure_environment
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment()
+        os.environ.update(
+            FAST_ACK_ENABLED="true",
+            INGEST_WORKERS="1",
+            SPOOL_ENABLED="true",
+            SPOOL_PATH=os.path.join(tmp, "spool.db"),
+            SPOOL_LEASE_SECONDS=str(args.lease),
+            SPOOL_REPLAY_INTERVAL_SECONDS="1",
+            COOLDOWN_SECONDS="0"
+        )
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detections", type=int, default=3)
+    parser.add_argument("--lease", type=int, default=2, help="SPOOL_LEASE_SECONDS")
+    parser.add_argument("--upload-latency", type=float, default=3.0,
+                        help="seconds per Cloudinary upload (longer than the lease)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,194 @@
+"""Cold start: import time, time to first request and time to first alert.
+
+First times ``import app.main`` in fresh interpreters, with and without
+the Firebase SDK (which the app now imports on initialization, during the
+warmup). Then starts the API in a child process, as a platform waking a
+sleeping service would, and sends a predator detection with an image as
+soon as the port answers. Reported from process start:
+
+- first request: ``GET /health`` answers
+- first alert: the detection's response, after its upload, write and FCM
+  send (``alert_triggered`` must be true)
+- ready: ``GET /ready`` answers 200
+
+and the latency of the first detection next to a second one. Runs without
+the warmup (``WARMUP_ENABLED=false``), with it, and serving at once while
+it runs (``WARMUP_TIMEOUT_SECONDS=0``).
+
+Connection setup is emulated by the fakes: the first Firestore call waits
+``--firestore-connect``, the first FCM access token ``--fcm-token`` and
+each new Cloudinary connection ``--cloudinary-connect`` (a local HTTP
+server). The fakes import the Firebase SDK before the app starts, so the
+child's startup includes that import in every mode.
+
+Usage::
+
+    python -m benchmarks.startup [--runs 3] [--firestore-connect 0.15]
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+PORT = 8768
+IMAGE = base64.b64encode(b"\xff\xd8" + b"\x00" * 50_000).decode()
+SDK_MODULES = ["firebase_admin", "google.cloud.firestore", "grpc", "google.auth"]
+
+MODES = {
+    "no warmup": {"WARMUP_ENABLED": "false"},
+    "warmup": {"WARMUP_ENABLED": "true"},
+    "serve at once": {"WARMUP_ENABLED": "true", "WARMUP_TIMEOUT_SECONDS": "0"}
+}
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Child process: run the API with fakes installed."""
+    from benchmarks.fakes import configure_environment, install_fakes
+    
+    configure_environment()
+    
+    import uvicorn
+    from app.main import app
+    from app.services.cloudinary_client import create_cloudinary_client, set_cloudinary_client
+    
+    install_fakes(
+        firestore_connect_latency=args.firestore_connect,
+        fcm_token_latency=args.fcm_token
+    )
+    # Uploads (and the warmup ping) go over real sockets to the parent's server
+    set_cloudinary_client(create_cloudinary_client())
+    uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning")
+
+
+def time_import(extra: str = "") -> float:
+    code = (
+        "import time; started = time.perf_counter(); import app.main" + extra +
+        "; print(time.perf_counter() - started)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def measure_imports(runs: int) -> None:
+    app_only = statistics.median(time_import() for _ in range(runs))
+    with_sdk = statistics.median(
+        time_import("; import firebase_admin.messaging, google.cloud.firestore")
+        for _ in range(runs)
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c",
+         f"import sys, app.main; print([m for m in {SDK_MODULES!r} if m in sys.modules])"],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    print(f"import app.main: {app_only:.0f} ms (SDK modules loaded: {loaded}); "
+          f"with the Firebase SDK: {with_sdk:.0f} ms\n")
+
+
+def detection(device_id: str) -> Dict[str, object]:
+    return {"device_id": device_id, "animal": "tiger", "confidence": 0.9, "image_base64": IMAGE}
+
+
+def cold_start(mode_env: Dict[str, str], cloudinary_url: str, args: argparse.Namespace) -> Dict[str, float]:
+    env = {**os.environ, **mode_env, "CLOUDINARY_API_URL": cloudinary_url}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.startup", "--serve",
+         "--firestore-connect", str(args.firestore_connect),
+         "--fcm-token", str(args.fcm_token)],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    elapsed = lambda: (time.perf_counter() - started) * 1000  # noqa: E731
+    
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}", timeout=30) as client:
+            while True:
+                try:
+                    client.get("/health").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            first_request = elapsed()
+            
+            sent = time.perf_counter()
+            response = client.post("/api/detections", json=detection("cam_1"), headers=HEADERS)
+            first_alert = elapsed()
+            first_latency = (time.perf_counter() - sent) * 1000
+            if not response.json().get("alert_triggered"):
+                raise RuntimeError(f"First detection raised no alert: {response.text}")
+            
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.005)
+            ready = elapsed()
+            
+            sent = time.perf_counter()
+            client.post("/api/detections", json=detection("cam_2"), headers=HEADERS)
+            second_latency = (time.perf_counter() - sent) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+    
+    return {
+        "first request": first_request,
+        "first alert": first_alert,
+        "ready": ready,
+        "1st detection": first_latency,
+        "2nd detection": second_latency
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    from benchmarks.fakes import FakeCloudinaryServer, configure_environment
+    
+    configure_environment()
+    measure_imports(args.runs)
+    
+    cloudinary = FakeCloudinaryServer(connect_latency=args.cloudinary_connect).start()
+    try:
+        columns = ["first request", "first alert", "ready", "1st detection", "2nd detection"]
+        print(f"emulated setup: Firestore {args.firestore_connect * 1000:.0f} ms, FCM token "
+              f"{args.fcm_token * 1000:.0f} ms, Cloudinary {args.cloudinary_connect * 1000:.0f} ms "
+              f"per connection; medians of {args.runs} cold starts (ms)\n")
+        # Modes take turns, so drift in machine load hits each alike
+        runs: Dict[str, List[Dict[str, float]]] = {name: [] for name in MODES}
+        for _ in range(args.runs):
+            for name, mode_env in MODES.items():
+                runs[name].append(cold_start(mode_env, cloudinary.url, args))
+        
+        print(f"{'mode':<15}" + "".join(f"{c:>15}" for c in columns))
+        for name, results in runs.items():
+            print(f"{name:<15}" + "".join(
+                f"{statistics.median(r[c] for r in results):>15.0f}" for c in columns
+            ))
+    finally:
+        cloudinary.stop()
+    
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--firestore-connect", type=float, default=0.15,
+                        help="seconds the first Firestore call takes to connect")
+    parser.add_argument("--fcm-token", type=float, default=0.25,
+                        help="seconds to fetch the first FCM access token")
+    parser.add_argument("--cloudinary-connect", type=float, default=0.1,
+                        help="seconds each new Cloudinary connection takes")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    
+    if parsed.serve:
+        serve(parsed)
+    else:
+        sys.exit(main(parsed))
@@ -0,0 +1,255 @@
+"""Live detection stream: idle subscriber memory, fan-out and slow consumers.
+
+Starts the API in a child process (with fakes), opens thousands of
+``GET /api/detections/stream`` connections with a mix of filters (all,
+predator-only, one device) and reports the server's RSS growth per idle
+stream. It then stores detections and checks that every subscriber gets
+exactly the events its filters match, with the delay from submission to
+the last subscriber receiving each one. Finally a client that never reads
+must be dropped once its buffer fills, while every other one keeps up.
+
+Exits non-zero if any subscriber misses an event or the slow consumer is
+not dropped.
+
+Usage::
+
+    python -m benchmarks.stream_fanout [--subscribers 2000] [--events 50]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+PORT = 8767
+ANIMALS = ["tiger", "deer"]  # Predator, not a predator
+
+
+def serve() -> None:
+    """Child process: run the API with fakes installed."""
+    from benchmarks.fakes import configure_environment, install_fakes
+    
+    configure_environment()
+    os.environ.setdefault("COOLDOWN_SECONDS", "0")
+    os.environ.setdefault("STREAM_QUEUE_SIZE", "512")  # Above the 200-event batches below
+    
+    import uvicorn
+    from app.main import app
+    
+    install_fakes()
+    uvicorn.run(app, host="127.0.0.1", port=PORT, lifespan="off", log_level="warning",
+                backlog=4096)
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise KeyError("VmRSS")
+
+
+class StreamClient:
+    """Minimal SSE client on a raw socket (keeps the benchmark side light)."""
+    
+    def __init__(self, query: str, expect: Optional[Dict[str, str]] = None):
+        self.query = query
+        self.expect = expect or {}  # Filters this client should see applied
+        self.received: Dict[str, float] = {}  # detection_id -> arrival time
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+    
+    async def connect(self, receive_buffer: Optional[int] = None) -> None:
+        sock = None
+        if receive_buffer is not None:
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", PORT))
+            self.reader, self.writer = await asyncio.open_connection(sock=sock)
+        else:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", PORT)
+        self.writer.write(
+            f"GET /api/detections/stream{self.query} HTTP/1.1\r\nHost: bench\r\n"
+            f"Authorization: {HEADERS['Authorization']}\r\nAccept: text/event-stream\r\n\r\n"
+            .encode()
+        )
+        await self.writer.drain()
+    
+    async def read_headers(self) -> None:
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        if b" 200 " not in head.split(b"\r\n", 1)[0]:
+            raise RuntimeError(head.decode(errors="replace"))
+    
+    async def read_events(self) -> None:
+        """Record detection events until the stream ends."""
+        while True:
+            try:
+                line = await self.reader.readline()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                return
+            if not line:
+                return
+            # Chunked encoding: size lines and blank lines are skipped
+            if line.startswith(b"id: "):
+                self.received.setdefault(line[4:].strip().decode(), time.perf_counter())
+    
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def status(client: httpx.AsyncClient) -> Dict[str, int]:
+    response = await client.get("/api/detections/status", headers=HEADERS)
+    return response.json()["detection_stream"]
+
+
+async def run(args: argparse.Namespace, pid: int) -> int:
+    failures = 0
+    
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60) as api:
+        # Warm up the stream and publish paths before the baseline
+        warm = StreamClient("")
+        await warm.connect()
+        await warm.read_headers()
+        await api.post("/api/detections", headers=HEADERS,
+                       json={"device_id": "warmup", "animal": "deer", "confidence": 0.5})
+        warm.close()
+        await asyncio.sleep(0.5)
+        
+        baseline = rss_kb(pid)
+        clients: List[StreamClient] = []
+        for index in range(args.subscribers):
+            if index % 4 == 0:
+                clients.append(StreamClient("?is_predator=true", {"is_predator": "true"}))
+            elif index % 4 == 1:
+                device = f"cam_{index % args.devices}"
+                clients.append(StreamClient(f"?device_id={device}", {"device_id": device}))
+            else:
+                clients.append(StreamClient(""))
+        
+        started = time.perf_counter()
+        for start in range(0, len(clients), 500):
+            chunk = clients[start:start + 500]
+            await asyncio.gather(*(c.connect() for c in chunk))
+            await asyncio.gather(*(c.read_headers() for c in chunk))
+        connect_seconds = time.perf_counter() - started
+        await asyncio.sleep(1.0)
+        
+        growth = rss_kb(pid) - baseline
+        print(f"{args.subscribers} idle streams opened in {connect_seconds:.1f}s; server RSS "
+              f"+{growth / 1024:.1f} MB ({growth / args.subscribers:.1f} KB per stream)")
+        
+        readers = [asyncio.create_task(c.read_events()) for c in clients]
+        
+        # Fan-out: one detection at a time, time to reach every subscriber
+        sent: Dict[str, float] = {}
+        expected: Dict[str, Dict[str, str]] = {}
+        for index in range(args.events):
+            device = f"cam_{index % args.devices}"
+            animal = ANIMALS[index % 2]
+            submitted = time.perf_counter()
+            response = await api.post(
+                "/api/detections", headers=HEADERS,
+                json={"device_id": device, "animal": animal, "confidence": 0.9}
+            )
+            detection_id = response.json()["detection_id"]
+            sent[detection_id] = submitted
+            expected[detection_id] = {
+                "device_id": device, "is_predator": "true" if animal == "tiger" else "false"
+            }
+            await asyncio.sleep(args.interval)
+        await asyncio.sleep(1.0)
+        
+        missing = 0
+        fanout: List[float] = []
+        for detection_id, attributes in expected.items():
+            arrivals = []
+            for client in clients:
+                wanted = all(attributes[k] == v for k, v in client.expect.items())
+                got = detection_id in client.received
+                missing += wanted != got
+                if got:
+                    arrivals.append(client.received[detection_id])
+            if arrivals:
+                fanout.append((max(arrivals) - sent[detection_id]) * 1000)
+        fanout.sort()
+        failures += missing > 0
+        print(f"{args.events} detections: {sum(len(c.received) for c in clients)} deliveries, "
+              f"{missing} missing/unexpected; time to last subscriber "
+              f"p50={statistics.median(fanout):.1f} ms p99={fanout[int(len(fanout) * 0.99) - 1]:.1f} ms")
+        
+        # Slow consumer: never reads; must be dropped while the rest keep up
+        slow = StreamClient("")
+        await slow.connect(receive_buffer=4096)
+        await slow.read_headers()
+        before = await status(api)
+        
+        for start in range(0, args.burst, 200):
+            batch = [
+                {"device_id": f"burst_{i}", "animal": "deer", "confidence": 0.5,
+                 "timestamp": f"2024-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"}
+                for i in range(start, min(start + 200, args.burst))
+            ]
+            response = await api.post("/api/detections/batch", headers=HEADERS, json=batch)
+            response.raise_for_status()
+        await asyncio.sleep(2.0)
+        
+        after = await status(api)
+        dropped = after["dropped_subscribers"] - before["dropped_subscribers"]
+        behind = sum(
+            1 for c in clients
+            if not c.expect and len(c.received) < args.events + args.burst
+        )
+        print(f"{args.burst} events in batches of 200 with one non-reading client: "
+              f"{dropped} subscriber(s) dropped, {behind} unfiltered subscriber(s) missing events")
+        failures += dropped != 1 or behind > 0
+        
+        slow.close()
+        for client in clients:
+            client.close()
+        await asyncio.gather(*readers, return_exceptions=True)
+    
+    return 1 if failures else 0
+
+
+def main(args: argparse.Namespace) -> int:
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.stream_fanout", "--serve"])
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        return asyncio.run(run(args, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.02,
+                        help="seconds between submitted detections")
+    parser.add_argument("--burst", type=int, default=25000,
+                        help="events stored in the slow-consumer phase")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    
+    if parsed.serve:
+        serve()
+    else:
+        sys.exit(main(parsed))
@@ -0,0 +1,171 @@
+"""Memory profile: server peak RSS under concurrent large image uploads.
+
+Starts the API in a child process (with fakes for Firestore, FCM and
+Cloudinary), then sends batches of concurrent detections carrying large
+images, as base64 JSON and as multipart. The peak RSS (``VmHWM``) of the
+server is reset before each phase and read back after it. An oversized body
+must be cut off with ``413`` without raising the peak.
+
+Exits non-zero if a phase exceeds its per-request memory budget or the
+oversized body is accepted.
+
+Usage::
+
+    python -m benchmarks.upload_memory [--concurrency 8] [--image-mb 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+HEADERS = {"Authorization": "Bearer bench_key"}
+PORT = 8766
+
+# Allowed peak growth per in-flight request, in multiples of the image size.
+# Base64 JSON holds the raw body, the parsed JSON string and the validated
+# model string (~1.33x each); the decoded image is spooled. Multipart holds
+# at most the spooled part.
+BUDGETS = {"json": 4.5, "multipart": 1.5}
+
+
+def serve(upload_latency: float) -> None:
+    """Child process: run the API with fakes installed."""
+    from benchmarks.fakes import configure_environment, install_fakes
+    
+    configure_environment()
+    
+    import uvicorn
+    from app.main import app
+    
+    install_fakes(upload_latency=upload_latency)
+    uvicorn.run(app, host="127.0.0.1", port=PORT, lifespan="off", log_level="warning")
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak(pid: int) -> None:
+    """Reset VmHWM to the current RSS (Linux 4.0+)."""
+    with open(f"/proc/{pid}/clear_refs", "w") as f:
+        f.write("5")
+
+
+async def send(client: httpx.AsyncClient, mode: str, index: int, image: bytes) -> int:
+    fields = {"device_id": f"{mode}_{index}_{time.monotonic_ns()}", "animal": "deer",
+              "confidence": "0.5"}
+    if mode == "json":
+        response = await client.post(
+            "/api/detections",
+            json={**fields, "confidence": 0.5,
+                  "image_base64": base64.b64encode(image).decode()},
+            headers=HEADERS
+        )
+    else:
+        response = await client.post(
+            "/api/detections/upload",
+            data=fields,
+            files={"image": ("frame.jpg", image, "image/jpeg")},
+            headers=HEADERS
+        )
+    return response.status_code
+
+
+async def phase(pid: int, client: httpx.AsyncClient, mode: str, concurrency: int,
+                image: bytes) -> float:
+    """Peak RSS growth (MB) while ``concurrency`` uploads are in flight."""
+    reset_peak(pid)
+    baseline = memory_kb(pid, "VmRSS")
+    codes = await asyncio.gather(*[
+        send(client, mode, i, image) for i in range(concurrency)
+    ])
+    assert all(code == 201 for code in codes), codes
+    return (memory_kb(pid, "VmHWM") - baseline) / 1024
+
+
+async def run(args: argparse.Namespace, pid: int) -> int:
+    image = b"\xff\xd8" + os.urandom(args.image_mb * 1024 * 1024)
+    image_mb = len(image) / 1024 / 1024
+    failures = 0
+    
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+        # Warm up allocator arenas and imports before measuring
+        for mode in BUDGETS:
+            await phase(pid, client, mode, 2, image)
+        
+        print(f"{args.concurrency} concurrent uploads of {image_mb:.1f} MB images\n")
+        print(f"{'mode':<11}{'peak growth':>13}{'per request':>13}{'budget':>10}")
+        for mode, budget in BUDGETS.items():
+            growth = await phase(pid, client, mode, args.concurrency, image)
+            per_request = growth / args.concurrency / image_mb
+            ok = per_request <= budget
+            failures += not ok
+            print(f"{mode:<11}{growth:>10.1f} MB{per_request:>11.2f} x{budget:>8.1f} x"
+                  f"  {'OK' if ok else 'OVER BUDGET'}")
+        
+        # An oversized body streamed without Content-Length must be cut off early
+        reset_peak(pid)
+        baseline = memory_kb(pid, "VmRSS")
+        
+        async def oversized():
+            chunk = b'"' + b"A" * (1024 * 1024)
+            yield b'{"device_id": "big", "animal": "deer", "confidence": 0.5, "image_base64": '
+            for _ in range(50):
+                yield chunk
+        
+        try:
+            response = await client.post("/api/detections", content=oversized(), headers=HEADERS)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__  # Server closed the connection mid-upload
+        growth = (memory_kb(pid, "VmHWM") - baseline) / 1024
+        ok = status in (413, "RemoteProtocolError", "WriteError")
+        failures += not ok
+        print(f"\n50 MB streamed body: {status}, peak growth {growth:.1f} MB  "
+              f"{'OK' if ok else 'NOT REJECTED'}")
+    
+    return 1 if failures else 0
+
+
+def main(args: argparse.Namespace) -> int:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.upload_memory", "--serve",
+         "--upload-latency", str(args.upload_latency)]
+    )
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        return asyncio.run(run(args, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--image-mb", type=int, default=5)
+    parser.add_argument("--upload-latency", type=float, default=0.5,
+                        help="seconds per fake Cloudinary upload")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    
+    if parsed.serve:
+        serve(parsed.upload_latency)
+    else:
+        sys.exit(main(parsed))